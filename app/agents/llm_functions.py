@@ -0,0 +1,194 @@
+import asyncio
+import time
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from prompt.templates import main_template
+from utils.concurrency import run_blocking
+from utils.initialize import load_env_variables
+from utils.config_settings import config
+
+env_name = load_env_variables()
+
+AGENT_SQL_TIMEOUT = config[env_name].AGENT_SQL_TIMEOUT
+AGENT_KG_TIMEOUT = config[env_name].AGENT_KG_TIMEOUT
+AGENT_MERGE_TIMEOUT = config[env_name].AGENT_MERGE_TIMEOUT
+
+OK = "ok"
+TIMEOUT = "timeout"
+ERROR = "error"
+
+NO_ANSWER = "I don't know: neither the document database nor the knowledge graph returned an answer."
+
+
+async def _run_branch(retriever, question, timeout):
+    """
+    Run one retriever with a deadline; sync retrievers run on the blocking pool.
+
+    Returns:
+        dict: status, answer or error, and seconds taken
+    """
+    started = time.monotonic()
+    if asyncio.iscoroutinefunction(retriever):
+        call = retriever(question)
+    else:
+        call = run_blocking(retriever, question)
+    try:
+        answer = await asyncio.wait_for(call, timeout)
+        result = {"status": OK, "answer": answer}
+    except asyncio.TimeoutError:
+        # Async branches are cancelled; a sync one finishes on its thread and is discarded
+        result = {"status": TIMEOUT, "error": f"No answer within {timeout}s"}
+    except Exception as e:
+        result = {"status": ERROR, "error": str(e)}
+    result["seconds"] = time.monotonic() - started
+    return result
+
+
+def _merge_chain(llm):
+    return PromptTemplate.from_template(main_template) | llm | StrOutputParser()
+
+
+def _merge_input(question, sql_answer, kg_answer):
+    return {
+        "question": question,
+        "Structured context": sql_answer,
+        "Unstructured context": kg_answer,
+    }
+
+
+def _merge_failure(error, timeout):
+    if isinstance(error, asyncio.TimeoutError):
+        return {"status": TIMEOUT, "error": f"No merged answer within {timeout}s"}
+    return {"status": ERROR, "error": str(error)}
+
+
+async def _merge(question, llm, sql_answer, kg_answer, timeout):
+    return await asyncio.wait_for(
+        _merge_chain(llm).ainvoke(_merge_input(question, sql_answer, kg_answer)), timeout
+    )
+
+
+async def agent_with_sql_and_kg_for_docs(
+    question,
+    llm,
+    sql_retriever,
+    kg_retriever,
+    sql_timeout=AGENT_SQL_TIMEOUT,
+    kg_timeout=AGENT_KG_TIMEOUT,
+    merge_timeout=AGENT_MERGE_TIMEOUT,
+):
+    """
+    Answer a question from the SQL document database and the knowledge graph at once.
+
+    Both branches start together, each with its own deadline, so the answer
+    takes as long as the slower branch rather than the sum of both. When both
+    answer, llm merges them with main_template. When only one does, or the
+    merge fails, the available answers are returned with "partial" set.
+
+    Args:
+        question (str): The user's question
+        llm: Chat model used to merge the two answers
+        sql_retriever (callable): question -> answer from the SQL database; sync or async
+        kg_retriever (callable): question -> answer from the knowledge graph; sync or async
+        sql_timeout, kg_timeout (float): Seconds each branch may take
+        merge_timeout (float): Seconds the merge may take
+
+    Returns:
+        dict: question, answer, partial, and each branch's status, answer or error and time
+    """
+    sql, kg = await asyncio.gather(
+        _run_branch(sql_retriever, question, sql_timeout),
+        _run_branch(kg_retriever, question, kg_timeout),
+    )
+    branches = {"sql": sql, "kg": kg}
+    answered = [name for name, branch in branches.items() if branch["status"] == OK]
+
+    partial = True
+    if len(answered) == 2:
+        try:
+            answer = await _merge(question, llm, sql["answer"], kg["answer"], merge_timeout)
+            partial = False
+        except Exception as e:
+            # Fall back to both answers unmerged
+            branches["merge"] = _merge_failure(e, merge_timeout)
+            answer = f"{kg['answer']}\n\n{sql['answer']}"
+    elif answered:
+        answer = branches[answered[0]]["answer"]
+    else:
+        answer = NO_ANSWER
+
+    return {"question": question, "answer": answer, "partial": partial, "branches": branches}
+
+
+async def _named_branch(name, retriever, question, timeout):
+    return name, await _run_branch(retriever, question, timeout)
+
+
+async def astream_agent_with_sql_and_kg_for_docs(
+    question,
+    llm,
+    sql_retriever,
+    kg_retriever,
+    sql_timeout=AGENT_SQL_TIMEOUT,
+    kg_timeout=AGENT_KG_TIMEOUT,
+    merge_timeout=AGENT_MERGE_TIMEOUT,
+):
+    """
+    Streaming version of agent_with_sql_and_kg_for_docs.
+
+    Yields ("branch", {"name", "status", ...}) as each branch finishes, then
+    ("token", text) as the merge LLM produces the answer, and finally
+    ("done", {"question", "answer", "partial", "branches"}). Closing the
+    generator cancels the branches or the merge still running.
+    """
+    tasks = [
+        asyncio.ensure_future(_named_branch("sql", sql_retriever, question, sql_timeout)),
+        asyncio.ensure_future(_named_branch("kg", kg_retriever, question, kg_timeout)),
+    ]
+    branches = {}
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            name, branch = await next_done
+            branches[name] = branch
+            yield "branch", {"name": name, **branch}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    answered = [name for name in ("kg", "sql") if branches[name]["status"] == OK]
+    partial = True
+    if len(answered) == 2:
+        parts = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + merge_timeout
+        stream = _merge_chain(llm).astream(
+            _merge_input(question, branches["sql"]["answer"], branches["kg"]["answer"])
+        )
+        try:
+            while True:
+                try:
+                    token = await asyncio.wait_for(stream.__anext__(), max(deadline - loop.time(), 0))
+                except StopAsyncIteration:
+                    break
+                parts.append(token)
+                yield "token", token
+            partial = False
+        except Exception as e:
+            branches["merge"] = _merge_failure(e, merge_timeout)
+            if not parts:
+                # Nothing streamed yet: fall back to both answers unmerged
+                parts = [f"{branches['kg']['answer']}\n\n{branches['sql']['answer']}"]
+                yield "token", parts[0]
+        finally:
+            await stream.aclose()
+        answer = "".join(parts)
+    elif answered:
+        answer = branches[answered[0]]["answer"]
+        yield "token", answer
+    else:
+        answer = NO_ANSWER
+        yield "token", answer
+
+    yield "done", {"question": question, "answer": answer, "partial": partial, "branches": branches}
@@ -0,0 +1,91 @@
+"""
+Benchmark: RecursiveCharacterTextSplitter (the "recursive" strategy)
+against token_chunking (the "token" strategy).
+
+The corpus is generated and chunked in batches, so multi-GB runs need only
+one batch in memory. Reports throughput for each chunker and the spread of
+chunk sizes in tokens.
+
+Run from the app directory:
+
+    python -m benchmarks.chunking_bench --mb 2048
+"""
+import argparse
+import random
+import string
+import time
+
+import numpy as np
+import tiktoken
+from langchain.schema import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from chunks.chunking import token_chunking, TOKEN_CHUNK_SIZE, TOKEN_CHUNK_OVERLAP, TOKEN_CHUNK_ENCODING
+
+
+def synthetic_batches(total_mb, batch_mb, doc_kb, seed=0):
+    rng = random.Random(seed)
+    # Mix of short and long words, digits and punctuation so tokens per character vary
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(1, 14))) for _ in range(5000)]
+    words += [str(rng.randint(0, 10 ** 6)) for _ in range(500)] + ["{", "}", "();", "=>", "::"]
+    remaining = total_mb * 1024 ** 2
+    while remaining > 0:
+        batch, batch_size = [], 0
+        while batch_size < min(batch_mb * 1024 ** 2, remaining):
+            paragraphs = []
+            size = 0
+            while size < doc_kb * 1024:
+                paragraph = " ".join(rng.choices(words, k=rng.randint(20, 200)))
+                paragraphs.append(paragraph)
+                size += len(paragraph) + 2
+            text = "\n\n".join(paragraphs)
+            batch.append(Document(page_content=text, metadata={"source": f"doc-{len(batch)}"}))
+            batch_size += len(text)
+        remaining -= batch_size
+        yield batch, batch_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=int, default=64, help="corpus size")
+    parser.add_argument("--batch-mb", type=int, default=16)
+    parser.add_argument("--doc-kb", type=int, default=256)
+    parser.add_argument("--sample", type=int, default=2000, help="recursive chunks per batch to count tokens of")
+    args = parser.parse_args()
+
+    encoding = tiktoken.get_encoding(TOKEN_CHUNK_ENCODING)
+    recursive = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=200)
+    seconds = {"recursive": 0.0, "token": 0.0}
+    token_counts = {"recursive": [], "token": []}
+    total_bytes = 0
+
+    for batch, batch_size in synthetic_batches(args.mb, args.batch_mb, args.doc_kb):
+        total_bytes += batch_size
+
+        started = time.perf_counter()
+        chunks = recursive.split_documents(batch)
+        seconds["recursive"] += time.perf_counter() - started
+        # Counting tokens isn't part of the recursive splitter's cost, so do it untimed on a sample
+        for chunk in random.sample(chunks, min(args.sample, len(chunks))):
+            token_counts["recursive"].append(len(encoding.encode(chunk.page_content, disallowed_special=())))
+        del chunks
+
+        started = time.perf_counter()
+        chunks = token_chunking(batch, TOKEN_CHUNK_SIZE, TOKEN_CHUNK_OVERLAP, TOKEN_CHUNK_ENCODING)
+        seconds["token"] += time.perf_counter() - started
+        token_counts["token"].extend(chunk.metadata["token_count"] for chunk in chunks)
+        del chunks
+
+    total_mb = total_bytes / 1024 ** 2
+    print(f"corpus: {total_mb:.0f} MB; token chunks of {TOKEN_CHUNK_SIZE} tokens, overlap {TOKEN_CHUNK_OVERLAP}")
+    for name in ("recursive", "token"):
+        counts = np.asarray(token_counts[name])
+        print(
+            f"{name:>9}: {seconds[name]:8.2f} s  {total_mb / seconds[name]:7.1f} MB/s  "
+            f"tokens/chunk mean {counts.mean():.0f}, std {counts.std():.0f}, "
+            f"min {counts.min()}, p99 {np.percentile(counts, 99):.0f}, max {counts.max()}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Concurrency check for the question endpoints: requests per second against the
+number of in-flight requests, through the real FastAPI app and handlers.
+
+The LLM, the SQL and knowledge graph chains and the answer cache embedding
+are replaced by stubs that take a fixed latency per call, so no provider,
+Neo4j or network is needed; everything else (routing, form parsing, the
+agent, run_blocking, the answer cache) is the code that serves production
+traffic. Requests go through httpx's ASGI transport, on one event loop.
+
+If a handler blocks the event loop, throughput stays at 1 / latency whatever
+the number of in-flight requests. The check fails unless throughput at the
+highest in-flight count is at least --min-speedup times that at one.
+
+Run from the app directory:
+
+    python -m benchmarks.concurrency_bench --latency 0.1
+"""
+import argparse
+import asyncio
+import contextlib
+import sys
+import time
+from unittest import mock
+
+import httpx
+import numpy as np
+from langchain_core.runnables import RunnableLambda
+
+import main as server
+
+ENDPOINTS = {
+    "/api/questions": {"llm_model": "openai", "temprature": "0"},
+    "/api/question/testing": {"llm_model": "openai"},
+}
+
+
+def stub(latency, output):
+    def call(value):
+        time.sleep(latency)
+        return output
+
+    async def acall(value):
+        await asyncio.sleep(latency)
+        return output
+
+    return RunnableLambda(call, afunc=acall)
+
+
+def stub_embed(question):
+    # Random unit vectors: distinct questions never hit the answer cache
+    vector = np.random.default_rng().normal(size=(1, 8)).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def patches(latency):
+    llm = stub(latency, "stub answer")
+
+    async def aget_llm_model(model_name, temperature=0.7):
+        return llm
+
+    return [
+        mock.patch.object(server, "aget_llm_model", aget_llm_model),
+        mock.patch.object(server, "get_sql_chain", lambda *args: stub(latency, "stub rows")),
+        mock.patch.object(
+            server, "get_qa_chain", lambda *args: stub(latency, {"answer": "stub answer", "context": []})
+        ),
+        mock.patch.object(server.answer_cache, "embed", stub_embed),
+    ]
+
+
+async def measure(client, path, form, in_flight, requests):
+    semaphore = asyncio.Semaphore(in_flight)
+
+    async def request(i):
+        async with semaphore:
+            response = await client.post(path, data={**form, "question": f"question {i} {time.monotonic()}"})
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(request(i) for i in range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+async def run(args):
+    transport = httpx.ASGITransport(app=server.app)
+    rates = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for path, form in ENDPOINTS.items():
+            rates[path] = [
+                await measure(client, path, form, in_flight, in_flight * args.requests_per_slot)
+                for in_flight in args.in_flight
+            ]
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per stub LLM or chain call")
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests-per-slot", type=int, default=4)
+    parser.add_argument("--min-speedup", type=float, default=3.0,
+                        help="required throughput at the highest in-flight count relative to one")
+    args = parser.parse_args()
+    args.in_flight = sorted(set([1, *args.in_flight]))
+
+    with contextlib.ExitStack() as stack:
+        for patch in patches(args.latency):
+            stack.enter_context(patch)
+        rates = asyncio.run(run(args))
+
+    print(f"stub latency {args.latency}s; requests/s by in-flight requests")
+    print(f"{'in-flight':>9} " + " ".join(f"{path:>22}" for path in rates))
+    for row, in_flight in enumerate(args.in_flight):
+        print(f"{in_flight:>9} " + " ".join(f"{rates[path][row]:>22.1f}" for path in rates))
+
+    failed = False
+    for path, path_rates in rates.items():
+        speedup = path_rates[-1] / path_rates[0]
+        if speedup < args.min_speedup:
+            print(f"FAIL {path}: {speedup:.1f}x at {args.in_flight[-1]} in flight, "
+                  f"expected at least {args.min_speedup:.1f}x; a handler is blocking the event loop")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Micro-benchmark: stripping special tokens with one str.replace per token
+against the single-pass SpecialTokenRemover.
+
+Run from the app directory:
+
+    python -m benchmarks.special_tokens_bench --files 2000 --file-kb 32
+"""
+import argparse
+import os
+import random
+import string
+import time
+
+from utils.preprocess import SpecialTokenRemover, load_special_tokens_set, SPECIAL_TOKENS_PATH
+
+
+def replace_loop(text, special_tokens_set):
+    # The implementation SpecialTokenRemover replaced
+    for token in special_tokens_set:
+        text = text.replace(token, "")
+    return text
+
+
+def synthetic_tokens(count):
+    named = ["<PAD>", "<UNK>", "<CLS>", "<SEP>", "<MASK_TOKEN>", "<BOS_TOKEN>", "<EOS_TOKEN>",
+             "<|START_OF_TURN_TOKEN|>", "<|END_OF_TURN_TOKEN|>", "<|USER_TOKEN|>",
+             "<|CHATBOT_TOKEN|>", "<|SYSTEM_TOKEN|>"]
+    return set(named + [f"<|RESERVED_{i}|>" for i in range(count - len(named))])
+
+
+def synthetic_repository(files, file_kb, tokens, seed=0):
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10))) for _ in range(2000)]
+    tokens = sorted(tokens)
+    documents = []
+    for _ in range(files):
+        parts, size = [], 0
+        while size < file_kb * 1024:
+            # Roughly one special token per 4 KB, as in chat logs or tokenizer sources
+            part = rng.choice(tokens) if rng.random() < 0.002 else rng.choice(words)
+            parts.append(part)
+            size += len(part) + 1
+        documents.append(" ".join(parts))
+    return documents
+
+
+def timed(func, documents):
+    started = time.perf_counter()
+    result = func(documents)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--file-kb", type=int, default=32)
+    parser.add_argument("--tokens", type=int, default=256, help="synthetic token count if no local copy exists")
+    args = parser.parse_args()
+
+    if os.path.exists(SPECIAL_TOKENS_PATH):
+        tokens = load_special_tokens_set()
+        print(f"Using {len(tokens)} tokens from {SPECIAL_TOKENS_PATH}")
+    else:
+        tokens = synthetic_tokens(args.tokens)
+        print(f"Using {len(tokens)} synthetic tokens")
+    documents = synthetic_repository(args.files, args.file_kb, tokens)
+    total_mb = sum(len(document) for document in documents) / 1024 ** 2
+    print(f"{len(documents)} documents, {total_mb:.1f} MB")
+
+    loop_seconds, expected = timed(lambda docs: [replace_loop(doc, tokens) for doc in docs], documents)
+    remover = SpecialTokenRemover(tokens)
+    single_seconds, result = timed(remover.remove_many, documents)
+    assert result == expected, "outputs differ"
+
+    for name, seconds in (("str.replace loop", loop_seconds), ("single-pass regex", single_seconds)):
+        print(f"{name:>18}: {seconds:8.3f} s  {total_mb / seconds:8.1f} MB/s")
+    print(f"speedup: {loop_seconds / single_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
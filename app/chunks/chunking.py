@@ -10,12 +10,29 @@ from llama_parse import LlamaParse
 from utils.config_settings import config
 from utils.initialize import load_env_variables
 import nest_asyncio
+import re
+import bisect
+import numpy as np
+import tiktoken
 
 nest_asyncio.apply()
 
 env_name = load_env_variables()
 
 LLAMA_PARSE_API_KEY = config[env_name].LLAMA_PARSE_API_KEY
+SEMANTIC_BREAKPOINT_PERCENTILE = config[env_name].SEMANTIC_BREAKPOINT_PERCENTILE
+SEMANTIC_BUFFER_SIZE = config[env_name].SEMANTIC_BUFFER_SIZE
+SEMANTIC_POOL_CHUNK_VECTORS = config[env_name].SEMANTIC_POOL_CHUNK_VECTORS
+TOKEN_CHUNK_SIZE = config[env_name].TOKEN_CHUNK_SIZE
+TOKEN_CHUNK_OVERLAP = config[env_name].TOKEN_CHUNK_OVERLAP
+TOKEN_CHUNK_ENCODING = config[env_name].TOKEN_CHUNK_ENCODING
+
+# Same sentence split as LangChain's SemanticChunker
+SENTENCE_SPLIT = re.compile(r"(?<=[.?!])\s+")
+# Chunk boundaries token_chunking prefers, in order, like RecursiveCharacterTextSplitter
+TOKEN_CHUNK_SEPARATORS = ("\n\n", "\n", " ")
+# How far back from the token limit a chunk may end to reach a separator
+TOKEN_CHUNK_LOOKBACK = 0.25
 
 
 def normal_chunking(documents):
@@ -49,6 +66,168 @@ def semantic_chunking(documents, embedding):
     return semantic_docs
 
 
+def vectorized_semantic_chunking(
+    documents,
+    embedding,
+    breakpoint_percentile=SEMANTIC_BREAKPOINT_PERCENTILE,
+    buffer_size=SEMANTIC_BUFFER_SIZE,
+    pool_chunk_vectors=SEMANTIC_POOL_CHUNK_VECTORS,
+):
+    """
+    Split documents where the meaning shifts, like semantic_chunking, with one
+    embedding call for all documents and breakpoints computed in NumPy.
+
+    Each sentence is embedded together with buffer_size sentences on either
+    side. A chunk ends wherever the cosine distance between neighbouring
+    sentences is above the document's breakpoint_percentile.
+
+    Args:
+        documents (list): LangChain Documents
+        embedding: The embedding model
+        breakpoint_percentile (float): Percentile of distances that marks a breakpoint
+        buffer_size (int): Neighbouring sentences embedded with each sentence
+        pool_chunk_vectors (bool): Also return chunk vectors pooled from the sentence vectors
+
+    Returns:
+        tuple: (chunks, vectors), where vectors is None unless pool_chunk_vectors is set
+    """
+    sentences_per_doc = []
+    windows = []
+    for doc in documents:
+        sentences = [s for s in SENTENCE_SPLIT.split(doc.page_content) if s.strip()]
+        sentences_per_doc.append(sentences)
+        for i in range(len(sentences)):
+            windows.append(" ".join(sentences[max(i - buffer_size, 0):i + buffer_size + 1]))
+    if not windows:
+        return [], ([] if pool_chunk_vectors else None)
+
+    # One call for every document in the batch; the model splits it into requests
+    window_vectors = np.asarray(embedding.embed_documents(windows), dtype=np.float32)
+    window_vectors /= np.maximum(np.linalg.norm(window_vectors, axis=1, keepdims=True), 1e-12)
+
+    chunks, vectors = [], []
+    offset = 0
+    for doc, sentences in zip(documents, sentences_per_doc):
+        doc_vectors = window_vectors[offset:offset + len(sentences)]
+        offset += len(sentences)
+        if not sentences:
+            continue
+        distances = 1.0 - np.einsum("ij,ij->i", doc_vectors[:-1], doc_vectors[1:])
+        if len(distances):
+            threshold = np.percentile(distances, breakpoint_percentile)
+            breakpoints = np.flatnonzero(distances > threshold) + 1
+        else:
+            breakpoints = np.array([], dtype=int)
+        bounds = [0, *breakpoints.tolist(), len(sentences)]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            chunks.append(LangChainDoc(
+                page_content=" ".join(sentences[start:end]), metadata=deepcopy(doc.metadata)
+            ))
+            if pool_chunk_vectors:
+                pooled = doc_vectors[start:end].mean(axis=0)
+                vectors.append((pooled / max(np.linalg.norm(pooled), 1e-12)).tolist())
+    return chunks, (vectors if pool_chunk_vectors else None)
+
+
+def token_chunk_spans(text, encoding, chunk_tokens, chunk_overlap):
+    """
+    Compute chunk boundaries for one text without copying it.
+
+    Chunks are only cut between characters: a character tiktoken encodes as
+    several byte tokens is never split across two chunks.
+
+    Returns:
+        list: (start_char, end_char, token_count) per chunk
+    """
+    tokens = encoding.encode(text, disallowed_special=())
+    if not tokens:
+        return []
+    # Character offset where each token starts, plus the end of the text
+    _, offsets = encoding.decode_with_offsets(tokens)
+    offsets = [*offsets, len(text)]
+
+    def at_character(i):
+        # A token continuing a multi-byte character doesn't move the offset forward
+        return i == 0 or i == len(tokens) or offsets[i] > offsets[i - 1]
+
+    def snap(i, low):
+        # Move i back to the nearest character boundary above low, or forward if there is none
+        j = i
+        while j > low and not at_character(j):
+            j -= 1
+        if j > low:
+            return j
+        while not at_character(i):
+            i += 1
+        return i
+
+    spans = []
+    start = 0
+    while start < len(tokens):
+        end = min(start + chunk_tokens, len(tokens))
+        if end < len(tokens):
+            # Step back to the last paragraph, line or word break in the chunk's tail
+            low = offsets[end - int(chunk_tokens * TOKEN_CHUNK_LOOKBACK)]
+            for separator in TOKEN_CHUNK_SEPARATORS:
+                position = text.rfind(separator, low, offsets[end])
+                if position > offsets[start]:
+                    # Cut at the last token boundary at or before the end of the separator
+                    boundary = bisect.bisect_right(offsets, position + len(separator), start, end) - 1
+                    if boundary > start:
+                        end = boundary
+                        break
+        end = snap(end, start)
+        # The chunk's text can encode to other tokens than the slice of the
+        # whole text's tokens, so count them again and shrink it if needed
+        token_count = len(encoding.encode(text[offsets[start]:offsets[end]], disallowed_special=()))
+        while token_count > chunk_tokens and end - start > 1:
+            shorter = snap(end - (token_count - chunk_tokens), start)
+            if shorter >= end:
+                break
+            end = shorter
+            token_count = len(encoding.encode(text[offsets[start]:offsets[end]], disallowed_special=()))
+        spans.append((offsets[start], offsets[end], token_count))
+        if end == len(tokens):
+            break
+        start = snap(max(end - chunk_overlap, start + 1), start)
+        if start >= end:
+            start = end
+    return spans
+
+
+def token_chunking(
+    documents,
+    chunk_tokens=TOKEN_CHUNK_SIZE,
+    chunk_overlap=TOKEN_CHUNK_OVERLAP,
+    encoding_name=TOKEN_CHUNK_ENCODING,
+):
+    """
+    Split documents into chunks of at most chunk_tokens tiktoken tokens,
+    ending at paragraph, line or word breaks where possible.
+
+    Each text is encoded once; chunks are tracked as character offsets and
+    only sliced out when the output Documents are built.
+
+    Args:
+        documents (list): LangChain Documents
+        chunk_tokens (int): Maximum tokens per chunk
+        chunk_overlap (int): Tokens shared by consecutive chunks
+        encoding_name (str): tiktoken encoding to count tokens with
+
+    Returns:
+        list: Documents with start_index, end_index and token_count in their metadata
+    """
+    encoding = tiktoken.get_encoding(encoding_name)
+    chunks = []
+    for doc in documents:
+        text = doc.page_content
+        for start, end, token_count in token_chunk_spans(text, encoding, chunk_tokens, chunk_overlap):
+            metadata = deepcopy(doc.metadata)
+            metadata.update({"start_index": start, "end_index": end, "token_count": token_count})
+            chunks.append(LangChainDoc(page_content=text[start:end], metadata=metadata))
+    return chunks
+
+
 ####==========================LLAMAINDEX==========================####
 async def llama_parse(folder_path):
     """
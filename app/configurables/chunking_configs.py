@@ -2,6 +2,8 @@ from enum import Enum
 from chunks.chunking import (
     normal_chunking,
     semantic_chunking,
+    vectorized_semantic_chunking,
+    token_chunking,
     llama_parse,
     convert_llama_to_langchain,
     get_page_nodes,
@@ -21,6 +23,8 @@ class ChunkingStrategy(Enum):
     RECURSIVE = "recursive"
     MARKDOWN = "markdown"
     SEMANTIC = "semantic"
+    VECTORIZED_SEMANTIC = "vectorized_semantic"
+    TOKEN = "token"
 
 def get_chunking_strategy(strategy: ChunkingStrategy, documents: str, embedding_model=None):
     try:
@@ -36,7 +40,24 @@ def get_chunking_strategy(strategy: ChunkingStrategy, documents: str, embedding_
         return convert_llama_to_langchain(sub_docs)
     elif strategy_enum == ChunkingStrategy.SEMANTIC:
         return semantic_chunking(documents, embedding_model)
+    elif strategy_enum == ChunkingStrategy.TOKEN:
+        return token_chunking(documents)
+    elif strategy_enum == ChunkingStrategy.VECTORIZED_SEMANTIC:
+        return vectorized_semantic_chunking(documents, embedding_model, pool_chunk_vectors=False)[0]
     else:
         raise ValueError(f"Unknown chunking strategy: {strategy}")
 
 
+def get_chunks_with_vectors(strategy: ChunkingStrategy, documents, embedding_model=None):
+    """
+    Chunk documents and, for strategies that embed while chunking, return
+    the chunk vectors too so they don't have to be embedded again.
+
+    Returns:
+        tuple: (chunks, vectors), where vectors is None if the chunks still need embedding
+    """
+    if strategy.lower() == ChunkingStrategy.VECTORIZED_SEMANTIC.value:
+        return vectorized_semantic_chunking(documents, embedding_model)
+    return get_chunking_strategy(strategy, documents, embedding_model), None
+
+
@@ -3,13 +3,40 @@ from utils.config_settings import config
 
 env_name = load_env_variables()
 from utils.initialize import cohere_embedding_model, openai_embed_model
+from utils.embedding_cache import CachedEmbeddings, get_embedding_cache
+from utils.client_registry import client_registry
 
 def get_embedding_model(model_name: str):
+    """
+    Return the shared embedding model for a provider, building it on first use.
+    """
+    provider = _provider(model_name)
+    return client_registry.get("embedding", provider, lambda: _build_embedding_model(provider))
+
+async def aget_embedding_model(model_name: str):
+    """
+    Like get_embedding_model, for async handlers: the first build runs off the event loop.
+    """
+    provider = _provider(model_name)
+    return await client_registry.aget("embedding", provider, lambda: _build_embedding_model(provider))
+
+def _provider(model_name):
+    # Default to Cohere if unknown name is passed
+    return 'openai' if model_name == 'openai' else 'cohere'
+
+def _build_embedding_model(provider):
     env = load_env_variables()
-    if model_name == 'openai':
-        return openai_embed_model(api_key=config[env].OPENAI_API_KEY)
-    elif model_name == 'cohere':
-        return cohere_embedding_model(config[env].COHERE_API_KEY)
+    if provider == 'openai':
+        model = openai_embed_model(
+            api_key=config[env].OPENAI_API_KEY,
+            http_client=client_registry.http_client(),
+            http_async_client=client_registry.async_http_client(),
+        )
     else:
-        # Default to Cohere if unknown name is passed
-        return cohere_embedding_model(config[env].COHERE_API_KEY)
\ No newline at end of file
+        model = cohere_embedding_model(
+            config[env].COHERE_API_KEY,
+            http_client=client_registry.http_client(),
+            http_async_client=client_registry.async_http_client(),
+        )
+    # Serve repeated texts from the shared on-disk embedding cache
+    return CachedEmbeddings(model, get_embedding_cache())
\ No newline at end of file
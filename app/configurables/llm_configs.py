@@ -2,16 +2,39 @@ from utils.initialize import cohere_llm_model, openai_llm_model
 
 from utils.initialize import load_env_variables
 from utils.config_settings import config
+from utils.client_registry import client_registry
 
 env_name = load_env_variables()
 
 COHERE_API_KEY = config[env_name].COHERE_API_KEY
 
 def get_llm_model(model_name: str, temperature: float = 0.7):
+    """
+    Return the shared chat model for a provider and temperature, building it on first use.
+    """
+    return client_registry.get("llm", model_name, _llm_factory(model_name), temperature=float(temperature))
+
+async def aget_llm_model(model_name: str, temperature: float = 0.7):
+    """
+    Like get_llm_model, for async handlers: the first build runs off the event loop.
+    """
+    return await client_registry.aget("llm", model_name, _llm_factory(model_name), temperature=float(temperature))
+
+def _llm_factory(model_name):
     env = load_env_variables()
     if model_name == 'openai':
-        return openai_llm_model(api_key=config[env].OPENAI_API_KEY, temperature=temperature)
+        return lambda temperature: openai_llm_model(
+            api_key=config[env].OPENAI_API_KEY,
+            temperature=temperature,
+            http_client=client_registry.http_client(),
+            http_async_client=client_registry.async_http_client(),
+        )
     elif model_name == 'cohere':
-        return cohere_llm_model(config[env].COHERE_API_KEY, temperature=temperature)
+        return lambda temperature: cohere_llm_model(
+            config[env].COHERE_API_KEY,
+            temperature=temperature,
+            http_client=client_registry.http_client(),
+            http_async_client=client_registry.async_http_client(),
+        )
     else:
         raise ValueError(f"Unknown LLM model: {model_name}")
\ No newline at end of file
@@ -6,90 +6,178 @@ from pinecone import ServerlessSpec
 from langchain.docstore import InMemoryDocstore
 from langchain_chroma import Chroma
 from langchain_pinecone import PineconeVectorStore
+from stores.faiss_store import get_faiss_store
+from utils.client_registry import client_registry
 
 import time
+import uuid
+import chromadb
 import faiss
 import numpy as np
 env_name = load_env_variables()
 
+PINECONE_UPSERT_BATCH_SIZE = 100
+PINECONE_DELETE_BATCH_SIZE = 1000
+
 
 def get_vector_store(store_name: str, embeddings, embedding_model,embedding_model_name):
     env = load_env_variables()
     if store_name.lower() == "faiss":
-        # Create the FAISS index
-        dimension = len(embeddings[0])
-        faiss_index = faiss.IndexFlatL2(dimension)  # Using L2 (Euclidean distance) for flat index
-        
-        # Create an in-memory document store
-        docstore = InMemoryDocstore()
-        
-        # Create the index to docstore id mapping
-        index_to_docstore_id = {i: str(i) for i in range(len(embeddings))}
-        
-        # Initialize the FAISS vector store
-        faiss_vector_store = FAISS(
-            index=faiss_index,
-            docstore=docstore,
-        
-            index_to_docstore_id=index_to_docstore_id,
-            embedding_function=embedding_model
+        # The on-disk FAISS store is opened once per process and shared by all requests
+        return get_faiss_store(embedding_model, embedding_model_name)
+
+    elif store_name.lower() == "pinecone":
+        # The index handle is shared across requests: listing indexes and opening one
+        # costs several round trips. The store wrapping it is cheap and uses the
+        # caller's embedding model, which may be wrapped for batching.
+        index = client_registry.get("vector_store", "pinecone", _pinecone_index, embedding_model_name=embedding_model_name)
+        return index, PineconeVectorStore(index=index, embedding=embedding_model)
+
+    elif store_name.lower() == "chroma":
+        client = client_registry.get("vector_store", "chroma", _chroma_client)
+        return _chroma_store(client, embedding_model)
+
+    else:
+        raise ValueError(f"Unknown vector store: {store_name}")
+
+
+def _pinecone_index(embedding_model_name):
+    pc,index_name = pinecone_setup()
+
+    existing_indexes = [index_info["name"] for index_info in pc.list_indexes()]
+    if index_name not in existing_indexes:
+        print(f"Creating new index: {index_name}")
+    
+        try:
+            if embedding_model_name == "openai":
+                pc.create_index(
+                    name=index_name,
+                    dimension=1536,
+                    metric="cosine",
+                    spec=ServerlessSpec(
+                        cloud="aws",
+                        region="us-east-1"
+                    ),
+                    deletion_protection="disabled"
+                )
+            elif embedding_model_name == "cohere":
+                pc.create_index(
+                    name=index_name,
+                    dimension=1024,
+                    metric="cosine",
+                    spec=ServerlessSpec(
+                        cloud="aws",
+                        region="us-east-1"
+                    ),
+                    deletion_protection="disabled"
+                )
+            print(f"Index {index_name} created successfully.")
+        except Exception as e:
+            print(f"Error creating index: {e}")
+            
+    index = pc.Index(index_name)
+
+    print(index.describe_index_stats())
+    return index
+
+
+def _chroma_client():
+    return chromadb.PersistentClient(path="./chroma_langchain_db")  # Where to save data locally, remove if not necessary
+
+
+def _chroma_store(client, embedding_model):
+    chroma_vector_store = Chroma(
+        client=client,
+        collection_name="test_collection",
+        embedding_function=embedding_model,
+        )
+    return chroma_vector_store
+
+
+def add_documents_with_embeddings(store_name: str, vector_store, documents, embeddings, ids=None):
+    """
+    Write documents together with their precomputed embeddings into a vector store.
+
+    The vectors are stored as given, so the store's embedding model is never
+    called again for these documents.
+
+    Args:
+        store_name (str): One of "faiss", "pinecone" or "chroma"
+        vector_store: The store returned by get_vector_store
+        documents (list): LangChain Documents, one per embedding
+        embeddings (list): Embedding vectors aligned with documents
+        ids (list, optional): Ids to store the documents under
+
+    Returns:
+        list: The ids of the written documents
+    """
+    if len(documents) != len(embeddings):
+        raise ValueError(
+            f"Got {len(documents)} documents but {len(embeddings)} embeddings."
+        )
+    if not documents:
+        return []
+
+    ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in documents]
+    texts = [doc.page_content for doc in documents]
+    metadatas = [dict(doc.metadata) for doc in documents]
+
+    if store_name.lower() == "faiss":
+        return vector_store.add_embeddings(
+            text_embeddings=list(zip(texts, embeddings)), metadatas=metadatas, ids=ids
         )
-        
-        # Add embeddings to the vector store
-        faiss_vector_store.index.add(np.array(embeddings))
-        
-        return faiss_vector_store
 
     elif store_name.lower() == "pinecone":
-        pc,index_name = pinecone_setup()
-
-        existing_indexes = [index_info["name"] for index_info in pc.list_indexes()]
-        if index_name not in existing_indexes:
-            print(f"Creating new index: {index_name}")
-        
-            try:
-                if embedding_model_name == "openai":
-                    pc.create_index(
-                        name=index_name,
-                        dimension=1536,
-                        metric="cosine",
-                        spec=ServerlessSpec(
-                            cloud="aws",
-                            region="us-east-1"
-                        ),
-                        deletion_protection="disabled"
-                    )
-                elif embedding_model_name == "cohere":
-                    pc.create_index(
-                        name=index_name,
-                        dimension=1024,
-                        metric="cosine",
-                        spec=ServerlessSpec(
-                            cloud="aws",
-                            region="us-east-1"
-                        ),
-                        deletion_protection="disabled"
-                    )
-                print(f"Index {index_name} created successfully.")
-            except Exception as e:
-                print(f"Error creating index: {e}")
-                
-        index = pc.Index(index_name)
-
-        print(index.describe_index_stats())
-        pinecone_vector_store = PineconeVectorStore(index=index, embedding=embedding_model)
-        return index,pinecone_vector_store
-
-
-        
+        # PineconeVectorStore keeps the page content under its text key
+        vectors = []
+        for doc_id, text, embedding, metadata in zip(ids, texts, embeddings, metadatas):
+            metadata[vector_store._text_key] = text
+            vectors.append({"id": doc_id, "values": list(embedding), "metadata": metadata})
+        for start in range(0, len(vectors), PINECONE_UPSERT_BATCH_SIZE):
+            vector_store._index.upsert(
+                vectors=vectors[start:start + PINECONE_UPSERT_BATCH_SIZE],
+                namespace=vector_store._namespace,
+            )
+        return ids
+
     elif store_name.lower() == "chroma":
+        # Chroma rejects empty metadata dicts, so pass None for those rows
+        vector_store._collection.upsert(
+            ids=ids,
+            embeddings=[list(embedding) for embedding in embeddings],
+            metadatas=[metadata or None for metadata in metadatas],
+            documents=texts,
+        )
+        return ids
+
+    else:
+        raise ValueError(f"Unknown vector store: {store_name}")
+
+
+def delete_documents(store_name: str, vector_store, ids):
+    """
+    Delete documents by id from a vector store. Ids the store doesn't hold are ignored.
+
+    Args:
+        store_name (str): One of "faiss", "pinecone" or "chroma"
+        vector_store: The store returned by get_vector_store
+        ids (list): Ids returned by add_documents_with_embeddings
+    """
+    ids = list(ids)
+    if not ids:
+        return
 
-        chroma_vector_store = Chroma(
-            collection_name="test_collection",
-            embedding_function=embedding_model,
-            persist_directory="./chroma_langchain_db",  # Where to save data locally, remove if not necessary
+    if store_name.lower() == "faiss":
+        vector_store.delete(ids)
+
+    elif store_name.lower() == "pinecone":
+        for start in range(0, len(ids), PINECONE_DELETE_BATCH_SIZE):
+            vector_store._index.delete(
+                ids=ids[start:start + PINECONE_DELETE_BATCH_SIZE], namespace=vector_store._namespace
             )
-        return chroma_vector_store
+
+    elif store_name.lower() == "chroma":
+        vector_store.delete(ids=ids)
 
     else:
         raise ValueError(f"Unknown vector store: {store_name}")
@@ -1,22 +1,202 @@
+import asyncio
+import hashlib
+import json
+import time
+
 from langchain_experimental.graph_transformers import LLMGraphTransformer
 from chunks.chunking import *
+from utils.answer_cache import answer_cache, document_sources
+from utils.concurrency import run_blocking
+from utils.initialize import load_env_variables
+from utils.config_settings import config
+
+env_name = load_env_variables()
+
+GRAPH_EXTRACTION_CONCURRENCY = config[env_name].GRAPH_EXTRACTION_CONCURRENCY
+GRAPH_WRITE_BATCH_SIZE = config[env_name].GRAPH_WRITE_BATCH_SIZE
+
+# Same labels and relationship as Neo4jGraph.add_graph_documents(baseEntityLabel=True, include_source=True).
+# Entities are merged on __Entity__ and id alone, which the constraint makes unique,
+# and their type is added as a label; merging on both labels would try to create a
+# second node, and break the constraint, when one id is extracted with another type.
+SCHEMA_QUERIES = [
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (e:__Entity__) REQUIRE e.id IS UNIQUE",
+    "CREATE INDEX IF NOT EXISTS FOR (d:Document) ON (d.id)",
+]
+
+DOCUMENTS_QUERY = """
+UNWIND $documents AS document
+MERGE (d:Document {id: document.id})
+SET d.text = document.text, d += document.properties
+WITH d, document
+UNWIND document.nodes AS extracted
+MERGE (entity:__Entity__ {id: extracted.id})
+SET entity += extracted.properties
+WITH d, entity, extracted
+CALL apoc.create.addLabels(entity, [extracted.type]) YIELD node
+MERGE (d)-[:MENTIONS]->(entity)
+"""
+
+RELATIONSHIPS_QUERY = """
+UNWIND $relationships AS relationship
+MERGE (source:__Entity__ {id: relationship.source_id})
+MERGE (target:__Entity__ {id: relationship.target_id})
+WITH source, target, relationship
+CALL apoc.create.addLabels(source, [relationship.source_type]) YIELD node AS labeled_source
+CALL apoc.create.addLabels(target, [relationship.target_type]) YIELD node AS labeled_target
+CALL apoc.merge.relationship(source, relationship.type, {}, relationship.properties, target) YIELD rel
+RETURN count(rel)
+"""
+
+
+def _label(name):
+    return name.replace("`", "").replace(" ", "_")
+
+
+def _properties(values):
+    # Neo4j properties must be primitives or lists of primitives
+    properties = {}
+    for key, value in values.items():
+        if value is None:
+            continue
+        if isinstance(value, (str, int, float, bool)):
+            properties[key] = value
+        elif isinstance(value, (list, tuple)) and all(isinstance(item, (str, int, float, bool)) for item in value):
+            properties[key] = list(value)
+        else:
+            properties[key] = json.dumps(value, default=str)
+    return properties
+
+
+def write_graph_documents(graph, graph_documents):
+    """
+    Write graph documents to Neo4j in two UNWIND transactions, one for
+    documents and entities and one for relationships.
+
+    Args:
+        graph (Neo4jGraph): The Neo4j graph object
+        graph_documents (list): GraphDocuments from LLMGraphTransformer
+    """
+    documents, relationships = [], []
+    for graph_document in graph_documents:
+        source = graph_document.source
+        documents.append({
+            "id": source.metadata.get("id") or hashlib.md5(source.page_content.encode("utf-8")).hexdigest(),
+            "text": source.page_content,
+            "properties": _properties({key: value for key, value in source.metadata.items() if key != "id"}),
+            "nodes": [
+                {"id": node.id, "type": _label(node.type), "properties": _properties(node.properties)}
+                for node in graph_document.nodes
+            ],
+        })
+        relationships.extend(
+            {
+                "source_id": relationship.source.id,
+                "source_type": _label(relationship.source.type),
+                "target_id": relationship.target.id,
+                "target_type": _label(relationship.target.type),
+                "type": _label(relationship.type).upper(),
+                "properties": _properties(relationship.properties),
+            }
+            for relationship in graph_document.relationships
+        )
+    graph.query(DOCUMENTS_QUERY, {"documents": documents})
+    if relationships:
+        graph.query(RELATIONSHIPS_QUERY, {"relationships": relationships})
+
+
+async def abuild_graph(
+    documents,
+    llm,
+    graph,
+    concurrency=GRAPH_EXTRACTION_CONCURRENCY,
+    batch_size=GRAPH_WRITE_BATCH_SIZE,
+    on_progress=None,
+):
+    """
+    Extract entities and relationships from chunks concurrently and write them to Neo4j as they finish.
+
+    Up to concurrency chunks are sent to the LLM at once. Finished extractions
+    are written in batches of batch_size while the rest are still running.
+    A chunk whose extraction fails is counted and skipped, unless every chunk fails.
+
+    Args:
+        documents (list): LangChain Documents, usually chunks
+        llm: The LLM used for extraction
+        graph (Neo4jGraph): The Neo4j graph object
+        on_progress (callable, optional): Called with the stats dict after each batch is written
+
+    Returns:
+        dict: Counts of chunks, nodes, relationships and failures, elapsed seconds and chunks per second
+    """
+    transformer = LLMGraphTransformer(llm=llm)
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.monotonic()
+    stats = {"chunks": 0, "nodes": 0, "relationships": 0, "failed": 0, "elapsed_seconds": 0.0, "chunks_per_second": 0.0}
+    errors = []
+
+    def update_rate():
+        stats["elapsed_seconds"] = time.monotonic() - started
+        stats["chunks_per_second"] = stats["chunks"] / stats["elapsed_seconds"] if stats["elapsed_seconds"] else 0.0
+
+    async def extract(document):
+        async with semaphore:
+            return await transformer.aprocess_response(document)
+
+    async def write(batch):
+        await run_blocking(write_graph_documents, graph, batch)
+        # Answers are built from the graph, so drop those cached from these sources
+        answer_cache.invalidate_sources(document_sources(graph_document.source for graph_document in batch))
+        stats["chunks"] += len(batch)
+        stats["nodes"] += sum(len(graph_document.nodes) for graph_document in batch)
+        stats["relationships"] += sum(len(graph_document.relationships) for graph_document in batch)
+        update_rate()
+        if on_progress:
+            on_progress(dict(stats))
+
+    await run_blocking(lambda: [graph.query(query) for query in SCHEMA_QUERIES])
+    tasks = [asyncio.ensure_future(extract(document)) for document in documents]
+    try:
+        batch = []
+        for task in asyncio.as_completed(tasks):
+            try:
+                graph_document = await task
+            except Exception as e:
+                print(f"Graph extraction failed for a chunk: {str(e)}")
+                stats["failed"] += 1
+                errors.append(e)
+                continue
+            batch.append(graph_document)
+            if len(batch) >= batch_size:
+                # Extractions already started keep running while the batch is written
+                await write(batch)
+                batch = []
+        if batch:
+            await write(batch)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if errors and not stats["chunks"]:
+        # Every extraction failed, e.g. a bad API key; don't report that as an empty graph
+        raise errors[0]
+    update_rate()
+    return stats
 
 
 def add_graph_to_db(documents, llm, graph):
     """
-    Add document chunks to the Neo4j graph database.
+    Add document chunks to the Neo4j graph database, extracting from many chunks at once.
 
     Args:
+        documents (list): LangChain Documents, usually chunks
+        llm: The LLM used for extraction
         graph (Neo4jGraph): The Neo4j graph object
 
     Returns:
         str: Success message
     """
-    llm_transformer = LLMGraphTransformer(llm=llm)
-    graph_documents = llm_transformer.convert_to_graph_documents(documents)
-    print(graph_documents)
-    graph.add_graph_documents(
-        graph_documents, baseEntityLabel=True, include_source=True
-    )
-    print("Docs Added")
+    stats = asyncio.run(abuild_graph(documents, llm, graph))
+    print(f"Graph built from {stats['chunks']} chunks ({stats['failed']} failed) in "
+          f"{stats['elapsed_seconds']:.1f}s, {stats['chunks_per_second']:.2f} chunks/s.")
     return "Graph added to DB"
@@ -1,5 +1,8 @@
 # aws_loader.py
 import boto3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
 from langchain_community.document_loaders import S3DirectoryLoader
 from unstructured.partition.pdf import partition_pdf  # Unstructured PDF handling
@@ -20,18 +23,59 @@ env_name = load_env_variables()
 AWS_BUCKET_NAME = config[env_name].AWS_BUCKET_NAME
 AWS_SECRET_ACCESS_KEY = config[env_name].AWS_SECRET_ACCESS_KEY
 AWS_ACCESS_KEY_ID = config[env_name].AWS_ACCESS_KEY_ID
+AWS_ENDPOINT_URL = config[env_name].AWS_ENDPOINT_URL
+AWS_CONCURRENT_DOWNLOADS = config[env_name].AWS_CONCURRENT_DOWNLOADS
+AWS_DOWNLOAD_WORKERS = config[env_name].AWS_DOWNLOAD_WORKERS
+AWS_PARSE_WORKERS = config[env_name].AWS_PARSE_WORKERS
+AWS_RANGE_THRESHOLD = config[env_name].AWS_RANGE_THRESHOLD
+AWS_RANGE_SIZE = config[env_name].AWS_RANGE_SIZE
+AWS_RANGE_WORKERS = config[env_name].AWS_RANGE_WORKERS
+
+# Size of the pieces streamed from a response body to disk
+STREAM_CHUNK_SIZE = 1024 ** 2
 
 
 def process_file_callback(file_key, file_content):
     """
     Extract text from the file content based on the file type and return it.
     """
-    extracted_text = f"\nProcessing file: {file_key}\nFile size: {len(file_content)} bytes."
+    return extract_text(file_key, len(file_content), file_content=file_content)
+
+
+def remove_file(file_path):
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+
+def process_downloaded_file(file_key, file_path):
+    """
+    Extract text from a file downloaded to disk, then delete the file.
+    Runs in the parsing process pool, so it must stay a module-level function.
+    """
+    try:
+        return extract_text(file_key, os.path.getsize(file_path), file_path=file_path)
+    finally:
+        os.remove(file_path)
+
+
+def extract_text(file_key, file_size, file_content=None, file_path=None):
+    """
+    Extract text from in-memory file content or a file on disk based on the file type.
+    """
+    def source():
+        # Each partition function takes either a file-like object or a filename
+        if file_path is not None:
+            return {"filename": file_path}
+        return {"file": BytesIO(file_content)}
+
+    extracted_text = f"\nProcessing file: {file_key}\nFile size: {file_size} bytes."
 
     # Handle PDF files
     if file_key.endswith('.pdf'):
         try:
-            pdf_parts = partition_pdf(file=BytesIO(file_content))
+            pdf_parts = partition_pdf(**source())
             pdf_text = "\n".join([str(part) for part in pdf_parts])
             extracted_text += f"\nExtracted text from {file_key}:\n{pdf_text}"
         except Exception as e:
@@ -40,7 +84,7 @@ def process_file_callback(file_key, file_content):
     # Handle DOCX files
     elif file_key.endswith('.docx'):
         try:
-            docx_parts = partition_docx(file=BytesIO(file_content))
+            docx_parts = partition_docx(**source())
             docx_text = "\n".join([str(part) for part in docx_parts])
             extracted_text += f"\nExtracted text from {file_key}:\n{docx_text}"
         except Exception as e:
@@ -49,7 +93,7 @@ def process_file_callback(file_key, file_content):
     # Handle image files (JPG, PNG) using Unstructured
     elif file_key.lower().endswith(('.png', '.jpeg', '.jpg')):
         try:
-            image_parts = partition_image(file=BytesIO(file_content))
+            image_parts = partition_image(**source())
             image_text = "\n".join([str(part) for part in image_parts])
             extracted_text += f"\nExtracted text from image {file_key}:\n{image_text}"
         except Exception as e:
@@ -67,6 +111,9 @@ class AWSDataLoader(BaseDataLoader):
         self.bucket_name = AWS_BUCKET_NAME
         self.aws_access_key_id = AWS_ACCESS_KEY_ID  # Initialize here
         self.aws_secret_access_key = AWS_SECRET_ACCESS_KEY
+        self.concurrent = AWS_CONCURRENT_DOWNLOADS
+        self.download_workers = AWS_DOWNLOAD_WORKERS
+        self.parse_workers = AWS_PARSE_WORKERS
 
         
          # Initialize S3DirectoryLoader only if file_types includes 'all'
@@ -83,6 +130,8 @@ class AWSDataLoader(BaseDataLoader):
         try:
             if 'all' in self.file_types:
                 extracted_texts = self.process_all_files_s3_directory()
+            elif self.concurrent:
+                extracted_texts = list(self.iter_files_concurrently())
             else:
                 extracted_texts = self.process_files_by_type()
         except (NoCredentialsError, PartialCredentialsError) as e:
@@ -117,57 +166,207 @@ class AWSDataLoader(BaseDataLoader):
 
         return documents
 
-    def process_files_by_type(self):
+    def iter_data(self, file_type):
         """
-        Process specific file types (e.g., pdf, docx, image) from S3.
-        Returns a list of LangChain Document objects.
+        Yields documents from the S3 bucket as each object is processed.
         """
-        # Initialize the S3 client
-        self.s3_client = boto3.client(
+        self.file_types = file_type.split(",")
+        if 'all' in self.file_types:
+            yield from self.process_all_files_s3_directory()
+        elif self.concurrent:
+            yield from self.iter_files_concurrently()
+        else:
+            yield from self.iter_files_by_type()
+
+    def count_documents(self, file_type):
+        """
+        Returns how many objects match the file types, or None for 'all'.
+        """
+        self.file_types = file_type.split(",")
+        if 'all' in self.file_types:
+            return None
+        self.s3_client = self.create_s3_client()
+        return sum(1 for _ in self.iter_matching_objects())
+
+    def create_s3_client(self):
+        """
+        Create an S3 client whose connection pool fits the download workers
+        and their ranged GETs. AWS_ENDPOINT_URL points it at a local stand-in
+        such as MinIO or moto.
+        """
+        return boto3.client(
             "s3",
             aws_access_key_id=self.aws_access_key_id,
             aws_secret_access_key=self.aws_secret_access_key,
+            endpoint_url=AWS_ENDPOINT_URL,
+            config=BotoConfig(max_pool_connections=max(self.download_workers * AWS_RANGE_WORKERS, 10)),
         )
 
-        extracted_documents = []
+    def iter_matching_objects(self):
+        """
+        Yields (object, file_type) for every object whose key matches the requested file types.
+        """
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(Bucket=self.bucket_name)
+
+        file_type_filters = {
+            "pdf": ".pdf",
+            "docx": ".docx",
+            "image": (".png", ".jpeg", ".jpg"),
+        }
+
+        for page in pages:
+            if 'Contents' in page:
+                for obj in page['Contents']:
+                    file_key = obj['Key']
+                    for file_type in self.file_types:
+                        extension = file_type_filters.get(file_type.strip())
+                        if extension and (
+                            (isinstance(extension, tuple) and file_key.endswith(extension)) or 
+                            file_key.endswith(extension)
+                        ):
+                            yield obj, file_type
+
+    def download_object(self, file_key, size):
+        """
+        Stream an object to a temporary file and return its path.
+        Objects above AWS_RANGE_THRESHOLD are fetched with up to
+        AWS_RANGE_WORKERS ranged GETs at once, each written at its offset.
+        """
+        suffix = os.path.splitext(file_key)[1]
+        fd, file_path = tempfile.mkstemp(suffix=suffix, dir=self.download_folder)
         try:
-            paginator = self.s3_client.get_paginator('list_objects_v2')
-            pages = paginator.paginate(Bucket=self.bucket_name)
-
-            file_type_filters = {
-                "pdf": ".pdf",
-                "docx": ".docx",
-                "image": (".png", ".jpeg", ".jpg"),
-            }
-
-            for page in pages:
-                if 'Contents' in page:
-                    for obj in page['Contents']:
-                        file_key = obj['Key']
-                        for file_type in self.file_types:
-                            extension = file_type_filters.get(file_type.strip())
-                            if extension and (
-                                (isinstance(extension, tuple) and file_key.endswith(extension)) or 
-                                file_key.endswith(extension)
-                            ):
-                                # Retrieve file content directly from S3
-                                response = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_key)
-                                file_content = response['Body'].read()  # Retrieve content directly
-                                
-                                # Extract text content from the file
-                                extracted_text = process_file_callback(file_key, file_content)
-
-                                # Create LangChain Document object with extracted text and metadata
-                                document = Document(
-                                    page_content=extracted_text,  # The extracted text/content
-                                    metadata={
-                                        "source": file_key,       # File name or path in S3
-                                        "file_type": file_type    # File type (pdf, docx, image)
-                                    }
-                                )
-                                extracted_documents.append(document)  # Collect LangChain Documents
+            with os.fdopen(fd, "wb") as file:
+                if size <= AWS_RANGE_THRESHOLD:
+                    response = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_key)
+                    for chunk in response['Body'].iter_chunks(STREAM_CHUNK_SIZE):
+                        file.write(chunk)
+                else:
+                    file.truncate(size)
+                    starts = range(0, size, AWS_RANGE_SIZE)
+                    with ThreadPoolExecutor(max_workers=min(AWS_RANGE_WORKERS, len(starts))) as ranges:
+                        # list() re-raises the first failed range
+                        list(ranges.map(lambda start: self.download_range(file_key, size, start, fd), starts))
+        except BaseException:
+            os.remove(file_path)
+            raise
+        return file_path
+
+    def download_range(self, file_key, size, start, fd):
+        """
+        Fetch one AWS_RANGE_SIZE range of an object and write it at its offset in fd.
+        """
+        end = min(start + AWS_RANGE_SIZE, size) - 1
+        response = self.s3_client.get_object(
+            Bucket=self.bucket_name, Key=file_key, Range=f"bytes={start}-{end}"
+        )
+        offset = start
+        for chunk in response['Body'].iter_chunks(STREAM_CHUNK_SIZE):
+            os.pwrite(fd, chunk, offset)
+            offset += len(chunk)
+
+    def iter_files_concurrently(self):
+        """
+        Process specific file types from S3 with overlapping downloads and parsing.
+
+        Objects are downloaded to disk by a thread pool and parsed by a process
+        pool, so network and CPU work run at the same time. The number of
+        objects in flight is bounded to keep disk and memory use flat.
+        Yields LangChain Documents in completion order.
+        """
+        self.s3_client = self.create_s3_client()
+        max_in_flight = 2 * (self.download_workers + self.parse_workers)
+
+        with ThreadPoolExecutor(max_workers=self.download_workers) as downloads, \
+                ProcessPoolExecutor(max_workers=self.parse_workers) as parsers:
+            objects = self.iter_matching_objects()
+            pending_downloads = {}
+            pending_parses = {}
+            listed_all = False
+
+            try:
+                while True:
+                    while not listed_all and len(pending_downloads) + len(pending_parses) < max_in_flight:
+                        matched = next(objects, None)
+                        if matched is None:
+                            listed_all = True
+                            break
+                        obj, file_type = matched
+                        future = downloads.submit(self.download_object, obj['Key'], obj['Size'])
+                        pending_downloads[future] = (obj['Key'], file_type)
+
+                    if not pending_downloads and not pending_parses:
+                        break
+
+                    done, _ = wait([*pending_downloads, *pending_parses], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in pending_downloads:
+                            file_key, file_type = pending_downloads.pop(future)
+                            try:
+                                file_path = future.result()
+                            except Exception as e:
+                                print(f"Error downloading {file_key}: {str(e)}")
+                                continue
+                            parse = parsers.submit(process_downloaded_file, file_key, file_path)
+                            pending_parses[parse] = (file_key, file_type, file_path)
+                        else:
+                            file_key, file_type, _ = pending_parses.pop(future)
+                            try:
+                                extracted_text = future.result()
+                            except Exception as e:
+                                print(f"Error processing {file_key}: {str(e)}")
+                                continue
+                            yield Document(
+                                page_content=extracted_text,
+                                metadata={"source": file_key, "file_type": file_type},
+                            )
+            finally:
+                # Closed early or failed: delete the files nothing will parse.
+                # Parses that already started delete their own file.
+                for future in pending_downloads:
+                    if not future.cancel():
+                        try:
+                            remove_file(future.result())
+                        except Exception:
+                            pass
+                for future, (_, _, file_path) in pending_parses.items():
+                    if future.cancel():
+                        remove_file(file_path)
+
+    def process_files_by_type(self):
+        """
+        Process specific file types (e.g., pdf, docx, image) from S3.
+        Returns a list of LangChain Document objects.
+        """
+        return list(self.iter_files_by_type())
+
+    def iter_files_by_type(self):
+        """
+        Process specific file types (e.g., pdf, docx, image) from S3.
+        Yields a LangChain Document as soon as each object has been parsed.
+        """
+        # Initialize the S3 client
+        self.s3_client = self.create_s3_client()
+
+        try:
+            for obj, file_type in self.iter_matching_objects():
+                file_key = obj['Key']
+                # Retrieve file content directly from S3
+                response = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_key)
+                file_content = response['Body'].read()  # Retrieve content directly
+
+                # Extract text content from the file
+                extracted_text = process_file_callback(file_key, file_content)
+
+                # Create LangChain Document object with extracted text and metadata
+                document = Document(
+                    page_content=extracted_text,  # The extracted text/content
+                    metadata={
+                        "source": file_key,       # File name or path in S3
+                        "file_type": file_type    # File type (pdf, docx, image)
+                    }
+                )
+                yield document
 
         except Exception as e:
             print(f"Error processing files: {str(e)}")
-
-        return extracted_documents 
\ No newline at end of file
@@ -33,6 +33,17 @@ class BaseDataLoader(ABC):
         """
         pass
 
+    def iter_data(self, file_type):
+        """
+        Yield loaded documents one at a time.
+
+        Loaders that can stream override this; the default falls back to load_data.
+        """
+        documents = self.load_data(file_type)
+        # Some loaders return a message string when nothing was found
+        if isinstance(documents, list):
+            yield from documents
+
     def process_files(self, files, file_type_folder):
         """
         Process files and save them to the local system.
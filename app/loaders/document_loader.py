@@ -1,3 +1,4 @@
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from unstructured.partition.auto import partition
 from unstructured.partition.csv import partition_csv
 from unstructured.partition.xlsx import partition_xlsx
@@ -17,6 +18,33 @@ from utils.config_settings import config
 env_name = load_env_variables()
 
 FILES = config[env_name].FILES 
+DOCUMENT_PARSE_WORKERS = config[env_name].DOCUMENT_PARSE_WORKERS
+
+
+def partition_by_page(loader_func, file_path):
+    """
+    Partitions a file and groups all of its elements into one Document per page.
+    Runs in the parsing process pool, so it must stay a module-level function.
+    
+    Args:
+        loader_func (function): The unstructured partition function for the file type.
+        file_path (str): The file to partition.
+    
+    Returns:
+        list: LangChain Documents with source and page metadata, in page order.
+    """
+    pages = {}
+    for element in loader_func(file_path):
+        if not element.text:
+            continue
+        # Formats without pages (txt, csv, ...) are treated as a single page
+        page_number = getattr(element.metadata, "page_number", None) or 1
+        pages.setdefault(page_number, []).append(element.text)
+
+    return [
+        Document(page_content="\n\n".join(texts), metadata={"source": file_path, "page": page_number})
+        for page_number, texts in sorted(pages.items())
+    ]
 
 def return_loaded_content(all_data):
     """
@@ -47,6 +75,7 @@ class DocumentLoader:
             file_paths (list): List of file paths to process.
         """
         self.file_paths = FILES.split(",")  # List of file paths
+        self.parse_workers = DOCUMENT_PARSE_WORKERS
         self.loader_map = {
             "csv": partition_csv,
             "xlsx": partition_xlsx,
@@ -90,15 +119,53 @@ class DocumentLoader:
         Returns:
             list: A list of LangChain Document objects extracted from all the files.
         """
-        all_data = []
+        return list(self.iter_data(file_type))
+
+    def iter_data(self, file_type):
+        """
+        Yields one LangChain Document per page of every file as soon as the file
+        has been parsed, the same documents whatever the number of parse workers.
+        """
+        if self.parse_workers > 1:
+            yield from self.iter_data_parallel()
+            return
 
         for file_path in self.file_paths:
-            loader_func = self.get_loader(file_path)
             print(f"Loading file: {file_path}")
-            elements = loader_func(file_path)  # Process each file
+            try:
+                page_documents = partition_by_page(self.get_loader(file_path), file_path)
+            except Exception as e:
+                print(f"Failed to load file {file_path}: {str(e)}")
+                continue
+            yield from page_documents
+
+    def iter_data_parallel(self):
+        """
+        Parses files in a pool of parse_workers processes and yields one Document
+        per page of every file, in the order the files finish.
+        """
+        max_in_flight = 2 * self.parse_workers
+        file_paths = iter(self.file_paths)
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as executor:
+            pending = {}
+            while True:
+                while len(pending) < max_in_flight:
+                    file_path = next(file_paths, None)
+                    if file_path is None:
+                        break
+                    print(f"Loading file: {file_path}")
+                    future = executor.submit(partition_by_page, self.get_loader(file_path), file_path)
+                    pending[future] = file_path
+
+                if not pending:
+                    break
 
-            # Convert each extracted element to a LangChain Document
-            documents = [Document(page_content=element.text, metadata={"source": file_path}) for element in elements]
-            all_data.append(documents[0])
-            print(all_data)
-        return all_data  
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = pending.pop(future)
+                    try:
+                        page_documents = future.result()
+                    except Exception as e:
+                        print(f"Failed to load file {file_path}: {str(e)}")
+                        continue
+                    yield from page_documents
@@ -2,28 +2,35 @@ from langchain_community.document_loaders import GithubFileLoader , GitHubIssues
 from io import BytesIO
 # from loaders.base_loader import BaseDataLoader
 import os
-from utils.preprocess import make_text_tokenization_safe
+import sqlite3
+from utils.preprocess import make_texts_tokenization_safe
 from langchain.schema import Document
 # Load environment variables from the .env file
 from utils.initialize import load_env_variables
 from utils.config_settings import config
 from loaders.base_loader import BaseDataLoader
+from configurables.vectordb_configs import delete_documents
+from stores.chunk_store import get_chunk_store
+from utils.retrieval_cache import retrieval_cache
+from utils.answer_cache import answer_cache
 
 env_name = load_env_variables()
 
 access_token = config[env_name].GITHUB_ACCESS_TOKEN
 github_repo_name = config[env_name].REPO_NAME
 github_branch_name = config[env_name].BRANCH_NAME
-    
+GITHUB_INCREMENTAL_SYNC = config[env_name].GITHUB_INCREMENTAL_SYNC
+GITHUB_MANIFEST_PATH = config[env_name].GITHUB_MANIFEST_PATH
+
 def docs_preprocessing(documents):
     cleaned_docs = []
     try:
-        
-        for doc in documents:
+        # Strip special tokens from all files in one batch call
+        contents = make_texts_tokenization_safe([doc.page_content for doc in documents])
+        for doc, file_content in zip(documents, contents):
             file_path = doc.metadata['source'] 
             file_name = doc.metadata['path']
             file_sha = doc.metadata['sha']
-            file_content = make_text_tokenization_safe(doc.page_content) # Use content directly without conversion
             cleaned_docs.append(Document(page_content=file_content, metadata={
                     'source' : file_path , 'name' : file_name, "sha" : file_sha
                 }))
@@ -31,6 +38,118 @@ def docs_preprocessing(documents):
         print(f"Error processing files: {str(e)}")
     return cleaned_docs
 
+class GithubManifest:
+    """
+    Records, per repo, branch and vector store, the blob sha of every ingested
+    file and the ids of the vectors it produced. The vector_index column holds
+    "<vector store>:<embedding model>", since vectors of one model can't stand
+    in for another's.
+
+    Vector ids are recorded as soon as they are written and a file's sha only
+    once the whole sync has finished, so the vectors of a sync that failed
+    are removed by the next one, which still sees the file as changed.
+
+    Holds one connection until close(); usable as a context manager.
+    """
+
+    def __init__(self, path=GITHUB_MANIFEST_PATH):
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS github_files (
+                repo TEXT NOT NULL,
+                branch TEXT NOT NULL,
+                vector_index TEXT NOT NULL,
+                path TEXT NOT NULL,
+                sha TEXT NOT NULL,
+                PRIMARY KEY (repo, branch, vector_index, path)
+            );
+            CREATE TABLE IF NOT EXISTS github_vectors (
+                repo TEXT NOT NULL,
+                branch TEXT NOT NULL,
+                vector_index TEXT NOT NULL,
+                path TEXT NOT NULL,
+                vector_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_github_vectors_path
+                ON github_vectors (repo, branch, vector_index, path);
+            """
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def file_shas(self, repo, branch, vector_index):
+        rows = self.conn.execute(
+            "SELECT path, sha FROM github_files WHERE repo = ? AND branch = ? AND vector_index = ?",
+            (repo, branch, vector_index),
+        ).fetchall()
+        return dict(rows)
+
+    def adopt_unkeyed(self, repo, branch, vector_store, vector_index):
+        """
+        Move entries recorded under the bare vector store name, before the
+        embedding model was part of the key, to vector_index if it has none.
+        """
+        with self.conn:
+            if self.file_shas(repo, branch, vector_index):
+                return
+            for table in ("github_files", "github_vectors"):
+                self.conn.execute(
+                    f"UPDATE {table} SET vector_index = ? WHERE repo = ? AND branch = ? AND vector_index = ?",
+                    (vector_index, repo, branch, vector_store),
+                )
+
+    def add_vectors(self, repo, branch, vector_index, ids_by_path):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO github_vectors VALUES (?, ?, ?, ?, ?)",
+                [(repo, branch, vector_index, path, vector_id) for path, ids in ids_by_path.items() for vector_id in ids],
+            )
+
+    def vector_ids(self, repo, branch, vector_index, paths):
+        ids = []
+        for path in paths:
+            rows = self.conn.execute(
+                """
+                SELECT vector_id FROM github_vectors
+                WHERE repo = ? AND branch = ? AND vector_index = ? AND path = ?
+                """,
+                (repo, branch, vector_index, path),
+            ).fetchall()
+            ids.extend(row[0] for row in rows)
+        return ids
+
+    def apply(self, repo, branch, vector_index, file_shas, stale_paths, stale_ids):
+        """
+        Drop the removed vector ids and record the new shas of stale paths.
+        """
+        key = (repo, branch, vector_index)
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM github_vectors WHERE repo = ? AND branch = ? AND vector_index = ? AND vector_id = ?",
+                [(*key, vector_id) for vector_id in stale_ids],
+            )
+            for path in stale_paths:
+                if path in file_shas:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO github_files VALUES (?, ?, ?, ?, ?)",
+                        (*key, path, file_shas[path]),
+                    )
+                else:
+                    self.conn.execute(
+                        "DELETE FROM github_files WHERE repo = ? AND branch = ? AND vector_index = ? AND path = ?",
+                        (*key, path),
+                    )
+
+
 class GithubLoader(BaseDataLoader):
     def __init__(self):
         super().__init__()
@@ -38,44 +157,150 @@ class GithubLoader(BaseDataLoader):
         self.github_repo_name = github_repo_name
         self.github_branch_name = github_branch_name
         self.file_types = os.getenv("FILE_TYPE", "all").split(",") 
-    
-        
-    
+        self.incremental = GITHUB_INCREMENTAL_SYNC
+        self.sync_vector_index = None
+        self.sync_embedding_model_name = None
+        self.sync_state = None
+        # Open from the start of a sync's load until end_sync()
+        self.manifest = None
+
+    def create_file_loader(self):
+        if 'all' in self.file_types:
+            file_filter = lambda file_path: True  # load all files.
+        else:
+            file_filter = lambda file_path: file_path.endswith(tuple(self.file_types))
+        return GithubFileLoader(
+            repo= github_repo_name ,  # the repo name
+            branch= github_branch_name,  # the branch name
+            access_token=access_token,
+            github_api_url="https://api.github.com",
+            file_filter=file_filter,
+        )
+
+    def start_sync(self, vector_index, embedding_model_name):
+        """
+        Make the next load fetch only files added or changed since the last
+        sync into vector_index with this embedding model. Pass each stored
+        batch to record_batch, call finish_sync once all are stored, and
+        end_sync afterwards whether or not the sync succeeded.
+        """
+        if self.incremental:
+            self.sync_vector_index = vector_index
+            self.sync_embedding_model_name = embedding_model_name
+
+    def _manifest_key(self):
+        return (
+            self.github_repo_name,
+            self.github_branch_name,
+            f"{self.sync_vector_index}:{self.sync_embedding_model_name}",
+        )
+
     def load_data(self,file_type):
             """
             Process all files in the gtihub using GithubFileLoader.
             Returns a list of extracted texts.
             """
-            self.file_types=file_type.split(",")  
-            if 'all' in self.file_types:
-                self.loader = GithubFileLoader(
-                repo= github_repo_name ,  # the repo name
-                branch= github_branch_name,  # the branch name
-                access_token=access_token,
-                github_api_url="https://api.github.com",
-                file_filter=lambda file_path: True,
-                # load all files.
-            )
-                documents = self.loader.load()
-                cleaned_documents = docs_preprocessing(documents)
-                return cleaned_documents
-    
-            else :
-                self.loader = GithubFileLoader(
-                repo= github_repo_name ,  # the repo name
-                branch= github_branch_name,  # the branch name
-                access_token=access_token,
-                github_api_url="https://api.github.com",
-                file_filter=lambda file_path: file_path.endswith(tuple(self.file_types)),
-                # load all files.
-            )
-                documents = self.loader.load()
-                cleaned_documents = docs_preprocessing(documents)
-                return cleaned_documents
-                 
+            return list(self.iter_data(file_type))
+
+    def iter_data(self, file_type):
+        """
+        Yields cleaned documents. During a sync only added or changed files are fetched.
+        """
+        self.file_types=file_type.split(",")  
+        self.loader = self.create_file_loader()
+        if self.sync_vector_index is None:
+            documents = self.loader.load()
+            yield from docs_preprocessing(documents)
+            return
+
+        self.end_sync()
+        manifest = self.manifest = GithubManifest()
+        manifest.adopt_unkeyed(
+            self.github_repo_name, self.github_branch_name, self.sync_vector_index, self._manifest_key()[2]
+        )
+        previous_shas = manifest.file_shas(*self._manifest_key())
+        # The git tree lists directories too; only blobs are files
+        files = [file for file in self.loader.get_file_paths() if file["type"] == "blob"]
+        current_shas = {file["path"]: file["sha"] for file in files}
+        changed = [file for file in files if previous_shas.get(file["path"]) != file["sha"]]
+        deleted = [
+            path for path in previous_shas
+            if path not in current_shas and self.loader.file_filter(path)
+        ]
+        stale_paths = [file["path"] for file in changed] + deleted
+        self.sync_state = {
+            "file_shas": current_shas,
+            "stale_paths": stale_paths,
+            # Taken before anything is written, so this sync's own vectors aren't among them
+            "stale_ids": manifest.vector_ids(*self._manifest_key(), stale_paths),
+            "changed_files": len(changed),
+            "deleted_files": len(deleted),
+        }
+        print(f"GitHub sync: {len(changed)} added or changed, {len(deleted)} deleted, "
+              f"{len(files) - len(changed)} unchanged files.")
+
+        for file in changed:
+            content = self.loader.get_file_content_by_path(file["path"])
+            if content == "":
+                continue
+            document = Document(page_content=content, metadata={
+                "path": file["path"],
+                "sha": file["sha"],
+                "source": self.source_url(file["path"]),
+            })
+            yield from docs_preprocessing([document])
+
+    def source_url(self, path):
+        """
+        Return the source recorded in the metadata of a file's documents.
+        """
+        return f"https://api.github.com/{self.github_repo_name}/blob/{self.github_branch_name}/{path}"
 
+    def record_batch(self, chunks, ids):
+        """
+        Record the ids of vectors just written for changed files.
+        """
+        if self.sync_state is None:
+            return
+        ids_by_path = {}
+        for chunk, chunk_id in zip(chunks, ids):
+            ids_by_path.setdefault(chunk.metadata.get("name"), []).append(chunk_id)
+        self.manifest.add_vectors(*self._manifest_key(), ids_by_path)
 
-            
+    def finish_sync(self, vector_store):
+        """
+        Remove the previous vectors of changed and deleted files and record their new shas.
 
+        Args:
+            vector_store: The store the changed files were written to
 
+        Returns:
+            dict: Numbers of changed and deleted files, or an empty dict outside a sync
+        """
+        if self.sync_state is None:
+            return {}
+        stale_ids = self.sync_state["stale_ids"]
+        if stale_ids:
+            delete_documents(self.sync_vector_index, vector_store, stale_ids)
+            get_chunk_store().delete(self.sync_vector_index.lower(), stale_ids)
+            retrieval_cache.invalidate(self.sync_vector_index)
+        # Cached answers may quote the old versions of changed files and the deleted ones
+        answer_cache.invalidate_sources(self.source_url(path) for path in self.sync_state["stale_paths"])
+        self.manifest.apply(
+            *self._manifest_key(), self.sync_state["file_shas"], self.sync_state["stale_paths"], stale_ids
+        )
+        summary = {
+            "changed_files": self.sync_state["changed_files"],
+            "deleted_files": self.sync_state["deleted_files"],
+        }
+        self.end_sync()
+        return summary
 
+    def end_sync(self):
+        """
+        Close the manifest and forget the current sync; its unrecorded files are fetched again next time.
+        """
+        if self.manifest is not None:
+            self.manifest.close()
+            self.manifest = None
+        self.sync_state = None
@@ -5,7 +5,7 @@ import requests
 from langchain_core.documents import Document
 from langchain_community.document_loaders.base import BaseLoader
 import os
-from utils.preprocess import make_text_tokenization_safe
+from utils.preprocess import make_texts_tokenization_safe
 # Load environment variables from the .env file
 from utils.initialize import load_env_variables
 from utils.config_settings import config
@@ -24,9 +24,9 @@ def docs_preprocessing(documents):
     """Process and clean documents."""
     cleaned_docs = []
     try:
-        for doc in documents:
+        contents = make_texts_tokenization_safe([doc.page_content for doc in documents])  # Safely tokenize the content
+        for doc, file_content in zip(documents, contents):
             metadata = doc.metadata
-            file_content = make_text_tokenization_safe(doc.page_content)  # Safely tokenize the content
             cleaned_docs.append(Document(page_content=file_content, metadata=metadata))
     except Exception as e:
         print(f"Error processing files: {str(e)}")
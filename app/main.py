@@ -1,19 +1,40 @@
+import asyncio
+import json
 import logging
-from fastapi import FastAPI, Form
+import time
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from enum import Enum
-from typing import List, Union
+from typing import List, Optional, Union
 from langchain.schema import Document
-from agents.llm_functions import agent_with_sql_and_kg_for_docs
+from agents.llm_functions import agent_with_sql_and_kg_for_docs, astream_agent_with_sql_and_kg_for_docs
 from graphs.graph_ops import *
 from retrievers.kg_retriever import *
 from utils.initialize import graph_object
-from configurables.llm_configs import get_llm_model
-from configurables.embed_configs import get_embedding_model
-from configurables.vectordb_configs import get_vector_store
+from configurables.llm_configs import aget_llm_model
+from configurables.embed_configs import aget_embedding_model, get_embedding_model
+from configurables.vectordb_configs import get_vector_store, add_documents_with_embeddings
 from configurables.chunking_configs import get_chunking_strategy, ChunkingStrategy
 from utils.loader import load_source
+from utils.embedding_cache import get_embedding_cache
+from utils.embedding_executor import get_embedding_stats
+from utils.client_registry import client_registry
+from utils.retrieval_cache import retrieval_cache
+from utils.answer_cache import answer_cache, document_sources
+from utils.concurrency import run_blocking, blocking_pool_stats, shutdown_blocking_pool
+from utils.streaming import sse_event, stream_metrics
+from utils.sql_database import sql_database_cache
+from utils.sql_query_cache import get_sql_query_cache, sql_result_cache
+from utils.resources import lazy_resource, warm_up, readiness
+from utils.pipeline import IngestionPipeline
+from utils.jobs import JobManager, FINISHED_STATUSES
+from stores.faiss_store import snapshot_all as snapshot_faiss_stores
+from stores.chunk_store import get_chunk_store
+from utils.initialize import load_env_variables
+from utils.config_settings import config
 from graphs.graph_ops import add_graph_to_db   
 from langchain_pinecone import PineconeVectorStore
  
@@ -22,10 +43,31 @@ from langchain_pinecone import PineconeVectorStore
 logging.getLogger("langchain_core").setLevel(logging.ERROR)
 logging.getLogger("neo4j.notifications").setLevel(logging.ERROR)
 
-graph = graph_object()
+# Connected on first use or during startup warm-up; call graph.get() for the Neo4jGraph
+graph = lazy_resource("neo4j_graph", graph_object)
+
+env_name = load_env_variables()
+CHUNK_STORE_PAGE_SIZE = config[env_name].CHUNK_STORE_PAGE_SIZE
+CHUNK_STORE_MAX_PAGE_SIZE = config[env_name].CHUNK_STORE_MAX_PAGE_SIZE
+STARTUP_WARM_UP = config[env_name].STARTUP_WARM_UP
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open Neo4j, the KG index and the tokenizer tokens in the background so the
+    # worker starts serving at once; /api/ready reports when they are up
+    warm_up_task = asyncio.create_task(warm_up()) if STARTUP_WARM_UP else None
+    yield
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    await asyncio.to_thread(job_manager.shutdown)
+    await asyncio.to_thread(snapshot_faiss_stores)
+    await client_registry.aclose()
+    shutdown_blocking_pool()
+
 
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS
 app.add_middleware(
@@ -35,7 +77,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-persisted_chunked_docs = []
+job_manager = JobManager()
+
 
 # Define FastAPI endpoints
 @app.get("/")
@@ -46,6 +89,80 @@ async def hello_world():
     return "Hello, Graph RAG llm-service with fastapi!"
 
 
+@app.get("/api/ready")
+async def ready():
+    """
+    Readiness probe: 200 once Neo4j, the KG index and the tokenizer tokens are loaded, 503 until then.
+    """
+    state = readiness()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
+
+def run_ingestion(
+    source,
+    file_type,
+    embedding_model_name,
+    chunking_strategy,
+    vector_index,
+    ingest_id=None,
+    stop_event=None,
+    on_progress=None,
+    set_total=None,
+):
+    """
+    Load, chunk, embed and store documents from a source.
+    Stored chunks are recorded in the chunk store under ingest_id.
+
+    Returns:
+        dict: Counts of documents, chunks and vectors processed
+    """
+    # Load documents from the specified source (Google Drive, etc.)
+    loader = load_source(source)
+    if set_total is not None and hasattr(loader, "count_documents"):
+        set_total(loader.count_documents(file_type))
+
+    # Loaders that sync incrementally (GitHub) only return changed files
+    syncing = hasattr(loader, "start_sync")
+    if syncing:
+        loader.start_sync(vector_index, embedding_model_name)
+
+    # Select embedding model dynamically
+    selected_embedding_model = get_embedding_model(embedding_model_name)
+    ingest_id = ingest_id or str(uuid.uuid4())
+    chunk_store = get_chunk_store()
+
+    def persist_batch(chunks, ids):
+        chunk_store.add(vector_index.lower(), ingest_id, chunks, ids, default_source=source)
+        if syncing:
+            loader.record_batch(chunks, ids)
+
+    # Stream documents through chunking, embedding and the vector store in batches
+    pipeline = IngestionPipeline(
+        loader,
+        file_type,
+        chunking_strategy,
+        selected_embedding_model,
+        embedding_model_name,
+        vector_index,
+        on_batch=persist_batch,
+        on_progress=on_progress,
+        stop_event=stop_event,
+    )
+    try:
+        stats = pipeline.run()
+        if syncing:
+            stats.update(loader.finish_sync(pipeline.open_vector_store()))
+    finally:
+        if syncing:
+            loader.end_sync()
+        if hasattr(pipeline.vector_store, "snapshot"):
+            # Make this ingest durable in the on-disk FAISS index, even a partial
+            # one, and release the store to writers in other processes
+            pipeline.vector_store.snapshot()
+    stats["ingest_id"] = ingest_id
+    return stats
+
+
 @app.post("/api/parsing_and_loading")
 async def do_parsing_and_loading(
     source: str = Form(...),
@@ -57,45 +174,132 @@ async def do_parsing_and_loading(
     """
     Combined endpoint to load, parse, chunk, and embed documents.
     """
-    # Load documents from the specified source (Google Drive, etc.)
-    loader = load_source(source)
-    loaded_docs = loader.load_data(file_type=file_type)
+    # Ingestion blocks for its whole run, so keep it off the event loop and
+    # off the pool request handlers use; it shares the job workers instead
+    stats = await job_manager.arun(
+        run_ingestion, source, file_type, embedding_model_name, chunking_strategy, vector_index
+    )
 
-    if not loaded_docs:
+    # An incremental sync with nothing to update isn't a failure
+    if not stats["documents"] and "changed_files" not in stats:
         return {"error": "No documents found or failed to load documents."}
 
-    # Select embedding model dynamically
-    selected_embedding_model = get_embedding_model(embedding_model_name)
+    return {"message": "Documents loaded, chunked, and embedded successfully!", **stats}
+
 
-    # Select chunking strategy dynamically and apply it to loaded documents
-    chunked_docs = get_chunking_strategy(
-        chunking_strategy, documents=loaded_docs, embedding_model=selected_embedding_model
+@app.post("/api/jobs/parsing_and_loading")
+async def submit_parsing_and_loading_job(
+    source: str = Form(...),
+    file_type: str = Form(...),
+    embedding_model_name: str = Form(...),
+    chunking_strategy: str = Form(...),
+    vector_index: str = Form(...),
+):
+    """
+    Start the same ingestion as /api/parsing_and_loading in the background and return its job id.
+    """
+    params = {
+        "source": source,
+        "file_type": file_type,
+        "embedding_model_name": embedding_model_name,
+        "chunking_strategy": chunking_strategy,
+        "vector_index": vector_index,
+    }
+    job_id = job_manager.submit(
+        params,
+        lambda job_id, stop_event, on_progress, set_total: run_ingestion(
+            **params, ingest_id=job_id, stop_event=stop_event, on_progress=on_progress, set_total=set_total
+        ),
     )
+    return {"job_id": job_id, "status": "queued"}
 
-    # Ensure the input to embed_documents is a list of strings
-    texts = [chunk.page_content for chunk in chunked_docs]
-    embeddings = selected_embedding_model.embed_documents(texts)
 
-    global persisted_chunked_docs
-    persisted_chunked_docs.extend(chunked_docs)
-    
-    # Add embeddings and chunked documents to the vector store
-    if vector_index == "pinecone":
-        index , vector_store = get_vector_store(vector_index, embeddings,selected_embedding_model,embedding_model_name)
-    else:    
-        vector_store = get_vector_store(vector_index, embeddings,selected_embedding_model,embedding_model_name)
-    vector_store.add_documents(chunked_docs) 
-    if vector_index == "pinecone":
-        print(index.describe_index_stats())
-    # Check the number of vectors stored in the FAISS index
+@app.get("/api/jobs/{job_id}")
+async def get_job_progress(job_id: str):
+    """
+    Progress of an ingestion job: counts, throughput and ETA.
+    """
+    progress = job_manager.progress(job_id)
+    if progress is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown job: {job_id}"})
+    return progress
 
-    return {"message": "Documents loaded, chunked, and embedded successfully!" , "Chunks":chunked_docs}
 
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    Result of a finished ingestion job.
+    """
+    job = job_manager.store.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown job: {job_id}"})
+    if job["status"] not in FINISHED_STATUSES:
+        return JSONResponse(status_code=409, content={"error": f"Job {job_id} is still {job['status']}."})
+    return {"job_id": job_id, "status": job["status"], "result": job["result"], "error": job["error"]}
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """
+    Cancel a queued or running ingestion job.
+    """
+    if not job_manager.cancel(job_id):
+        return JSONResponse(
+            status_code=404, content={"error": f"Job {job_id} is not running in this worker."}
+        )
+    return {"job_id": job_id, "status": "cancelling"}
+
+
+@app.get("/api/metrics")
+async def metrics():
+    """
+    Cache and throughput counters for this worker process.
+    """
+    return {
+        "embedding_cache": get_embedding_cache().stats(),
+        "embedding": get_embedding_stats(),
+        "clients": client_registry.stats(),
+        "retrieval_cache": retrieval_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "blocking_pool": blocking_pool_stats(),
+        "streaming": stream_metrics.stats(),
+        "sql_database": sql_database_cache.stats(),
+        "sql_query_cache": get_sql_query_cache().stats(),
+        "sql_result_cache": sql_result_cache.stats(),
+    }
 
 
 @app.post("/api/persist")
-async def persist():
-    return {"persisted_chunked_docs": persisted_chunked_docs}
+async def persist(
+    cursor: int = Form(0),
+    limit: int = Form(CHUNK_STORE_PAGE_SIZE),
+    source: Optional[str] = Form(None),
+    ingest_id: Optional[str] = Form(None),
+    vector_index: Optional[str] = Form(None),
+):
+    """
+    Page through the stored chunks, oldest first.
+
+    Pass the returned next_cursor as cursor to get the next page; it is null on
+    the last page. The page is streamed, so it is never held in memory whole.
+    """
+    limit = max(1, min(limit, CHUNK_STORE_MAX_PAGE_SIZE))
+    chunks = get_chunk_store().iter_page(
+        cursor, limit, source=source, ingest_id=ingest_id,
+        vector_index=vector_index.lower() if vector_index else None,
+    )
+
+    def stream_page():
+        yield '{"persisted_chunked_docs": ['
+        count, last_cursor = 0, cursor
+        for chunk in chunks:
+            yield ("," if count else "") + json.dumps(chunk, default=str)
+            count += 1
+            last_cursor = chunk["cursor"]
+        next_cursor = last_cursor if count == limit else None
+        yield f'], "count": {count}, "next_cursor": {json.dumps(next_cursor)}}}'
+
+    return StreamingResponse(stream_page(), media_type="application/json")
 
 
 @app.post("/api/question/testing")
@@ -105,14 +309,21 @@ async def ask_agentic_question(
     """
     Endpoint to handle user asking a question to chatbot
     """
-    # Select LLM model dynamically
-    selected_llm_model = get_llm_model(llm_model)
+    # Near-identical questions are answered from the semantic answer cache
+    scope = ("question/testing", llm_model)
+    question_vector = await run_blocking(answer_cache.embed, question)
+    cached, generation = answer_cache.lookup(question_vector, scope)
+    if cached is not None:
+        return JSONResponse(content=cached)
 
-    retriever = hybrid_kg_retriever()
-    chain = qa_chain_with_source(selected_llm_model, retriever)
-    result = chain.invoke({"input": question})
+    # The chain and its clients are built once per LLM and reused; the first build connects to Neo4j
+    chain = await run_blocking(get_qa_chain, llm_model)
+    result = await chain.ainvoke({"input": question})
 
-    return JSONResponse(content={"question": question, "answer": result})
+    sources = document_sources(result["context"])
+    response = {"question": question, "answer": result["answer"], "sources": sorted(sources)}
+    answer_cache.store(question, question_vector, scope, response, generation, sources)
+    return JSONResponse(content=response)
 
 
 @app.post("/api/questions")
@@ -121,21 +332,155 @@ async def ask_question(
     llm_model: str = Form(...),
     temprature: float = Form(...),
 ):
+    scope = ("questions", llm_model, temprature)
+    question_vector = await run_blocking(answer_cache.embed, question)
+    cached, generation = answer_cache.lookup(question_vector, scope)
+    if cached is not None:
+        return cached
+
     # Get embedding and LLM models
-    selected_llm_model = get_llm_model(llm_model, temprature)
+    selected_llm_model = await aget_llm_model(llm_model, temprature)
 
-    return await agent_with_sql_and_kg_for_docs(
+    response = await agent_with_sql_and_kg_for_docs(
         question, selected_llm_model, sql_question_retriever, hybrid_kg_retrieved_info
     )
+    # The answer draws on SQL results too, so it is dropped on any ingest; partial answers aren't kept
+    if not response["partial"]:
+        answer_cache.store(question, question_vector, scope, response, generation)
+    return response
+
+# Tell proxies not to buffer or cache the event stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+@app.post("/api/question/testing/stream")
+async def stream_agentic_question(
+    question: str = Form(...), llm_model: str = Form(...),
+):
+    """
+    Streaming /api/question/testing, as server-sent events: a "retrieval" event
+    with the retrieved documents, "token" events as the LLM writes, then "done"
+    with the full response. Generation stops when the client disconnects.
+    """
+    started = time.monotonic()
+    scope = ("question/testing", llm_model)
+    question_vector = await run_blocking(answer_cache.embed, question)
+    cached, generation = answer_cache.lookup(question_vector, scope)
+    chain = None if cached is not None else await run_blocking(get_qa_chain, llm_model)
+
+    async def events():
+        if cached is not None:
+            yield sse_event("retrieval", {"sources": cached["sources"], "documents": []})
+            yield sse_event("token", cached["answer"])
+            yield sse_event("done", cached)
+            return
+
+        stream_metrics.stream_started()
+        parts, sources, finished = [], set(), False
+        stream = chain.astream({"input": question})
+        try:
+            async for chunk in stream:
+                if "context" in chunk:
+                    sources = document_sources(chunk["context"])
+                    documents = [
+                        {"page_content": doc.page_content, "metadata": doc.metadata} for doc in chunk["context"]
+                    ]
+                    yield sse_event("retrieval", {"sources": sorted(sources), "documents": documents})
+                if "answer" in chunk:
+                    if not parts:
+                        stream_metrics.first_token(time.monotonic() - started)
+                    parts.append(chunk["answer"])
+                    yield sse_event("token", chunk["answer"])
+            finished = True
+        finally:
+            # On disconnect the server closes this generator; closing the chain stops the LLM request
+            await stream.aclose()
+            stream_metrics.stream_finished(disconnected=not finished)
+
+        response = {"question": question, "answer": "".join(parts), "sources": sorted(sources)}
+        answer_cache.store(question, question_vector, scope, response, generation, sources)
+        yield sse_event("done", response)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.post("/api/questions/stream")
+async def stream_question(
+    question: str = Form(...),
+    llm_model: str = Form(...),
+    temprature: float = Form(...),
+):
+    """
+    Streaming /api/questions, as server-sent events: a "branch" event as the SQL
+    and knowledge graph branches finish, "token" events for the merged answer,
+    then "done" with the full response.
+    """
+    started = time.monotonic()
+    scope = ("questions", llm_model, temprature)
+    question_vector = await run_blocking(answer_cache.embed, question)
+    cached, generation = answer_cache.lookup(question_vector, scope)
+    selected_llm_model = await aget_llm_model(llm_model, temprature)
+
+    async def events():
+        if cached is not None:
+            yield sse_event("token", cached["answer"])
+            yield sse_event("done", cached)
+            return
+
+        stream_metrics.stream_started()
+        first_token, finished = True, False
+        stream = astream_agent_with_sql_and_kg_for_docs(
+            question, selected_llm_model, sql_question_retriever, hybrid_kg_retrieved_info
+        )
+        try:
+            async for event, data in stream:
+                if event == "token" and first_token:
+                    stream_metrics.first_token(time.monotonic() - started)
+                    first_token = False
+                if event == "done" and not data["partial"]:
+                    answer_cache.store(question, question_vector, scope, data, generation)
+                yield sse_event(event, data)
+            finished = True
+        finally:
+            await stream.aclose()
+            stream_metrics.stream_finished(disconnected=not finished)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 
 @app.post("/api/retrieval")
 async def retrieve(
     query: str = Form(...),
     vector_store: str = Form(...),
+    embedding_model_name: str = Form("cohere"),
+    k: int = Form(3),
+    filters: Optional[str] = Form(None),
 ):
-    embed_model=get_embedding_model("cohere")
-    index,vector_store = get_vector_store("pinecone",0,embed_model)
-    response = vector_store.similarity_search(query,k=3)
+    """
+    Similarity search over a vector store. filters is an optional JSON metadata filter.
+    Repeated searches are served from the retrieval cache until it expires or the store changes.
+    """
+    try:
+        filters = json.loads(filters) if filters else None
+    except json.JSONDecodeError as e:
+        return JSONResponse(status_code=400, content={"error": f"filters is not valid JSON: {e}"})
+    if filters is not None and not isinstance(filters, dict):
+        return JSONResponse(status_code=400, content={"error": "filters must be a JSON object."})
+    cache_key = retrieval_cache.make_key(query, vector_store, embedding_model_name, k, filters)
+    response, generation = retrieval_cache.get(cache_key)
+    if response is not None:
+        return response
+
+    embed_model = await aget_embedding_model(embedding_model_name)
+    # Opening a store can take network round trips the first time
+    store = await run_blocking(get_vector_store, vector_store, [], embed_model, embedding_model_name)
+    if vector_store.lower() == "pinecone":
+        index, store = store
+    if filters:
+        response = await store.asimilarity_search(query, k=k, filter=filters)
+    else:
+        response = await store.asimilarity_search(query, k=k)
+    retrieval_cache.put(cache_key, response, generation)
     return response
 # @app.post("/api/llamaparse_to_graph")
 # async def llamaparse(folder_path : str = Form(...)):
@@ -148,17 +493,16 @@ async def retrieve(
 #     return {"message" : f"Documents Loaded , Chunked Docs:{chunked_docs}, Graph Loaded"}
     
 
-def sql_question_retriever(question: str):
-    chain = sql_chain(get_llm_model("openai", 0))
-    response = chain.invoke({"question": question})
+async def sql_question_retriever(question: str):
+    chain = await run_blocking(get_sql_chain, "openai", 0)
+    response = await chain.ainvoke({"question": question})
     return response
 
 
-def hybrid_kg_retrieved_info(question: str):
-    retriever = hybrid_kg_retriever()
-    chain = qa_chain_with_source(get_llm_model("cohere", 0), retriever)
-    response = chain.invoke({"input": question})
-    return response
+async def hybrid_kg_retrieved_info(question: str):
+    chain = await run_blocking(get_qa_chain, "cohere", 0)
+    response = await chain.ainvoke({"input": question})
+    return response["answer"]
 
 
 if __name__ == "__main__":
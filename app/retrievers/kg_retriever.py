@@ -3,77 +3,145 @@ from operator import itemgetter
 
 from langchain.chains import create_sql_query_chain
 from langchain.schema.runnable import RunnableMap
-from langchain_community.tools.sql_database.tool import QuerySQLDataBaseTool
-from langchain_community.utilities import SQLDatabase
 from langchain_community.vectorstores import Neo4jVector
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from utils.initialize import neo4j_creds
 from utils.config_settings import config
-from utils.initialize import openai_embed_model, cohere_embedding_model
+from configurables.embed_configs import get_embedding_model
+from configurables.llm_configs import get_llm_model
 from prompt.templates import system_prompt, sql_prompt
 from utils.initialize import load_env_variables
+from utils.client_registry import client_registry
+from utils.resources import lazy_resource
+from utils.concurrency import run_blocking
+from utils.sql_database import sql_database_cache
+from utils.sql_query_cache import get_sql_query_cache, is_valid_sql, sql_result_cache
 
 env_name = load_env_variables()
 COHERE_API_KEY = config[env_name].COHERE_API_KEY
 
 url, username, password = neo4j_creds()
-openai_embedding = openai_embed_model()
-cohere_embedding = cohere_embedding_model(COHERE_API_KEY, model="embed-english-v3.0")
-vector_index = Neo4jVector.from_existing_graph(
-    openai_embedding,
-    search_type="hybrid",
-    node_label="Document",
-    text_node_properties=["text"],
-    embedding_node_property="openai_embedding",
-    url=url,
-    username=username,
-    password=password,
-)
+
+
+def build_vector_index():
+    """
+    Connect to the existing Neo4j document graph as a hybrid vector index.
+    """
+    return Neo4jVector.from_existing_graph(
+        get_embedding_model("openai"),
+        search_type="hybrid",
+        node_label="Document",
+        text_node_properties=["text"],
+        embedding_node_property="openai_embedding",
+        url=url,
+        username=username,
+        password=password,
+    )
+
+
+# Connected on first use or during startup warm-up, not at import
+kg_vector_index = lazy_resource("kg_vector_index", build_vector_index)
 
 
 def hybrid_kg_retriever():
-    retriever = vector_index.as_retriever(search_kwargs={"k": 8})
+    retriever = kg_vector_index.get().as_retriever(search_kwargs={"k": 8})
     return retriever
 
 
 def qa_chain_with_source(llm, retriever):
+    """
+    Build a chain that answers {"input": question} from the retrieved context.
+
+    Returns:
+        Runnable: Outputs {"input", "context", "answer"}; context holds the retrieved documents
+    """
     prompt = ChatPromptTemplate.from_messages(
         [
             ("system", system_prompt),
             ("human", "{input}"),
         ]
     )
-    chain = (
-        RunnableMap(
-            {
-                "context": lambda x: retriever.invoke(x["input"]),
-                "input": lambda x: x["input"],
-            }
-        )
-        | prompt
-        | llm
-        | StrOutputParser()
-    )
+    # Runnables end to end, so ainvoke and astream stay async through retrieval and the LLM
+    chain = RunnableMap(
+        {
+            "context": itemgetter("input") | retriever,
+            "input": itemgetter("input"),
+        }
+    ) | RunnablePassthrough.assign(answer=prompt | llm | StrOutputParser())
 
     return chain
 
 
-def sql_chain(llm):
-    db = SQLDatabase.from_uri("sqlite:///./app/documents.db")
-    print(db.dialect)
-    print(db.get_usable_table_names())
+def sql_chain(llm, db, scope):
+    """
+    Build a chain that writes a SQL query for {"question": ...}, runs it on db and answers from the result.
 
-    execute_query = QuerySQLDataBaseTool(db=db)
+    The SQL written for a question is cached under scope, e.g. the LLM and
+    temperature, and reused for the same question. Query results are reused
+    until the database changes.
+    """
     write_query = create_sql_query_chain(llm, db)
+    query_cache = get_sql_query_cache()
+
+    def cached_query(inputs):
+        query, vector = query_cache.lookup(inputs["question"], scope, db)
+        if query is None:
+            query = write_query.invoke(inputs)
+            if is_valid_sql(db, query):
+                query_cache.store(inputs["question"], scope, query, vector)
+        return query
+
+    async def acached_query(inputs):
+        query, vector = await run_blocking(query_cache.lookup, inputs["question"], scope, db)
+        if query is None:
+            query = await write_query.ainvoke(inputs)
+            if await run_blocking(is_valid_sql, db, query):
+                await run_blocking(query_cache.store, inputs["question"], scope, query, vector)
+        return query
+
+    def execute_query(query):
+        return sql_result_cache.run(db, query)
+
+    async def aexecute_query(query):
+        return await run_blocking(sql_result_cache.run, db, query)
+
     sql_prompt_template = PromptTemplate.from_template(sql_prompt)
     answer = sql_prompt_template | llm | StrOutputParser()
     chain = (
-        RunnablePassthrough.assign(query=write_query).assign(
-            result=itemgetter("query") | execute_query
+        RunnablePassthrough.assign(query=RunnableLambda(cached_query, afunc=acached_query)).assign(
+            result=itemgetter("query") | RunnableLambda(execute_query, afunc=aexecute_query)
         )
         | answer
     )
 
     return chain
+
+
+def get_qa_chain(llm_model, temperature=0.7):
+    """
+    Return the shared hybrid KG question answering chain for an LLM, building it on first use.
+    """
+    return client_registry.get(
+        "chain", "qa_with_source",
+        lambda llm_model, temperature: qa_chain_with_source(
+            get_llm_model(llm_model, temperature), hybrid_kg_retriever()
+        ),
+        llm_model=llm_model, temperature=float(temperature),
+    )
+
+
+def get_sql_chain(llm_model, temperature=0):
+    """
+    Return the shared text-to-SQL chain for an LLM, building it on first use
+    and again whenever the database schema changes.
+    """
+    db, schema_version = sql_database_cache.get()
+    return client_registry.get(
+        "chain", "sql",
+        lambda llm_model, temperature, schema_version: sql_chain(
+            get_llm_model(llm_model, temperature), db, f"{llm_model}:{temperature}"
+        ),
+        llm_model=llm_model, temperature=float(temperature), schema_version=schema_version,
+    )
@@ -0,0 +1,161 @@
+import json
+import sqlite3
+import threading
+import time
+
+from utils.initialize import load_env_variables
+from utils.config_settings import config
+
+env_name = load_env_variables()
+
+CHUNK_STORE_PATH = config[env_name].CHUNK_STORE_PATH
+
+# Rows read per query while paging, so no read transaction stays open for a whole page
+READ_BATCH_SIZE = 500
+# SQLite limits the number of bound parameters per statement
+SQLITE_BATCH_SIZE = 500
+
+
+class ChunkStore:
+    """
+    SQLite table of every chunk written to a vector store.
+
+    Chunks are keyed on (vector_index, chunk_id), where chunk_id is the id of
+    the chunk's vector, and indexed by source and ingest. The database runs in
+    WAL mode, so several uvicorn workers can write to it while others read.
+    """
+
+    def __init__(self, path=CHUNK_STORE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                vector_index TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                ingest_id TEXT NOT NULL,
+                source TEXT,
+                page_content TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                UNIQUE (vector_index, chunk_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (source, seq);
+            CREATE INDEX IF NOT EXISTS idx_chunks_ingest ON chunks (ingest_id, seq);
+            """
+        )
+        self._conn.commit()
+
+    def add(self, vector_index, ingest_id, chunks, ids, default_source=None):
+        """
+        Store chunks under the ids of their vectors, replacing chunks already stored under those ids.
+
+        Args:
+            vector_index (str): Name of the vector store the chunks were written to
+            ingest_id (str): Id of the ingest, the job id for background jobs
+            chunks (list): LangChain Documents
+            ids (list): The vector ids returned by the vector store
+            default_source (str, optional): Source recorded for chunks without one in their metadata
+        """
+        now = time.time()
+        rows = [
+            (
+                vector_index,
+                str(chunk_id),
+                ingest_id,
+                chunk.metadata.get("source") or chunk.metadata.get("name") or default_source,
+                chunk.page_content,
+                json.dumps(chunk.metadata, default=str),
+                now,
+            )
+            for chunk, chunk_id in zip(chunks, ids)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO chunks (vector_index, chunk_id, ingest_id, source, page_content, metadata, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(vector_index, chunk_id) DO UPDATE SET
+                    ingest_id = excluded.ingest_id,
+                    source = excluded.source,
+                    page_content = excluded.page_content,
+                    metadata = excluded.metadata,
+                    created_at = excluded.created_at
+                """,
+                rows,
+            )
+            self._conn.commit()
+
+    def delete(self, vector_index, ids):
+        """
+        Remove the chunks whose vectors were deleted from a vector store.
+        """
+        ids = [str(chunk_id) for chunk_id in ids]
+        with self._lock:
+            for start in range(0, len(ids), SQLITE_BATCH_SIZE):
+                batch = ids[start:start + SQLITE_BATCH_SIZE]
+                self._conn.execute(
+                    f"DELETE FROM chunks WHERE vector_index = ? AND chunk_id IN ({','.join('?' * len(batch))})",
+                    [vector_index, *batch],
+                )
+            self._conn.commit()
+
+    def iter_page(self, cursor=0, limit=1000, source=None, ingest_id=None, vector_index=None):
+        """
+        Yield up to limit chunks stored after cursor, oldest first.
+
+        Args:
+            cursor (int): The "cursor" of the last chunk of the previous page; 0 for the first page
+            limit (int): Maximum number of chunks to yield
+            source, ingest_id, vector_index (str, optional): Only yield chunks matching these
+
+        Yields:
+            dict: A chunk with its "cursor" to continue from
+        """
+        filters, params = [], []
+        for column, value in (("source", source), ("ingest_id", ingest_id), ("vector_index", vector_index)):
+            if value is not None:
+                filters.append(f"{column} = ?")
+                params.append(value)
+        where = "".join(f" AND {condition}" for condition in filters)
+
+        remaining = limit
+        while remaining > 0:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT * FROM chunks WHERE seq > ?{where} ORDER BY seq LIMIT ?",
+                    [cursor, *params, min(remaining, READ_BATCH_SIZE)],
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield {
+                    "cursor": row["seq"],
+                    "id": row["chunk_id"],
+                    "vector_index": row["vector_index"],
+                    "ingest_id": row["ingest_id"],
+                    "source": row["source"],
+                    "page_content": row["page_content"],
+                    "metadata": json.loads(row["metadata"]),
+                }
+            cursor = rows[-1]["seq"]
+            remaining -= len(rows)
+
+
+_chunk_store = None
+_chunk_store_lock = threading.Lock()
+
+
+def get_chunk_store():
+    """
+    Return the process-wide chunk store, opening it on first use.
+    """
+    global _chunk_store
+    with _chunk_store_lock:
+        if _chunk_store is None:
+            _chunk_store = ChunkStore()
+        return _chunk_store
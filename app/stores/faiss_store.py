@@ -0,0 +1,808 @@
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Mapping
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from utils.initialize import load_env_variables
+from utils.config_settings import config
+
+env_name = load_env_variables()
+
+FAISS_STORE_DIR = config[env_name].FAISS_STORE_DIR
+FAISS_SNAPSHOT_EVERY = config[env_name].FAISS_SNAPSHOT_EVERY
+FAISS_INDEX_TYPE = config[env_name].FAISS_INDEX_TYPE
+FAISS_METRIC = config[env_name].FAISS_METRIC
+FAISS_NLIST = config[env_name].FAISS_NLIST
+FAISS_NPROBE = config[env_name].FAISS_NPROBE
+FAISS_HNSW_M = config[env_name].FAISS_HNSW_M
+FAISS_EF_CONSTRUCTION = config[env_name].FAISS_EF_CONSTRUCTION
+FAISS_EF_SEARCH = config[env_name].FAISS_EF_SEARCH
+FAISS_PQ_M = config[env_name].FAISS_PQ_M
+FAISS_PQ_NBITS = config[env_name].FAISS_PQ_NBITS
+FAISS_TRAIN_SAMPLE = config[env_name].FAISS_TRAIN_SAMPLE
+FAISS_MAX_SEGMENTS = config[env_name].FAISS_MAX_SEGMENTS
+FAISS_FOLD_RATIO = config[env_name].FAISS_FOLD_RATIO
+FAISS_WRITER_LOCK_TIMEOUT = config[env_name].FAISS_WRITER_LOCK_TIMEOUT
+
+# Single-file index written by earlier versions; opened as the only segment
+INDEX_FILE_NAME = "index.faiss"
+MANIFEST_FILE_NAME = "segments.json"
+DOCSTORE_FILE_NAME = "docstore.db"
+LOCK_FILE_NAME = "writer.lock"
+# FAISS warns below this many training vectors per IVF partition
+MIN_TRAIN_POINTS_PER_LIST = 39
+# Ways to open a segment, from least to most memory used. IO_FLAG_MMAP_IFC
+# also maps flat vectors, which IO_FLAG_MMAP reads into memory.
+OPEN_FLAGS = [
+    getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY,
+    faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY,
+    0,
+]
+
+# docstore.documents.deleted values
+LIVE = 0
+DELETED = 1
+# Removed from every segment; the row is kept until the next snapshot for
+# searches still running on the previous segments
+COMPACTED = 2
+
+# metric name -> (FAISS metric, normalize vectors, LangChain distance strategy)
+METRICS = {
+    "cosine": (faiss.METRIC_INNER_PRODUCT, True, DistanceStrategy.MAX_INNER_PRODUCT),
+    "ip": (faiss.METRIC_INNER_PRODUCT, False, DistanceStrategy.MAX_INNER_PRODUCT),
+    "l2": (faiss.METRIC_L2, False, DistanceStrategy.EUCLIDEAN_DISTANCE),
+}
+
+
+def min_vectors(index_type):
+    """
+    Return the number of vectors needed to train index_type; fewer are kept in a flat index.
+    """
+    if index_type == "ivf_flat":
+        return FAISS_NLIST * MIN_TRAIN_POINTS_PER_LIST
+    if index_type == "ivf_pq":
+        # PQ also needs at least one training vector per centroid
+        return max(FAISS_NLIST * MIN_TRAIN_POINTS_PER_LIST, 2 ** FAISS_PQ_NBITS)
+    return 0
+
+
+def build_index(dimension, metric, index_type=FAISS_INDEX_TYPE):
+    """
+    Create an empty FAISS index of the configured type that stores vectors under explicit ids.
+
+    Args:
+        dimension (int): Vector dimension
+        metric (int): faiss.METRIC_L2 or faiss.METRIC_INNER_PRODUCT
+        index_type (str): "flat", "ivf_flat", "hnsw" or "ivf_pq"
+
+    Returns:
+        faiss.Index: The index; IVF indexes still need training. Add vectors with add_with_ids.
+    """
+    if index_type == "flat":
+        description = "Flat"
+    elif index_type == "ivf_flat":
+        description = f"IVF{FAISS_NLIST},Flat"
+    elif index_type == "hnsw":
+        description = f"HNSW{FAISS_HNSW_M},Flat"
+    elif index_type == "ivf_pq":
+        description = f"IVF{FAISS_NLIST},PQ{FAISS_PQ_M}x{FAISS_PQ_NBITS}"
+    else:
+        raise ValueError(f"Unknown FAISS index type: {index_type}")
+
+    index = faiss.index_factory(dimension, description, metric)
+    if index_type == "hnsw":
+        faiss.downcast_index(index).hnsw.efConstruction = FAISS_EF_CONSTRUCTION
+    if faiss.try_extract_index_ivf(index) is not None:
+        # IVF stores ids itself, and an ID map over IVF breaks on remove_ids
+        return index
+    return faiss.IndexIDMap2(index)
+
+
+def apply_search_params(index):
+    """
+    Set the recall/latency knobs (nprobe for IVF, efSearch for HNSW) on a loaded index.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = FAISS_NPROBE
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap2):
+        index = faiss.downcast_index(index.index)
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = FAISS_EF_SEARCH
+
+
+def _inner(index):
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def is_flat(index):
+    return isinstance(_inner(index), faiss.IndexFlat)
+
+
+def segment_ids(index):
+    """
+    Return the ids (docstore positions) of the vectors in a segment.
+    """
+    outer = faiss.downcast_index(index)
+    if isinstance(outer, faiss.IndexIDMap2):
+        return faiss.vector_to_array(outer.id_map)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        invlists = ivf.invlists
+        lists = [
+            faiss.rev_swig_ptr(invlists.get_ids(list_no), invlists.list_size(list_no)).copy()
+            for list_no in range(ivf.nlist) if invlists.list_size(list_no)
+        ]
+        return np.concatenate(lists) if lists else np.empty(0, dtype=np.int64)
+    # A single-file index from an earlier version numbers vectors by position
+    return np.arange(index.ntotal, dtype=np.int64)
+
+
+def segment_vectors(index):
+    """
+    Return (vectors, ids) of an index loaded into memory. Exact except for PQ indexes.
+    """
+    ids = segment_ids(index)
+    outer = faiss.downcast_index(index)
+    if isinstance(outer, faiss.IndexIDMap2):
+        inner = faiss.downcast_index(outer.index)
+        return inner.reconstruct_n(0, inner.ntotal), ids
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return ivf.reconstruct_batch(ids), ids
+    return index.reconstruct_n(0, index.ntotal), ids
+
+
+class SqliteDocstore(Docstore):
+    """
+    Keeps the documents of a FAISS index on disk, keyed by document id and by
+    their position, which is also their vector's id in the index.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                position INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                page_content TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.commit()
+        self.positions = PositionMapping(self)
+
+    def search(self, search):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT page_content, metadata FROM documents WHERE id = ? AND deleted = ?", (search, LIVE)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def add_rows(self, rows):
+        """
+        Store (position, id, document) rows.
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO documents (position, id, page_content, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (position, doc_id, doc.page_content, json.dumps(doc.metadata))
+                    for position, doc_id, doc in rows
+                ],
+            )
+            self._conn.commit()
+
+    def delete(self, ids):
+        """
+        Mark documents as deleted and return their index positions.
+        """
+        ids = list(ids)
+        positions = []
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                positions.extend(
+                    row[0] for row in self._conn.execute(
+                        f"SELECT position FROM documents WHERE deleted = {LIVE} AND id IN ({placeholders})", batch
+                    )
+                )
+                self._conn.execute(
+                    f"UPDATE documents SET deleted = {DELETED} WHERE deleted = {LIVE} AND id IN ({placeholders})",
+                    batch,
+                )
+            self._conn.commit()
+        return positions
+
+    def live_positions(self, positions):
+        """
+        Return the subset of positions whose documents haven't been deleted.
+        """
+        positions = [int(position) for position in positions]
+        live = set()
+        with self._lock:
+            for start in range(0, len(positions), 500):
+                batch = positions[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                live.update(
+                    row[0] for row in self._conn.execute(
+                        f"SELECT position FROM documents WHERE deleted = {LIVE} AND position IN ({placeholders})",
+                        batch,
+                    )
+                )
+        return live
+
+    def deleted_positions(self):
+        """
+        Return the positions of deleted documents whose vectors are still in the index.
+        """
+        with self._lock:
+            return np.array(
+                [row[0] for row in self._conn.execute("SELECT position FROM documents WHERE deleted = ?", (DELETED,))],
+                dtype=np.int64,
+            )
+
+    def tombstone_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents WHERE deleted = ?", (DELETED,)).fetchone()[0]
+
+    def mark_compacted(self):
+        """
+        Record that deleted vectors were removed from the index, and drop the
+        rows compacted by the previous snapshot.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE deleted = ?", (COMPACTED,))
+            self._conn.execute("UPDATE documents SET deleted = ? WHERE deleted = ?", (COMPACTED, DELETED))
+            self._conn.commit()
+
+    def truncate(self, size):
+        """
+        Drop rows at or beyond position size, i.e. rows whose vectors were never snapshotted.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE position >= ?", (size,))
+            self._conn.commit()
+
+    def id_at(self, position):
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM documents WHERE position = ?", (position,)).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def iter_positions(self):
+        with self._lock:
+            positions = [row[0] for row in self._conn.execute("SELECT position FROM documents ORDER BY position")]
+        return iter(positions)
+
+
+class PositionMapping(Mapping):
+    """
+    Read-only index position -> document id mapping backed by the docstore,
+    used as FAISS.index_to_docstore_id so the mapping isn't held in memory.
+    """
+
+    def __init__(self, docstore):
+        self.docstore = docstore
+
+    def __getitem__(self, position):
+        return self.docstore.id_at(int(position))
+
+    def __len__(self):
+        return self.docstore.count()
+
+    def __iter__(self):
+        return self.docstore.iter_positions()
+
+
+class WriterLock:
+    """
+    Exclusive lock on a store directory, held by the one process with
+    unsnapshotted writes. The OS releases it if that process dies.
+    """
+
+    def __init__(self, path, timeout=FAISS_WRITER_LOCK_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._file = None
+        self._lock = threading.Lock()
+
+    @property
+    def held(self):
+        return self._file is not None
+
+    def acquire(self, blocking=True, on_acquired=None):
+        """
+        Take the lock, waiting up to timeout for another process to release it.
+
+        Args:
+            blocking (bool): If False, return False at once when another process holds the lock
+            on_acquired (callable, optional): Run while the lock is being taken, before other threads may use it
+
+        Returns:
+            bool: Whether the lock is held
+
+        Raises:
+            RuntimeError: If another process still holds the lock after timeout seconds
+        """
+        with self._lock:
+            if self._file is not None:
+                return True
+            file = open(self.path, "a+")
+            deadline = time.monotonic() + self.timeout
+            while True:
+                try:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if not blocking or time.monotonic() >= deadline:
+                        file.close()
+                        if not blocking:
+                            return False
+                        raise RuntimeError(
+                            f"{os.path.dirname(self.path)} is being written by another process."
+                        )
+                    time.sleep(0.1)
+            try:
+                if on_acquired is not None:
+                    on_acquired()
+            except Exception:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+                file.close()
+                raise
+            self._file = file
+            return True
+
+    def release(self):
+        with self._lock:
+            if self._file is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+                self._file.close()
+                self._file = None
+
+
+class ManagedFaissStore:
+    """
+    A FAISS index kept on disk and shared by every request in the process.
+
+    The index is a set of segment files listed in a manifest, each
+    memory-mapped read-only so searching doesn't load them into RAM. New
+    vectors go to a few small in-memory indexes searched together with the
+    segments, and snapshot() writes them out as a new flat segment.
+    Snapshots also remove deleted vectors from the segments holding them and
+    merge small segments: flat segments are combined once there are more than
+    FAISS_MAX_SEGMENTS, and folded into one index of FAISS_INDEX_TYPE once
+    there are enough vectors to train it. Vector ids are docstore positions,
+    so they never change.
+
+    Searches run outside the store's lock on the indexes current when they
+    started. No index is changed once it can be searched: writes build new
+    indexes and a new view over them, so a search never sees an index being
+    modified.
+
+    A process takes the directory's writer lock on its first write and keeps
+    it until its writes are snapshotted, so writers in other processes wait
+    rather than overwrite each other. Rows a crashed writer never snapshotted
+    are dropped by the next writer. Readers in other processes pick up new
+    snapshots on their next search.
+    """
+
+    def __init__(self, directory, metric=METRICS[FAISS_METRIC][0]):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.metric = metric
+        self.docstore = SqliteDocstore(os.path.join(directory, DOCSTORE_FILE_NAME))
+        self.writer = WriterLock(os.path.join(directory, LOCK_FILE_NAME))
+        self._lock = threading.RLock()
+        self.segments = []
+        # In-memory flat indexes of the vectors appended since the last snapshot
+        self.pending = []
+        self._view = None
+        self._manifest_mtime = None
+        self._next_position = 0
+        self._tombstones = 0
+        self._load()
+
+    @property
+    def d(self):
+        for index in [index for _, index in self.segments] + self.pending:
+            return index.d
+        return 0
+
+    @property
+    def ntotal(self):
+        return sum(index.ntotal for index in [index for _, index in self.segments] + self.pending)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_manifest(self):
+        path = self._path(MANIFEST_FILE_NAME)
+        if os.path.exists(path):
+            mtime = os.stat(path).st_mtime_ns
+            with open(path) as file:
+                manifest = json.load(file)
+            return manifest["segments"], manifest["next_position"], mtime
+        if os.path.exists(self._path(INDEX_FILE_NAME)):
+            return [INDEX_FILE_NAME], None, None
+        return [], 0, None
+
+    def _open_segment(self, name):
+        for flags in OPEN_FLAGS:
+            try:
+                index = faiss.read_index(self._path(name), flags)
+                break
+            except RuntimeError:
+                # Not every index type can be memory-mapped
+                if not flags:
+                    raise
+        apply_search_params(index)
+        return index
+
+    def _load(self):
+        # (Re)open the segments listed in the manifest if it changed
+        names, next_position, mtime = self._read_manifest()
+        if mtime is not None and mtime == self._manifest_mtime:
+            return
+        open_segments = dict(self.segments)
+        self.segments = [(name, open_segments.get(name) or self._open_segment(name)) for name in names]
+        if self.segments:
+            # An existing index keeps the metric it was built with
+            self.metric = self.segments[0][1].metric_type
+        if next_position is None:
+            next_position = sum(index.ntotal for _, index in self.segments)
+        self._next_position = next_position
+        self._manifest_mtime = mtime
+        self._tombstones = self.docstore.tombstone_count()
+        self._build_view()
+
+    def _build_view(self):
+        # Always a new object: searches in flight keep the view they started with
+        indexes = [index for _, index in self.segments] + self.pending
+        if len(indexes) <= 1:
+            self._view = indexes[0] if indexes else None
+            return
+        # Shards return their own ids, which are docstore positions
+        self._view = faiss.IndexShards(self.d, False, False)
+        self._view.metric_type = self.metric
+        for index in indexes:
+            self._view.add_shard(index)
+
+    def _reconcile(self):
+        # Runs when this process takes the writer lock: no other process has pending writes now
+        with self._lock:
+            self._load()
+            # Rows beyond the last snapshot belong to a writer that died before snapshotting
+            self.docstore.truncate(self._next_position)
+
+    def _acquire_writer(self, blocking=True):
+        return self.writer.acquire(blocking=blocking, on_acquired=self._reconcile)
+
+    def search(self, vectors, k):
+        """
+        Search snapshot and pending vectors together, skipping deleted documents.
+        Has the same signature and return value as faiss.Index.search.
+        """
+        with self._lock:
+            if not self.pending and not self.writer.held:
+                # Pick up snapshots written by another process
+                try:
+                    self._load()
+                except RuntimeError:
+                    # A segment was replaced while the manifest was read; retry on the next search
+                    pass
+            view, ntotal, tombstones = self._view, self.ntotal, self._tombstones
+
+        out_distances = np.full((len(vectors), k), np.inf, dtype=np.float32)
+        out_indices = np.full((len(vectors), k), -1, dtype=np.int64)
+        if view is None or ntotal == 0:
+            return out_distances, out_indices
+        fetch_k = min(k + tombstones, ntotal)
+        while True:
+            distances, indices = view.search(vectors, fetch_k)
+            # The docstore is shared by all processes, so deletes anywhere are seen at once
+            live = self.docstore.live_positions(np.unique(indices[indices >= 0]))
+            keeps = [[j for j, i in enumerate(row) if i in live][:k] for row in indices]
+            if fetch_k >= ntotal or all(len(keep) == k for keep in keeps):
+                break
+            fetch_k = min(fetch_k * 2, ntotal)
+        for row, keep in enumerate(keeps):
+            out_distances[row, :len(keep)] = distances[row, keep]
+            out_indices[row, :len(keep)] = indices[row, keep]
+        return out_distances, out_indices
+
+    def append(self, vectors, ids, documents):
+        """
+        Append vectors with their ids and documents.
+
+        Args:
+            vectors (np.ndarray): float32 array of shape (n, d)
+            ids (list): Document ids
+            documents (list): LangChain Documents
+
+        Raises:
+            RuntimeError: If another process keeps the store's writer lock for FAISS_WRITER_LOCK_TIMEOUT
+        """
+        while True:
+            self._acquire_writer()
+            with self._lock:
+                # A snapshot in another thread may have released the lock meanwhile
+                if not self.writer.held:
+                    continue
+                positions = np.arange(self._next_position, self._next_position + len(vectors), dtype=np.int64)
+                self.docstore.add_rows(
+                    (int(position), doc_id, doc) for position, doc_id, doc in zip(positions, ids, documents)
+                )
+                batch = faiss.IndexIDMap2(faiss.IndexFlat(self.d or vectors.shape[1], self.metric))
+                batch.add_with_ids(vectors, positions)
+                pending = self.pending + [batch]
+                # Merge batches into new indexes of doubling size, so a search goes through few of them
+                while len(pending) > 1 and pending[-1].ntotal >= pending[-2].ntotal:
+                    pending = pending[:-2] + [self._combine(pending[-2:])]
+                self.pending = pending
+                self._next_position += len(vectors)
+                self._build_view()
+                if sum(index.ntotal for index in self.pending) >= FAISS_SNAPSHOT_EVERY:
+                    self.snapshot()
+                return
+
+    def delete(self, ids):
+        while True:
+            self._acquire_writer()
+            with self._lock:
+                if not self.writer.held:
+                    continue
+                positions = self.docstore.delete(ids)
+                if self.pending and positions:
+                    self.pending = [self._without(index, positions) for index in self.pending]
+                    self._build_view()
+                self._tombstones = self.docstore.tombstone_count()
+                if not self.pending:
+                    # Deletes are durable in the docstore; the next snapshot compacts them
+                    self.writer.release()
+                return
+
+    def snapshot(self):
+        """
+        Write pending vectors out as a segment, remove deleted vectors from the
+        segments, merge segments if needed, and swap in the new manifest.
+        """
+        if not self.writer.held:
+            with self._lock:
+                if not self._tombstones:
+                    return
+            # Compact deletes made by any process, unless another writer will
+            if not self._acquire_writer(blocking=False):
+                return
+        with self._lock:
+            if not self.writer.held:
+                return
+            try:
+                self._snapshot()
+            finally:
+                if not self.pending:
+                    self.writer.release()
+
+    def _combine(self, indexes):
+        # New flat index holding the vectors of pending indexes, which are left unchanged
+        return self._build_index(*self._gather([(None, index) for index in indexes]), "flat")
+
+    def _without(self, index, positions):
+        # Copy of a pending index without the given vectors; the index itself may be in use by a search
+        dead = np.intersect1d(segment_ids(index), positions)
+        if not dead.size:
+            return index
+        index = faiss.clone_index(index)
+        index.remove_ids(faiss.IDSelectorBatch(dead))
+        return index
+
+    def _snapshot(self):
+        segments = self._compact(list(self.segments), self.docstore.deleted_positions())
+        pending = [index for index in self.pending if index.ntotal]
+        if pending:
+            segments.append(self._write_segment(pending[0] if len(pending) == 1 else self._combine(pending)))
+        segments = self._merge(segments)
+
+        tmp_path = self._path(f"{MANIFEST_FILE_NAME}.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump({"segments": [name for name, _ in segments], "next_position": self._next_position}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self._path(MANIFEST_FILE_NAME))
+        self.docstore.mark_compacted()
+
+        # Open the new segments memory-mapped instead of keeping the in-memory copies
+        names = {name for name, _ in segments}
+        self.segments = [(name, index) for name, index in self.segments if name in names]
+        self.pending = []
+        self._manifest_mtime = None
+        self._load()
+        # Drop replaced segments and ones merged in this snapshot. Processes
+        # still searching old segments have them mapped, so unlinking is safe.
+        for name in os.listdir(self.directory):
+            is_segment = name == INDEX_FILE_NAME or name.startswith("segment-") and name.endswith(".faiss")
+            if is_segment and name not in names:
+                os.remove(self._path(name))
+
+    def _write_segment(self, index):
+        name = f"segment-{uuid.uuid4().hex}.faiss"
+        tmp_path = self._path(f"{name}.tmp")
+        faiss.write_index(index, tmp_path)
+        with open(tmp_path, "rb") as file:
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self._path(name))
+        return name, index
+
+    def _compact(self, segments, deleted):
+        if not deleted.size:
+            return segments
+        compacted = []
+        for name, index in segments:
+            dead = np.intersect1d(segment_ids(index), deleted)
+            if not dead.size:
+                compacted.append((name, index))
+                continue
+            index = faiss.read_index(self._path(name))
+            removable = faiss.try_extract_index_ivf(index) is not None or (
+                is_flat(index) and isinstance(faiss.downcast_index(index), faiss.IndexIDMap2)
+            )
+            if removable:
+                index.remove_ids(faiss.IDSelectorBatch(dead))
+            else:
+                # HNSW can't remove vectors, so rebuild it without them
+                vectors, ids = segment_vectors(index)
+                keep = ~np.isin(ids, dead)
+                index = self._build_index(vectors[keep], ids[keep], "hnsw" if not is_flat(index) else "flat")
+            if index.ntotal:
+                compacted.append(self._write_segment(index))
+        return compacted
+
+    def _merge(self, segments):
+        flat = [(name, index) for name, index in segments if is_flat(index)]
+        trained = [(name, index) for name, index in segments if not is_flat(index)]
+        if len(segments) > FAISS_MAX_SEGMENTS and len(flat) > 1:
+            flat = [self._write_segment(self._build_index(*self._gather(flat), "flat"))]
+        flat_total = sum(index.ntotal for _, index in flat)
+        if FAISS_INDEX_TYPE == "flat" or not flat_total:
+            return trained + flat
+        if not trained and flat_total >= min_vectors(FAISS_INDEX_TYPE):
+            return [self._write_segment(self._build_index(*self._gather(flat), FAISS_INDEX_TYPE))]
+        if len(trained) == 1 and flat_total >= FAISS_FOLD_RATIO * trained[0][1].ntotal:
+            return [self._write_segment(self._fold(trained[0][0], flat))]
+        return trained + flat
+
+    def _gather(self, segments):
+        parts = [segment_vectors(index) for _, index in segments]
+        return np.vstack([vectors for vectors, _ in parts]), np.concatenate([ids for _, ids in parts])
+
+    def _fold(self, name, flat):
+        # Add flat segments' vectors to the trained index, in memory
+        index = faiss.read_index(self._path(name))
+        vectors, ids = self._gather(flat)
+        ivf = faiss.try_extract_index_ivf(index)
+        total = index.ntotal + len(vectors)
+        undersized = ivf is not None and ivf.nlist < FAISS_NLIST and total >= min_vectors(FAISS_INDEX_TYPE)
+        has_ids = ivf is not None or isinstance(faiss.downcast_index(index), faiss.IndexIDMap2)
+        if undersized or not has_ids:
+            # Retrain an index trained on too few vectors by an earlier version,
+            # or give an earlier single-file index explicit ids
+            old_vectors, old_ids = segment_vectors(index)
+            return self._build_index(
+                np.vstack([old_vectors, vectors]), np.concatenate([old_ids, ids]), FAISS_INDEX_TYPE
+            )
+        index.add_with_ids(vectors, ids)
+        return index
+
+    def _build_index(self, vectors, ids, index_type):
+        if len(vectors) < min_vectors(index_type):
+            index_type = "flat"
+        index = build_index(self.d or vectors.shape[1], self.metric, index_type=index_type)
+        if not index.is_trained:
+            sample = vectors
+            if len(vectors) > FAISS_TRAIN_SAMPLE:
+                rows = np.random.default_rng().choice(len(vectors), FAISS_TRAIN_SAMPLE, replace=False)
+                sample = vectors[rows]
+            index.train(sample)
+        index.add_with_ids(vectors, ids)
+        return index
+
+
+class ManagedFAISS(FAISS):
+    """
+    LangChain FAISS vector store that reads and writes through a ManagedFaissStore.
+    """
+
+    def __init__(self, store, embedding_function, **kwargs):
+        super().__init__(
+            embedding_function=embedding_function,
+            index=store,
+            docstore=store.docstore,
+            index_to_docstore_id=store.docstore.positions,
+            **kwargs,
+        )
+        self.store = store
+
+    def add_embeddings(self, text_embeddings, metadatas=None, ids=None, **kwargs):
+        texts, embeddings = zip(*text_embeddings)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = np.array(embeddings, dtype=np.float32)
+        if self._normalize_L2:
+            faiss.normalize_L2(vectors)
+        documents = [Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)]
+        self.store.append(vectors, ids, documents)
+        return ids
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        embeddings = self._embed_documents(texts)
+        return self.add_embeddings(zip(texts, embeddings), metadatas=metadatas, ids=ids)
+
+    def delete(self, ids=None, **kwargs):
+        if ids is None:
+            raise ValueError("No ids provided to delete.")
+        self.store.delete(ids)
+        return True
+
+    def snapshot(self):
+        self.store.snapshot()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_faiss_store(embedding_model, embedding_model_name):
+    """
+    Return the process-wide FAISS store for an embedding model, opening it on first use.
+    Each embedding model gets its own directory because dimensions differ.
+    """
+    with _stores_lock:
+        if embedding_model_name not in _stores:
+            _stores[embedding_model_name] = ManagedFaissStore(
+                os.path.join(FAISS_STORE_DIR, embedding_model_name)
+            )
+        store = _stores[embedding_model_name]
+    _, normalize_L2, distance_strategy = METRICS[FAISS_METRIC]
+    return ManagedFAISS(
+        store, embedding_model, normalize_L2=normalize_L2, distance_strategy=distance_strategy
+    )
+
+
+def snapshot_all():
+    """
+    Snapshot every open store, e.g. on shutdown.
+    """
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.snapshot()
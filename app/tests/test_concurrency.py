@@ -0,0 +1,43 @@
+import asyncio
+import contextlib
+import time
+
+import httpx
+import pytest
+
+import main as server
+from benchmarks.concurrency_bench import ENDPOINTS, patches
+from utils.answer_cache import InvalidationLog
+
+# Seconds each stubbed LLM or chain call takes
+LATENCY = 0.2
+REQUESTS = 16
+
+
+async def post_all(path, form):
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post(path, data={**form, "question": f"question {i}"}) for i in range(REQUESTS)
+        ))
+        return responses, time.perf_counter() - started
+
+
+@pytest.mark.parametrize("path", list(ENDPOINTS))
+def test_question_endpoints_serve_requests_concurrently(path, tmp_path, monkeypatch):
+    """
+    Requests waiting on the LLM must not hold up each other: sixteen at once
+    finish in about the time of one, not sixteen times that.
+    """
+    monkeypatch.setattr(
+        server.answer_cache, "invalidation_log", InvalidationLog(str(tmp_path / "invalidations.db"))
+    )
+    with contextlib.ExitStack() as stack:
+        for patch in patches(LATENCY):
+            stack.enter_context(patch)
+        responses, elapsed = asyncio.run(post_all(path, ENDPOINTS[path]))
+
+    assert [response.status_code for response in responses] == [200] * REQUESTS
+    assert not any(response.json().get("cached") for response in responses)
+    assert elapsed < REQUESTS * LATENCY / 4
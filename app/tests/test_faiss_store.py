@@ -0,0 +1,67 @@
+import threading
+
+import numpy as np
+from langchain.schema import Document
+
+from stores import faiss_store
+from stores.faiss_store import ManagedFaissStore
+
+DIMENSION = 64
+BATCHES = 300
+
+
+def random_vectors(rng, n):
+    return rng.normal(size=(n, DIMENSION)).astype(np.float32)
+
+
+def test_search_while_appending_and_deleting(tmp_path, monkeypatch):
+    """
+    Searches running while another thread appends and deletes must neither
+    crash nor return deleted documents.
+    """
+    monkeypatch.setattr(faiss_store, "FAISS_SNAPSHOT_EVERY", 100000)
+    store = ManagedFaissStore(str(tmp_path / "store"))
+    rng = np.random.default_rng(0)
+    store.append(random_vectors(rng, 100), [f"seed-{i}" for i in range(100)],
+                 [Document(page_content=f"seed {i}") for i in range(100)])
+    # Searches then go through a view over a segment and the pending vectors
+    store.snapshot()
+
+    stop = threading.Event()
+    errors = []
+
+    def read():
+        reader_rng = np.random.default_rng()
+        try:
+            while not stop.is_set():
+                distances, indices = store.search(random_vectors(reader_rng, 32), 10)
+                assert indices.shape == (32, 10) and (indices >= 0).all()
+        except Exception as e:
+            errors.append(e)
+
+    def write():
+        try:
+            for batch in range(BATCHES):
+                ids = [f"doc-{batch}-{i}" for i in range(50)]
+                store.append(random_vectors(rng, 50), ids, [Document(page_content=doc_id) for doc_id in ids])
+                store.delete(ids[::3])
+        except Exception as e:
+            errors.append(e)
+        finally:
+            stop.set()
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    writer = threading.Thread(target=write)
+    for thread in readers + [writer]:
+        thread.start()
+    for thread in readers + [writer]:
+        thread.join(timeout=120)
+
+    assert not errors
+    assert not any(thread.is_alive() for thread in readers + [writer])
+    # Deleted documents are never returned
+    _, indices = store.search(random_vectors(rng, 20), 50)
+    found = np.unique(indices[indices >= 0])
+    assert store.docstore.live_positions(found) == set(found.tolist())
+    store.snapshot()
+    assert store.ntotal == 100 + BATCHES * (50 - 17)
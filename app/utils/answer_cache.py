@@ -0,0 +1,277 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+
+from configurables.embed_configs import get_embedding_model
+from utils.initialize import load_env_variables
+from utils.config_settings import config
+
+env_name = load_env_variables()
+
+ANSWER_CACHE_THRESHOLD = config[env_name].ANSWER_CACHE_THRESHOLD
+ANSWER_CACHE_MAX_ENTRIES = config[env_name].ANSWER_CACHE_MAX_ENTRIES
+ANSWER_CACHE_TTL = config[env_name].ANSWER_CACHE_TTL
+ANSWER_CACHE_EMBEDDING_MODEL = config[env_name].ANSWER_CACHE_EMBEDDING_MODEL
+ANSWER_CACHE_INVALIDATION_PATH = config[env_name].ANSWER_CACHE_INVALIDATION_PATH
+
+# Nearest past questions checked for one with the same scope
+SEARCH_CANDIDATES = 8
+
+
+def document_sources(documents):
+    """
+    Return the sources of retrieved documents, for answer cache invalidation.
+    """
+    sources = set()
+    for document in documents:
+        source = document.metadata.get("source") or document.metadata.get("name")
+        if source:
+            sources.add(str(source))
+    return sources
+
+
+class InvalidationLog:
+    """
+    Sources invalidated by any process, in a SQLite table shared by all workers.
+
+    Every invalidation gets a sequence number that never decreases. Rows older
+    than retention_seconds are pruned: an answer cached before them has
+    expired by then.
+    """
+
+    def __init__(self, path=ANSWER_CACHE_INVALIDATION_PATH, retention_seconds=ANSWER_CACHE_TTL):
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS answer_invalidations (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sources TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    def append(self, sources):
+        """
+        Record that the answers built from sources are stale.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT INTO answer_invalidations (sources, created_at) VALUES (?, ?)",
+                    (json.dumps(sorted(sources)), now),
+                )
+                conn.execute(
+                    "DELETE FROM answer_invalidations WHERE created_at < ?", (now - self.retention_seconds,)
+                )
+
+    def latest(self):
+        """
+        Return the sequence number of the last invalidation, or 0 if there was none.
+        """
+        with self._lock:
+            return self._latest()
+
+    def _latest(self):
+        # Pruning never lowers it: AUTOINCREMENT keeps the highest number ever used here
+        row = self._connection().execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'answer_invalidations'"
+        ).fetchone()
+        return row[0] if row is not None else 0
+
+    def since(self, seq):
+        """
+        Return the latest sequence number and the source sets invalidated after seq, oldest first.
+        """
+        with self._lock:
+            latest = self._latest()
+            if latest <= seq:
+                return seq, []
+            rows = self._connection().execute(
+                "SELECT sources FROM answer_invalidations WHERE seq > ? ORDER BY seq", (seq,)
+            ).fetchall()
+        return latest, [set(json.loads(row[0])) for row in rows]
+
+
+class AnswerCache:
+    """
+    In-process semantic cache of answers to past questions.
+
+    Questions are embedded and kept in a FAISS inner-product index. A new
+    question gets the stored answer of the most similar past question asked
+    with the same scope (endpoint, LLM, temperature), if their cosine
+    similarity is at least threshold and the entry hasn't expired.
+
+    Each entry records the sources its answer was built from. Re-ingesting
+    any of those sources drops the entry. Entries without sources, such as
+    SQL answers, are dropped on every ingest because their inputs are unknown.
+    Invalidations go through a log shared by every worker, which each process
+    catches up on before a lookup or store, so an ingest in one worker drops
+    the stale answers in all of them. An answer computed while an
+    invalidation was made isn't stored, since it may predate the ingest.
+    """
+
+    def __init__(
+        self,
+        threshold=ANSWER_CACHE_THRESHOLD,
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds=ANSWER_CACHE_TTL,
+        embedding_model_name=ANSWER_CACHE_EMBEDDING_MODEL,
+        invalidation_log=None,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embedding_model_name = embedding_model_name
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.invalidation_log = invalidation_log or InvalidationLog(retention_seconds=ttl_seconds)
+        self._index = None
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def embed(self, question):
+        """
+        Return the normalized embedding of a question, as used for lookups and stores.
+        """
+        vector = np.asarray(
+            get_embedding_model(self.embedding_model_name).embed_query(question), dtype=np.float32
+        ).reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def lookup(self, question_vector, scope):
+        """
+        Return the cached response for the closest matching question, or None.
+
+        Args:
+            question_vector: The question's vector from embed()
+            scope (tuple): What else the answer depends on, e.g. (endpoint, llm_model, temperature)
+
+        Returns:
+            tuple: (the stored response with "cached", "similarity" and "matched_question"
+            added, or None; the invalidation generation, to pass to store() after a miss)
+        """
+        with self._lock:
+            self._catch_up()
+            if self._index is None or not self._entries:
+                self.misses += 1
+                return None, self._generation
+            similarities, ids = self._index.search(question_vector, min(SEARCH_CANDIDATES, len(self._entries)))
+            now = time.monotonic()
+            for similarity, entry_id in zip(similarities[0], ids[0]):
+                if similarity < self.threshold:
+                    break
+                entry = self._entries.get(int(entry_id))
+                if entry is None or entry["scope"] != scope:
+                    continue
+                if entry["expires_at"] < now:
+                    self._remove([int(entry_id)])
+                    continue
+                self._entries.move_to_end(int(entry_id))
+                self.hits += 1
+                response = {
+                    **entry["response"],
+                    "cached": True,
+                    "similarity": float(similarity),
+                    "matched_question": entry["question"],
+                }
+                return response, self._generation
+            self.misses += 1
+            return None, self._generation
+
+    def store(self, question, question_vector, scope, response, generation, sources=None):
+        """
+        Cache a response to a question, unless anything was invalidated since
+        lookup() returned generation.
+
+        Args:
+            question (str): The question asked
+            question_vector: The question's vector from embed()
+            scope (tuple): Same as for lookup()
+            response (dict): The JSON response to return for matching questions
+            generation: The generation lookup() returned
+            sources (set, optional): Sources the answer was built from
+        """
+        with self._lock:
+            self._catch_up()
+            if generation != self._generation:
+                return
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(question_vector.shape[1]))
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(question_vector, np.array([entry_id], dtype=np.int64))
+            self._entries[entry_id] = {
+                "question": question,
+                "scope": scope,
+                "response": response,
+                "sources": set(sources or ()),
+                "expires_at": time.monotonic() + self.ttl_seconds,
+            }
+            if len(self._entries) > self.max_entries:
+                self._remove(list(self._entries)[:len(self._entries) - self.max_entries])
+
+    def invalidate_sources(self, sources):
+        """
+        Drop entries built from any of these sources, and all entries without sources.
+        """
+        self.invalidation_log.append(set(sources))
+        with self._lock:
+            self._catch_up()
+
+    def _catch_up(self):
+        # Apply the invalidations made by any process since the last call
+        if self._generation is None:
+            # Nothing is cached yet, so earlier invalidations don't matter
+            self._generation = self.invalidation_log.latest()
+        self._generation, invalidated = self.invalidation_log.since(self._generation)
+        for sources in invalidated:
+            stale = [
+                entry_id for entry_id, entry in self._entries.items()
+                if not entry["sources"] or entry["sources"] & sources
+            ]
+            self._remove(stale)
+            self.invalidations += len(stale)
+
+    def _remove(self, entry_ids):
+        if not entry_ids:
+            return
+        self._index.remove_ids(np.array(entry_ids, dtype=np.int64))
+        for entry_id in entry_ids:
+            self._entries.pop(entry_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "threshold": self.threshold,
+            }
+
+
+answer_cache = AnswerCache()
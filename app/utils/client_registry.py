@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import weakref
+
+import httpx
+
+from utils.concurrency import run_blocking
+from utils.initialize import load_env_variables
+from utils.config_settings import config
+
+env_name = load_env_variables()
+
+HTTP_MAX_CONNECTIONS = config[env_name].HTTP_MAX_CONNECTIONS
+HTTP_MAX_KEEPALIVE_CONNECTIONS = config[env_name].HTTP_MAX_KEEPALIVE_CONNECTIONS
+HTTP_KEEPALIVE_EXPIRY = config[env_name].HTTP_KEEPALIVE_EXPIRY
+HTTP_TIMEOUT = config[env_name].HTTP_TIMEOUT
+
+
+class PerLoopTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport that keeps a separate connection pool for each event loop.
+
+    httpx's async connections belong to the loop that opened them, so one
+    AsyncClient used from both the server's loop and another loop (e.g. the
+    embedding executor's) fails with "Event loop is closed" or hangs. A pool
+    is dropped when its loop is garbage collected.
+    """
+
+    def __init__(self, limits):
+        self.limits = limits
+        self._transports = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def transports(self):
+        with self._lock:
+            return list(self._transports.values())
+
+    def _transport(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = self._transports[loop] = httpx.AsyncHTTPTransport(limits=self.limits)
+            return transport
+
+    async def handle_async_request(self, request):
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self):
+        # Other loops' connections can only be closed on those loops; they go with the loops
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.pop(loop, None)
+            self._transports.clear()
+        if transport is not None:
+            await transport.aclose()
+
+
+def _pool_stats(client):
+    # httpx doesn't expose its pool, so read httpcore's; report nothing if that changes
+    transport = getattr(client, "_transport", None)
+    transports = transport.transports() if isinstance(transport, PerLoopTransport) else [transport]
+    connections = [
+        connection
+        for transport in transports
+        for connection in getattr(getattr(transport, "_pool", None), "connections", [])
+    ]
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {
+        "connections": len(connections),
+        "idle": idle,
+        "active": len(connections) - idle,
+        "max_connections": HTTP_MAX_CONNECTIONS,
+        "closed": client.is_closed,
+    }
+
+
+class ClientRegistry:
+    """
+    Builds each LLM, embedding, vector store or chain client once per
+    (kind, provider, parameters) and hands the same instance to every request.
+
+    Providers that accept an httpx client (OpenAI, Cohere) share one sync and
+    one async client, so their requests reuse keep-alive connections instead
+    of opening a new connection and TLS session per request.
+
+    Clients are built outside the registry lock, with one lock per key, so a
+    slow first build doesn't hold up requests for other clients. Code on the
+    event loop should use aget(), which builds off the loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clients = {}
+        self._build_locks = {}
+        self._http_client = None
+        self._async_http_client = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind, provider, factory, **params):
+        """
+        Return the cached client for these arguments, building it with factory(**params) on first use.
+
+        Args:
+            kind (str): "llm", "embedding", "vector_store", "chain", ...
+            provider (str): Provider or model name the client was selected by
+            factory (callable): Builds the client from params
+            **params: Hashable parameters that distinguish clients of one provider
+
+        Returns:
+            The client
+        """
+        key = (kind, provider, tuple(sorted(params.items())))
+        client = self._cached(key)
+        if client is not None:
+            return client
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        # Concurrent first requests for one key wait for a single build
+        with build_lock:
+            client = self._cached(key)
+            if client is not None:
+                return client
+            client = factory(**params)
+            with self._lock:
+                self.misses += 1
+                self._clients[key] = client
+                self._build_locks.pop(key, None)
+            return client
+
+    async def aget(self, kind, provider, factory, **params):
+        """
+        Like get(), but a client that isn't cached yet is built on the blocking pool, off the event loop.
+        """
+        client = self._cached((kind, provider, tuple(sorted(params.items()))))
+        if client is not None:
+            return client
+        return await run_blocking(self.get, kind, provider, factory, **params)
+
+    def _cached(self, key):
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.hits += 1
+            return client
+
+    def http_client(self):
+        """
+        Return the shared sync httpx client.
+        """
+        with self._lock:
+            if self._http_client is None or self._http_client.is_closed:
+                self._http_client = httpx.Client(limits=self._limits(), timeout=HTTP_TIMEOUT)
+            return self._http_client
+
+    def async_http_client(self):
+        """
+        Return the shared async httpx client, usable from any event loop.
+        """
+        with self._lock:
+            if self._async_http_client is None or self._async_http_client.is_closed:
+                self._async_http_client = httpx.AsyncClient(
+                    transport=PerLoopTransport(self._limits()), timeout=HTTP_TIMEOUT
+                )
+            return self._async_http_client
+
+    @staticmethod
+    def _limits():
+        return httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+
+    def stats(self):
+        """
+        Return cached client counts and connection pool usage.
+        """
+        with self._lock:
+            clients = {}
+            for kind, provider, _ in self._clients:
+                clients.setdefault(kind, {}).setdefault(provider, 0)
+                clients[kind][provider] += 1
+            pools = {}
+            if self._http_client is not None:
+                pools["http"] = _pool_stats(self._http_client)
+            if self._async_http_client is not None:
+                pools["async_http"] = _pool_stats(self._async_http_client)
+        return {"hits": self.hits, "misses": self.misses, "clients": clients, "pools": pools}
+
+    async def aclose(self):
+        """
+        Drop every cached client and close the shared connection pools.
+        """
+        with self._lock:
+            self._clients.clear()
+            http_client, self._http_client = self._http_client, None
+            async_http_client, self._async_http_client = self._async_http_client, None
+        if http_client is not None:
+            http_client.close()
+        if async_http_client is not None:
+            await async_http_client.aclose()
+
+
+client_registry = ClientRegistry()
@@ -0,0 +1,46 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.initialize import load_env_variables
+from utils.config_settings import config
+
+env_name = load_env_variables()
+
+BLOCKING_POOL_WORKERS = config[env_name].BLOCKING_POOL_WORKERS
+
+_pool = ThreadPoolExecutor(max_workers=BLOCKING_POOL_WORKERS, thread_name_prefix="blocking")
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+def _track(func):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight += 1
+    try:
+        return func()
+    finally:
+        with _in_flight_lock:
+            _in_flight -= 1
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a blocking call on the bounded worker pool so it doesn't stall the event loop.
+
+    Use it from async handlers for clients without async support (SQLite,
+    Neo4j setup, LLM chains without ainvoke). Calls beyond the pool size wait
+    for a free thread instead of starting new ones.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool, _track, functools.partial(func, *args, **kwargs))
+
+
+def blocking_pool_stats():
+    return {"workers": BLOCKING_POOL_WORKERS, "in_flight": _in_flight}
+
+
+def shutdown_blocking_pool():
+    _pool.shutdown(wait=False, cancel_futures=True)
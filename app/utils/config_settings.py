@@ -10,6 +10,88 @@ class Config:
     DEBUG = False
     TESTING = False
     FILE_TYPE = os.getenv("FILE_TYPE", "pdf,image")  # pdf,image,docx
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.db")
+    EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+    EMBEDDING_CACHE_VERSION = os.getenv("EMBEDDING_CACHE_VERSION", "1")  # bump to invalidate
+    PIPELINE_LOAD_BATCH_SIZE = int(os.getenv("PIPELINE_LOAD_BATCH_SIZE", 16))  # documents per chunking call
+    PIPELINE_EMBED_BATCH_SIZE = int(os.getenv("PIPELINE_EMBED_BATCH_SIZE", 1024))  # chunks per embedding call
+    PIPELINE_UPSERT_BATCH_SIZE = int(os.getenv("PIPELINE_UPSERT_BATCH_SIZE", 512))  # vectors per store write
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 4))  # batches buffered between stages
+    EMBED_MAX_BATCH_TOKENS = int(os.getenv("EMBED_MAX_BATCH_TOKENS", 100000))  # tokens per provider request
+    EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", 96))  # texts per provider request; Cohere allows 96
+    EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", 8))  # provider requests in flight
+    EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", 6))  # retries of a rate-limited request
+    HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))  # shared provider connection pool size
+    HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))  # seconds an idle connection is kept
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 60))
+    STARTUP_WARM_UP = os.getenv("STARTUP_WARM_UP", "true").lower() == "true"  # open remote resources at startup
+    SPECIAL_TOKENS_PATH = os.getenv(
+        "SPECIAL_TOKENS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tokenizer_special_tokens.json")
+    )  # Cohere special tokens, committed; refresh with python -m utils.preprocess
+    SEMANTIC_BREAKPOINT_PERCENTILE = float(os.getenv("SEMANTIC_BREAKPOINT_PERCENTILE", 95))
+    SEMANTIC_BUFFER_SIZE = int(os.getenv("SEMANTIC_BUFFER_SIZE", 1))  # neighbouring sentences embedded with each one
+    SEMANTIC_POOL_CHUNK_VECTORS = os.getenv(
+        "SEMANTIC_POOL_CHUNK_VECTORS", "false"
+    ).lower() == "true"  # store chunks under their mean sentence vector, not a chunk embedding; recall not yet compared
+    TOKEN_CHUNK_SIZE = int(os.getenv("TOKEN_CHUNK_SIZE", 512))  # tokens per chunk for the "token" strategy
+    TOKEN_CHUNK_OVERLAP = int(os.getenv("TOKEN_CHUNK_OVERLAP", 64))
+    TOKEN_CHUNK_ENCODING = os.getenv("TOKEN_CHUNK_ENCODING", "cl100k_base")
+    RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", 10000))
+    RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", 300))  # seconds a cached search result is served
+    ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))  # min cosine similarity of questions
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 5000))
+    ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 3600))  # seconds a cached answer is served
+    ANSWER_CACHE_EMBEDDING_MODEL = os.getenv("ANSWER_CACHE_EMBEDDING_MODEL", "cohere")  # embeds questions
+    ANSWER_CACHE_INVALIDATION_PATH = os.getenv(
+        "ANSWER_CACHE_INVALIDATION_PATH", "./answer_cache_invalidations.db"
+    )  # invalidations shared by every worker
+    BLOCKING_POOL_WORKERS = int(os.getenv("BLOCKING_POOL_WORKERS", 32))  # threads for blocking calls from async handlers
+    AGENT_SQL_TIMEOUT = float(os.getenv("AGENT_SQL_TIMEOUT", 30))  # seconds the SQL branch of /api/questions may take
+    AGENT_KG_TIMEOUT = float(os.getenv("AGENT_KG_TIMEOUT", 30))  # seconds the knowledge graph branch may take
+    AGENT_MERGE_TIMEOUT = float(os.getenv("AGENT_MERGE_TIMEOUT", 30))  # seconds merging both answers may take
+    SQL_DB_PATH = os.getenv("SQL_DB_PATH", "./app/documents.db")  # database behind the text-to-SQL chain
+    SQL_POOL_SIZE = int(os.getenv("SQL_POOL_SIZE", 5))  # pooled read-only connections to SQL_DB_PATH
+    SQL_QUERY_CACHE_PATH = os.getenv("SQL_QUERY_CACHE_PATH", "./sql_query_cache.db")  # question -> generated SQL
+    SQL_QUERY_CACHE_MAX_ENTRIES = int(os.getenv("SQL_QUERY_CACHE_MAX_ENTRIES", 10000))
+    SQL_QUERY_CACHE_SEMANTIC = os.getenv("SQL_QUERY_CACHE_SEMANTIC", "false").lower() == "true"  # also match similar questions
+    SQL_QUERY_CACHE_THRESHOLD = float(os.getenv("SQL_QUERY_CACHE_THRESHOLD", 0.97))  # min cosine similarity of questions
+    SQL_QUERY_CACHE_EMBEDDING_MODEL = os.getenv("SQL_QUERY_CACHE_EMBEDDING_MODEL", "cohere")
+    SQL_RESULT_CACHE_MAX_ENTRIES = int(os.getenv("SQL_RESULT_CACHE_MAX_ENTRIES", 1000))  # results kept until the data changes
+    METADATA_INGEST = os.getenv("METADATA_INGEST", "true").lower() == "true"  # record ingested documents in legal_docs
+    METADATA_SUMMARY_CHARS = int(os.getenv("METADATA_SUMMARY_CHARS", 1000))  # leading text kept as the summary
+    GRAPH_EXTRACTION_CONCURRENCY = int(os.getenv("GRAPH_EXTRACTION_CONCURRENCY", 8))  # chunks sent to the LLM at once
+    GRAPH_WRITE_BATCH_SIZE = int(os.getenv("GRAPH_WRITE_BATCH_SIZE", 100))  # extracted chunks per Neo4j write
+    JOB_DB_PATH = os.getenv("JOB_DB_PATH", "./ingestion_jobs.db")
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))  # ingestion jobs run at once per process
+    CHUNK_STORE_PATH = os.getenv("CHUNK_STORE_PATH", "./chunk_store.db")
+    CHUNK_STORE_PAGE_SIZE = int(os.getenv("CHUNK_STORE_PAGE_SIZE", 1000))  # default chunks per /api/persist page
+    CHUNK_STORE_MAX_PAGE_SIZE = int(os.getenv("CHUNK_STORE_MAX_PAGE_SIZE", 10000))
+    FAISS_STORE_DIR = os.getenv("FAISS_STORE_DIR", "./faiss_store")
+    FAISS_SNAPSHOT_EVERY = int(os.getenv("FAISS_SNAPSHOT_EVERY", 50000))  # unsnapshotted vectors before a snapshot
+    FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")  # flat, ivf_flat, hnsw, ivf_pq
+    FAISS_METRIC = os.getenv("FAISS_METRIC", "cosine")  # cosine, ip, l2; Pinecone indexes use cosine
+    FAISS_NLIST = int(os.getenv("FAISS_NLIST", 1024))  # IVF partitions
+    FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", 16))  # IVF partitions searched per query
+    FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", 32))  # HNSW neighbours per node
+    FAISS_EF_CONSTRUCTION = int(os.getenv("FAISS_EF_CONSTRUCTION", 200))
+    FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", 64))
+    FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", 64))  # PQ sub-quantizers; must divide the dimension
+    FAISS_PQ_NBITS = int(os.getenv("FAISS_PQ_NBITS", 8))
+    FAISS_TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", 100000))  # vectors used to train IVF indexes
+    FAISS_MAX_SEGMENTS = int(os.getenv("FAISS_MAX_SEGMENTS", 8))  # snapshot segments before small ones are merged
+    FAISS_FOLD_RATIO = float(os.getenv("FAISS_FOLD_RATIO", 0.1))  # flat vectors, relative to the main index, folded into it
+    FAISS_WRITER_LOCK_TIMEOUT = float(os.getenv("FAISS_WRITER_LOCK_TIMEOUT", 600))  # seconds to wait for another writer
+    GITHUB_INCREMENTAL_SYNC = os.getenv("GITHUB_INCREMENTAL_SYNC", "true").lower() == "true"
+    GITHUB_MANIFEST_PATH = os.getenv("GITHUB_MANIFEST_PATH", "./github_manifest.db")
+    DOCUMENT_PARSE_WORKERS = int(os.getenv("DOCUMENT_PARSE_WORKERS", 1))  # >1 parses files in a process pool
+    AWS_ENDPOINT_URL = os.getenv("AWS_ENDPOINT_URL")  # e.g. a MinIO or moto server
+    AWS_CONCURRENT_DOWNLOADS = os.getenv("AWS_CONCURRENT_DOWNLOADS", "false").lower() == "true"
+    AWS_DOWNLOAD_WORKERS = int(os.getenv("AWS_DOWNLOAD_WORKERS", 16))
+    AWS_PARSE_WORKERS = int(os.getenv("AWS_PARSE_WORKERS", os.cpu_count() or 1))
+    AWS_RANGE_THRESHOLD = int(os.getenv("AWS_RANGE_THRESHOLD", 16 * 1024 ** 2))  # bytes; larger objects use ranged GETs
+    AWS_RANGE_SIZE = int(os.getenv("AWS_RANGE_SIZE", 8 * 1024 ** 2))  # bytes per ranged GET
+    AWS_RANGE_WORKERS = int(os.getenv("AWS_RANGE_WORKERS", 4))  # ranged GETs in flight per object
 
 
 
@@ -0,0 +1,244 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+from utils.initialize import load_env_variables
+from utils.config_settings import config
+
+env_name = load_env_variables()
+
+EMBEDDING_CACHE_PATH = config[env_name].EMBEDDING_CACHE_PATH
+EMBEDDING_CACHE_MAX_BYTES = config[env_name].EMBEDDING_CACHE_MAX_BYTES
+EMBEDDING_CACHE_VERSION = config[env_name].EMBEDDING_CACHE_VERSION
+
+# SQLite limits the number of bound parameters per statement
+SQLITE_BATCH_SIZE = 500
+# Evict down to this fraction of the size limit so eviction doesn't run on every write
+EVICTION_LOW_WATERMARK = 0.9
+
+
+class EmbeddingCache:
+    """
+    Disk-backed, content-addressed store of embedding vectors with LRU eviction.
+
+    Vectors are stored as float32 blobs in SQLite, keyed on a hash of the model
+    name, model version, input type and text. When the stored vectors exceed
+    max_bytes, the least recently used ones are evicted.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_bytes=EMBEDDING_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access);
+            CREATE TABLE IF NOT EXISTS cache_size (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                total_bytes INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO cache_size (id, total_bytes) VALUES (0, 0);
+            CREATE TRIGGER IF NOT EXISTS embeddings_size_insert AFTER INSERT ON embeddings
+            BEGIN
+                UPDATE cache_size SET total_bytes = total_bytes + new.size WHERE id = 0;
+            END;
+            CREATE TRIGGER IF NOT EXISTS embeddings_size_delete AFTER DELETE ON embeddings
+            BEGIN
+                UPDATE cache_size SET total_bytes = total_bytes - old.size WHERE id = 0;
+            END;
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name, model_version, input_type, text):
+        """
+        Build the content-addressed key for one text.
+
+        Args:
+            model_name (str): Name of the embedding model
+            model_version (str): Version tag of the model
+            input_type (str): "document" or "query"; some providers embed them differently
+            text (str): The text to embed
+
+        Returns:
+            str: A hex sha256 digest
+        """
+        digest = hashlib.sha256()
+        for part in (model_name, model_version, input_type, text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get_many(self, keys):
+        """
+        Look up vectors for the given keys and mark the found ones as recently used.
+
+        Returns:
+            dict: key -> vector for every key present in the cache
+        """
+        keys = list(keys)
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_BATCH_SIZE):
+                batch = keys[start:start + SQLITE_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+                if rows:
+                    hit_keys = [row[0] for row in rows]
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_access = ? WHERE key IN ({','.join('?' * len(hit_keys))})",
+                        [now, *hit_keys],
+                    )
+            self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """
+        Store (key, vector) pairs, then evict least recently used vectors if over the size limit.
+        """
+        now = time.time()
+        rows = []
+        for key, vector in items:
+            blob = array("f", vector).tobytes()
+            rows.append((key, blob, len(blob), now))
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO embeddings (key, vector, size, last_access) VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET last_access = excluded.last_access
+                """,
+                rows,
+            )
+            if rows:
+                self._evict(row_size=rows[0][2])
+            self._conn.commit()
+
+    def _evict(self, row_size):
+        total_bytes = self._total_bytes()
+        if total_bytes <= self.max_bytes:
+            return
+        target = int(self.max_bytes * EVICTION_LOW_WATERMARK)
+        while total_bytes > target:
+            # All vectors of one model share a size, so this estimates the rows to drop
+            rows_needed = -(-(total_bytes - target) // row_size)
+            cursor = self._conn.execute(
+                """
+                DELETE FROM embeddings WHERE key IN (
+                    SELECT key FROM embeddings ORDER BY last_access LIMIT ?
+                )
+                """,
+                (min(rows_needed, SQLITE_BATCH_SIZE),),
+            )
+            if cursor.rowcount <= 0:
+                break
+            self.evictions += cursor.rowcount
+            total_bytes = self._total_bytes()
+
+    def _total_bytes(self):
+        return self._conn.execute("SELECT total_bytes FROM cache_size WHERE id = 0").fetchone()[0]
+
+    def stats(self):
+        """
+        Return hit/miss counters for this process and the current size of the cache.
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            total_bytes = self._total_bytes()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps a LangChain embedding model so that embed_documents and embed_query
+    only call the provider for texts that are not in the cache yet.
+    """
+
+    def __init__(self, model, cache, model_version=EMBEDDING_CACHE_VERSION):
+        self.base_model = model
+        self.cache = cache
+        self.model_version = model_version
+        self.model_name = f"{type(model).__name__}:{getattr(model, 'model', '')}"
+        dimensions = getattr(model, "dimensions", None)
+        if dimensions:
+            self.model_name += f":{dimensions}"
+
+    def __getattr__(self, name):
+        # Expose the wrapped model's settings (model, dimensions, ...) unchanged
+        model = self.__dict__.get("base_model")
+        if model is None:
+            raise AttributeError(name)
+        return getattr(model, name)
+
+    def embed_documents(self, texts):
+        return self._embed(texts, "document", self.base_model.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed([text], "query", lambda texts: [self.base_model.embed_query(texts[0])])[0]
+
+    def _embed(self, texts, input_type, embed_func):
+        keys = [
+            self.cache.make_key(self.model_name, self.model_version, input_type, text)
+            for text in texts
+        ]
+        vectors = self.cache.get_many(set(keys))
+
+        # Embed each missing text once, even if it appears several times
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            new_vectors = embed_func(list(missing.values()))
+            computed = dict(zip(missing.keys(), new_vectors))
+            self.cache.put_many(computed.items())
+            vectors.update(computed)
+
+        return [vectors[key] for key in keys]
+
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """
+    Return the process-wide embedding cache, opening it on first use.
+    """
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+        return _embedding_cache
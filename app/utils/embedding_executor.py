@@ -0,0 +1,259 @@
+import asyncio
+import copy
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import tiktoken
+from langchain_core.embeddings import Embeddings
+
+from utils.embedding_cache import CachedEmbeddings
+from utils.initialize import load_env_variables
+from utils.config_settings import config
+
+env_name = load_env_variables()
+
+EMBED_MAX_BATCH_TOKENS = config[env_name].EMBED_MAX_BATCH_TOKENS
+EMBED_MAX_BATCH_SIZE = config[env_name].EMBED_MAX_BATCH_SIZE
+EMBED_MAX_CONCURRENCY = config[env_name].EMBED_MAX_CONCURRENCY
+EMBED_MAX_RETRIES = config[env_name].EMBED_MAX_RETRIES
+
+# Backoff used when a 429 carries no retry-after header
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+_encoding = None
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def embedding_loop():
+    """
+    Return the event loop all provider embedding calls run on, starting it on first use.
+
+    Async HTTP clients such as the OpenAI SDK's are bound to the loop they
+    were first used on, so every call must run on the same long-lived loop
+    rather than a new asyncio.run() loop per batch.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="embedding-loop", daemon=True).start()
+        return _loop
+
+
+def count_tokens(text):
+    """
+    Count tokens with cl100k_base; exact for OpenAI models, an estimate for others.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # The encoding is downloaded on first use; estimate from length when offline
+            _encoding = False
+    if _encoding is False:
+        return len(text) // 4 + 1
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def rate_limit_delay(error):
+    """
+    Inspect a provider error for an HTTP 429.
+
+    Returns:
+        tuple: (is_rate_limited, seconds to wait from retry-after or None)
+    """
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status != 429:
+        return False, None
+
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None) or {}
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms is not None:
+        try:
+            return True, float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if retry_after is not None:
+        try:
+            return True, float(retry_after)
+        except ValueError:
+            try:
+                # retry-after may also be an HTTP date
+                return True, max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0)
+            except (TypeError, ValueError):
+                pass
+    return True, None
+
+
+class EmbeddingStats:
+    """
+    Throughput counters shared by all executors in the process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.texts = 0
+        self.tokens = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.busy_seconds = 0.0
+        self._in_flight = 0
+        self._busy_since = None
+
+    def request_started(self):
+        with self._lock:
+            if self._in_flight == 0:
+                self._busy_since = time.monotonic()
+            self._in_flight += 1
+
+    def request_finished(self, texts=0, tokens=0):
+        with self._lock:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                # Count wall-clock time with at least one request in flight, not the sum per request
+                self.busy_seconds += time.monotonic() - self._busy_since
+            self.texts += texts
+            self.tokens += tokens
+            self.requests += 1 if texts else 0
+
+    def record_rate_limit(self):
+        with self._lock:
+            self.rate_limited += 1
+
+    def snapshot(self):
+        with self._lock:
+            busy_seconds = self.busy_seconds
+            if self._in_flight:
+                busy_seconds += time.monotonic() - self._busy_since
+            return {
+                "texts": self.texts,
+                "tokens": self.tokens,
+                "requests": self.requests,
+                "rate_limited": self.rate_limited,
+                "busy_seconds": busy_seconds,
+                "tokens_per_second": self.tokens / busy_seconds if busy_seconds else 0.0,
+            }
+
+
+embedding_stats = EmbeddingStats()
+
+
+class EmbeddingExecutor(Embeddings):
+    """
+    Embeds large lists of texts with token-sized batches sent concurrently.
+
+    Texts are grouped into batches of at most max_batch_tokens tokens and
+    max_batch_size texts, and up to max_concurrency batches run at once on
+    the shared embedding loop, see embedding_loop(). Batches rejected with
+    HTTP 429 are retried after the provider's retry-after delay, or with
+    jittered exponential backoff without one.
+    """
+
+    def __init__(
+        self,
+        model,
+        max_batch_tokens=EMBED_MAX_BATCH_TOKENS,
+        max_batch_size=EMBED_MAX_BATCH_SIZE,
+        max_concurrency=EMBED_MAX_CONCURRENCY,
+        max_retries=EMBED_MAX_RETRIES,
+        stats=embedding_stats,
+    ):
+        self.model = model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.stats = stats
+
+    def __getattr__(self, name):
+        model = self.__dict__.get("model")
+        if model is None:
+            raise AttributeError(name)
+        return getattr(model, name)
+
+    def make_batches(self, texts):
+        """
+        Split texts into (texts, token_count) batches, keeping their order.
+        """
+        batches = []
+        batch, batch_tokens = [], 0
+        for text in texts:
+            tokens = count_tokens(text)
+            if batch and (batch_tokens + tokens > self.max_batch_tokens or len(batch) >= self.max_batch_size):
+                batches.append((batch, batch_tokens))
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append((batch, batch_tokens))
+        return batches
+
+    async def aembed_documents(self, texts):
+        future = asyncio.run_coroutine_threadsafe(self._embed_documents(texts), embedding_loop())
+        return await asyncio.wrap_future(future)
+
+    async def _embed_documents(self, texts):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(
+            *(self._embed_batch(batch, tokens, semaphore) for batch, tokens in self.make_batches(texts))
+        )
+        return [vector for vectors in results for vector in vectors]
+
+    async def _embed_batch(self, texts, tokens, semaphore):
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                self.stats.request_started()
+                try:
+                    vectors = await self.model.aembed_documents(texts)
+                except Exception as e:
+                    self.stats.request_finished()
+                    rate_limited, delay = rate_limit_delay(e)
+                    if not rate_limited or attempt == self.max_retries:
+                        raise
+                    self.stats.record_rate_limit()
+                    if delay is None:
+                        delay = min(BACKOFF_BASE_SECONDS * 2 ** attempt, BACKOFF_MAX_SECONDS)
+                        delay *= random.uniform(0.5, 1.5)
+                    await asyncio.sleep(delay)
+                    continue
+                self.stats.request_finished(texts=len(texts), tokens=tokens)
+                return vectors
+
+    def embed_documents(self, texts):
+        # Blocks the calling thread, which must not be the embedding loop itself
+        return asyncio.run_coroutine_threadsafe(self._embed_documents(texts), embedding_loop()).result()
+
+    def embed_query(self, text):
+        return self.model.embed_query(text)
+
+    async def aembed_query(self, text):
+        future = asyncio.run_coroutine_threadsafe(self.model.aembed_query(text), embedding_loop())
+        return await asyncio.wrap_future(future)
+
+
+def with_executor(model):
+    """
+    Return a copy of an embedding model that sends its provider calls through an EmbeddingExecutor.
+
+    For a CachedEmbeddings model only the cache misses go through the executor,
+    and cache keys stay the same.
+    """
+    if isinstance(model, CachedEmbeddings):
+        wrapped = copy.copy(model)
+        wrapped.base_model = EmbeddingExecutor(model.base_model)
+        return wrapped
+    return EmbeddingExecutor(model)
+
+
+def get_embedding_stats():
+    """
+    Return the process-wide embedding throughput counters.
+    """
+    return embedding_stats.snapshot()
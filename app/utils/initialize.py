@@ -2,6 +2,7 @@ import os
 import time
 from dotenv import load_dotenv
 
+import cohere
 from langchain_cohere import CohereEmbeddings
 from langchain_cohere.chat_models import ChatCohere
 from langchain_community.graphs import Neo4jGraph
@@ -68,29 +69,44 @@ def graph_object(url=NEO4J_URI, username=NEO4J_USERNAME, password=NEO4J_PASSWORD
 
 
 def openai_llm_model(
-    api_key=OPENAI_API_KEY, temperature=0, model_name="gpt-3.5-turbo-0125"
+    api_key=OPENAI_API_KEY, temperature=0, model_name="gpt-3.5-turbo-0125",
+    http_client=None, http_async_client=None,
 ):
     openai_llm = ChatOpenAI(
-        temperature=temperature, model_name=model_name, api_key=api_key
+        temperature=temperature, model_name=model_name, api_key=api_key,
+        http_client=http_client, http_async_client=http_async_client,
     )
     return openai_llm
 
 
-def openai_embed_model(api_key=OPENAI_API_KEY):
-    openai_embedding = OpenAIEmbeddings(api_key=api_key)
+def openai_embed_model(api_key=OPENAI_API_KEY, http_client=None, http_async_client=None):
+    openai_embedding = OpenAIEmbeddings(
+        api_key=api_key, http_client=http_client, http_async_client=http_async_client
+    )
     return openai_embedding
 
 
-def cohere_llm_model(COHERE_API_KEY, temperature=0, model="command-r-plus"):
+def _use_http_clients(cohere_model, api_key, http_client, http_async_client):
+    # langchain_cohere builds its own SDK clients; rebuild them on the shared connection pools
+    if http_client is not None:
+        cohere_model.client = cohere.Client(api_key=api_key, httpx_client=http_client)
+    if http_async_client is not None:
+        cohere_model.async_client = cohere.AsyncClient(api_key=api_key, httpx_client=http_async_client)
+    return cohere_model
+
+
+def cohere_llm_model(
+    COHERE_API_KEY, temperature=0, model="command-r-plus", http_client=None, http_async_client=None
+):
     cohere_llm = ChatCohere(
         model=model, temperature=temperature, cohere_api_key=COHERE_API_KEY
     )
-    return cohere_llm
+    return _use_http_clients(cohere_llm, COHERE_API_KEY, http_client, http_async_client)
 
 
-def cohere_embedding_model(COHERE_API_KEY, model="embed-english-v3.0"):
+def cohere_embedding_model(COHERE_API_KEY, model="embed-english-v3.0", http_client=None, http_async_client=None):
     cohere_embed_model = CohereEmbeddings(model=model, cohere_api_key=COHERE_API_KEY)
-    return cohere_embed_model
+    return _use_http_clients(cohere_embed_model, COHERE_API_KEY, http_client, http_async_client)
 
 def pinecone_setup(api_key=PINECONE_API_KEY,index = PINECONE_INDEX):
     
@@ -0,0 +1,272 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.pipeline import PipelineStopped
+from utils.initialize import load_env_variables
+from utils.config_settings import config
+
+env_name = load_env_variables()
+
+JOB_DB_PATH = config[env_name].JOB_DB_PATH
+JOB_WORKERS = config[env_name].JOB_WORKERS
+
+# Minimum seconds between progress writes to SQLite for a running job
+PROGRESS_WRITE_INTERVAL = 1.0
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+INTERRUPTED = "interrupted"
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED, INTERRUPTED)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """
+    SQLite table holding the state of every ingestion job so it survives restarts.
+    """
+
+    def __init__(self, path=JOB_DB_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                params TEXT NOT NULL,
+                worker_pid INTEGER,
+                total_documents INTEGER,
+                documents INTEGER NOT NULL DEFAULT 0,
+                chunks INTEGER NOT NULL DEFAULT 0,
+                vectors INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                updated_at REAL NOT NULL,
+                finished_at REAL,
+                result TEXT,
+                error TEXT
+            )
+            """
+        )
+        self._conn.commit()
+
+    def mark_orphaned_jobs(self):
+        """
+        Mark jobs whose worker process is gone as interrupted.
+
+        A job recorded under this process's own pid belongs to an earlier
+        process that reused the pid, as happens with pid 1 in containers.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, worker_pid FROM ingestion_jobs WHERE status IN (?, ?)",
+                (QUEUED, RUNNING),
+            ).fetchall()
+            orphaned = [
+                row["id"] for row in rows
+                if row["worker_pid"] == os.getpid() or not _pid_alive(row["worker_pid"])
+            ]
+            for job_id in orphaned:
+                self._conn.execute(
+                    "UPDATE ingestion_jobs SET status = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                    (INTERRUPTED, time.time(), time.time(), job_id),
+                )
+            self._conn.commit()
+
+    def create(self, params):
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO ingestion_jobs (id, status, params, worker_pid, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (job_id, QUEUED, json.dumps(params), os.getpid(), now, now),
+            )
+            self._conn.commit()
+        return job_id
+
+    def update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        if fields.get("result") is not None:
+            fields["result"] = json.dumps(fields["result"])
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE ingestion_jobs SET {assignments} WHERE id = ?",
+                [*fields.values(), job_id],
+            )
+            self._conn.commit()
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM ingestion_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+class JobManager:
+    """
+    Runs ingestion jobs on a background thread pool and tracks their progress.
+    """
+
+    def __init__(self, store=None, max_workers=JOB_WORKERS):
+        self.store = store or JobStore()
+        self.store.mark_orphaned_jobs()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion-job")
+        self._stop_events = {}
+        self._futures = {}
+        self._last_write = {}
+        self._live_stats = {}
+
+    def submit(self, params, run):
+        """
+        Queue a job and return its id straight away.
+
+        Args:
+            params (dict): The job's request parameters, stored for reference
+            run (callable): Called as run(job_id, stop_event, on_progress, set_total); returns the result dict
+
+        Returns:
+            str: The job id
+        """
+        job_id = self.store.create(params)
+        stop_event = threading.Event()
+        self._stop_events[job_id] = stop_event
+        future = self._executor.submit(self._run, job_id, run, stop_event)
+        self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._futures.pop(job_id, None))
+        return job_id
+
+    async def arun(self, func, *args, **kwargs):
+        """
+        Run a blocking ingestion call on the job pool and wait for its result.
+
+        Ingestion holds a thread for minutes, so it runs here rather than on the
+        run_blocking pool that request handlers need to stay responsive.
+        """
+        return await asyncio.wrap_future(self._executor.submit(func, *args, **kwargs))
+
+    def _run(self, job_id, run, stop_event):
+        if stop_event.is_set():
+            self.store.update(job_id, status=CANCELLED, finished_at=time.time())
+            return
+        self.store.update(job_id, status=RUNNING, started_at=time.time())
+
+        def on_progress(stats):
+            # Throttle writes; this process reads the live counts, others the stored ones
+            self._live_stats[job_id] = stats
+            now = time.monotonic()
+            if now - self._last_write.get(job_id, 0) >= PROGRESS_WRITE_INTERVAL:
+                self._last_write[job_id] = now
+                self.store.update(
+                    job_id, documents=stats["documents"], chunks=stats["chunks"], vectors=stats["vectors"]
+                )
+
+        def set_total(total_documents):
+            self.store.update(job_id, total_documents=total_documents)
+
+        try:
+            result = run(job_id, stop_event, on_progress, set_total)
+            self.store.update(
+                job_id,
+                status=SUCCEEDED,
+                finished_at=time.time(),
+                result=result,
+                documents=result.get("documents", 0),
+                chunks=result.get("chunks", 0),
+                vectors=result.get("vectors", 0),
+            )
+        except PipelineStopped:
+            self.store.update(job_id, status=CANCELLED, finished_at=time.time())
+        except Exception as e:
+            self.store.update(job_id, status=FAILED, finished_at=time.time(), error=str(e))
+        finally:
+            self._stop_events.pop(job_id, None)
+            self._last_write.pop(job_id, None)
+            self._live_stats.pop(job_id, None)
+
+    def cancel(self, job_id):
+        """
+        Ask a queued or running job to stop.
+
+        Returns:
+            bool: False if the job is unknown to this process or already finished
+        """
+        stop_event = self._stop_events.get(job_id)
+        if stop_event is None:
+            return False
+        stop_event.set()
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            # It never started, so _run won't record the cancellation
+            self.store.update(job_id, status=CANCELLED, finished_at=time.time())
+            self._stop_events.pop(job_id, None)
+        return True
+
+    def progress(self, job_id):
+        """
+        Return the job's counters with throughput and, when the total is known, an ETA.
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        job.update(
+            {name: count for name, count in self._live_stats.get(job_id, {}).items()
+             if name in ("documents", "chunks", "vectors")}
+        )
+        end = job["finished_at"] or time.time()
+        elapsed = end - job["started_at"] if job["started_at"] else 0.0
+        throughput = {
+            name: (job[name] / elapsed if elapsed else 0.0)
+            for name in ("documents", "chunks", "vectors")
+        }
+        eta_seconds = None
+        if job["status"] == RUNNING and job["total_documents"] and throughput["documents"]:
+            remaining = max(job["total_documents"] - job["documents"], 0)
+            eta_seconds = remaining / throughput["documents"]
+        return {
+            "job_id": job_id,
+            "status": job["status"],
+            "total_documents": job["total_documents"],
+            "documents": job["documents"],
+            "chunks": job["chunks"],
+            "vectors": job["vectors"],
+            "elapsed_seconds": elapsed,
+            "throughput_per_second": throughput,
+            "eta_seconds": eta_seconds,
+            "error": job["error"],
+        }
+
+    def shutdown(self):
+        for stop_event in list(self._stop_events.values()):
+            stop_event.set()
+        # Jobs still queued stay "queued" in the table and are marked interrupted on next start
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,275 @@
+import queue
+import threading
+import time
+
+from configurables.chunking_configs import get_chunks_with_vectors
+from configurables.vectordb_configs import get_vector_store, add_documents_with_embeddings
+from utils.embedding_executor import with_executor
+from utils.retrieval_cache import retrieval_cache
+from utils.answer_cache import answer_cache, document_sources
+from utils.py_sqlite import MetadataIngester
+from utils.initialize import load_env_variables
+from utils.config_settings import config
+
+env_name = load_env_variables()
+
+PIPELINE_LOAD_BATCH_SIZE = config[env_name].PIPELINE_LOAD_BATCH_SIZE
+PIPELINE_EMBED_BATCH_SIZE = config[env_name].PIPELINE_EMBED_BATCH_SIZE
+PIPELINE_UPSERT_BATCH_SIZE = config[env_name].PIPELINE_UPSERT_BATCH_SIZE
+PIPELINE_QUEUE_SIZE = config[env_name].PIPELINE_QUEUE_SIZE
+METADATA_INGEST = config[env_name].METADATA_INGEST
+
+# Marks the end of a stage's output
+_DONE = object()
+# How often blocked stages wake up to check for cancellation or failure
+_POLL_INTERVAL = 0.1
+
+
+class PipelineStopped(Exception):
+    """
+    Raised inside a stage when the pipeline was cancelled or another stage failed.
+    """
+
+
+def iter_loader_documents(loader, file_type):
+    """
+    Yield documents from a loader, streaming them when the loader supports it.
+    """
+    if hasattr(loader, "iter_data"):
+        yield from loader.iter_data(file_type=file_type)
+        return
+    documents = loader.load_data(file_type=file_type)
+    # Some loaders return a message string instead of an empty list
+    if isinstance(documents, list):
+        yield from documents
+
+
+class IngestionPipeline:
+    """
+    Streams documents from a loader through chunking, embedding and the vector store.
+
+    Each stage runs in its own thread and hands batches to the next one through
+    a bounded queue. Peak memory therefore depends on batch and queue sizes
+    rather than on the size of the source, and embedding overlaps with loading.
+    """
+
+    def __init__(
+        self,
+        loader,
+        file_type,
+        chunking_strategy,
+        embedding_model,
+        embedding_model_name,
+        vector_index,
+        load_batch_size=PIPELINE_LOAD_BATCH_SIZE,
+        embed_batch_size=PIPELINE_EMBED_BATCH_SIZE,
+        upsert_batch_size=PIPELINE_UPSERT_BATCH_SIZE,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        record_metadata=METADATA_INGEST,
+        on_batch=None,
+        on_progress=None,
+        stop_event=None,
+    ):
+        """
+        Args:
+            loader: A data loader returned by load_source
+            file_type (str): Comma separated file types passed to the loader
+            chunking_strategy (str): Name of the chunking strategy
+            embedding_model: The model returned by get_embedding_model
+            embedding_model_name (str): Name the embedding model was selected by
+            vector_index (str): Name of the vector store to write to
+            record_metadata (bool): Write the loaded documents' metadata to the legal_docs table once all are stored
+            on_batch (callable, optional): Called with (chunks, ids) after each store write
+            on_progress (callable, optional): Called with the stats dict whenever it changes
+            stop_event (threading.Event, optional): Set it to cancel the pipeline
+        """
+        self.loader = loader
+        self.file_type = file_type
+        self.chunking_strategy = chunking_strategy
+        # Batch by tokens and embed several batches concurrently
+        self.embedding_model = with_executor(embedding_model)
+        self.embedding_model_name = embedding_model_name
+        self.vector_index = vector_index.lower()
+        self.load_batch_size = load_batch_size
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.record_metadata = record_metadata
+        self.on_batch = on_batch
+        self.on_progress = on_progress
+        self.stop_event = stop_event or threading.Event()
+
+        self.vector_store = None
+        self.stats = {"documents": 0, "chunks": 0, "vectors": 0, "elapsed_seconds": 0.0}
+        self._documents = queue.Queue(maxsize=queue_size)
+        self._chunks = queue.Queue(maxsize=queue_size)
+        self._vectors = queue.Queue(maxsize=queue_size)
+        self._abort = threading.Event()
+        self._errors = []
+        self._stats_lock = threading.Lock()
+        self._started = None
+        self._metadata = None
+
+    def run(self):
+        """
+        Run all stages to completion.
+
+        Returns:
+            dict: Counts of documents, chunks and vectors processed
+
+        Raises:
+            PipelineStopped: If the pipeline was cancelled through stop_event
+        """
+        self._started = time.monotonic()
+        if self.record_metadata:
+            self._metadata = MetadataIngester()
+        try:
+            return self._run()
+        finally:
+            if self._metadata is not None:
+                self._metadata.close()
+                self._metadata = None
+
+    def _run(self):
+        stages = [
+            threading.Thread(target=self._run_stage, args=(self._load, self._documents), daemon=True),
+            threading.Thread(target=self._run_stage, args=(self._chunk, self._chunks), daemon=True),
+            threading.Thread(target=self._run_stage, args=(self._embed, self._vectors), daemon=True),
+        ]
+        for stage in stages:
+            stage.start()
+        # The calling thread writes to the vector store
+        self._run_stage(self._upsert, None)
+        for stage in stages:
+            stage.join()
+
+        if self._errors:
+            raise self._errors[0]
+        if self.stop_event.is_set():
+            raise PipelineStopped("Ingestion was cancelled.")
+        if self._metadata is not None:
+            # Only now is every loaded document in the vector store
+            self._metadata.flush()
+        return dict(self.stats)
+
+    def _run_stage(self, stage, output):
+        try:
+            stage()
+        except PipelineStopped:
+            pass
+        except Exception as e:
+            self._errors.append(e)
+            self._abort.set()
+        finally:
+            if output is not None:
+                try:
+                    self._put(output, _DONE)
+                except PipelineStopped:
+                    pass
+
+    def _stopped(self):
+        return self._abort.is_set() or self.stop_event.is_set()
+
+    def _put(self, output, item):
+        while True:
+            if self._stopped() and item is not _DONE:
+                raise PipelineStopped()
+            try:
+                output.put(item, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                if self._stopped():
+                    raise PipelineStopped()
+
+    def _get(self, source):
+        while True:
+            if self._stopped():
+                raise PipelineStopped()
+            try:
+                return source.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+    def _batches(self, source):
+        while True:
+            item = self._get(source)
+            if item is _DONE:
+                return
+            yield item
+
+    def _add_stats(self, **counts):
+        with self._stats_lock:
+            for name, count in counts.items():
+                self.stats[name] += count
+            self.stats["elapsed_seconds"] = time.monotonic() - self._started
+            snapshot = dict(self.stats)
+        if self.on_progress:
+            self.on_progress(snapshot)
+
+    def _load(self):
+        batch = []
+        for document in iter_loader_documents(self.loader, self.file_type):
+            batch.append(document)
+            if len(batch) >= self.load_batch_size:
+                self._load_batch(batch)
+                batch = []
+        if batch:
+            self._load_batch(batch)
+
+    def _load_batch(self, batch):
+        if self._metadata is not None:
+            self._metadata.add(batch)
+        self._add_stats(documents=len(batch))
+        self._put(self._documents, batch)
+
+    def _chunk(self):
+        for documents in self._batches(self._documents):
+            # Some strategies embed while chunking and return the chunk vectors as well
+            chunks, vectors = get_chunks_with_vectors(
+                self.chunking_strategy, documents=documents, embedding_model=self.embedding_model
+            )
+            self._add_stats(chunks=len(chunks))
+            for start in range(0, len(chunks), self.embed_batch_size):
+                end = start + self.embed_batch_size
+                self._put(self._chunks, (chunks[start:end], vectors[start:end] if vectors is not None else None))
+
+    def _embed(self):
+        for chunks, embeddings in self._batches(self._chunks):
+            if embeddings is None:
+                embeddings = self.embedding_model.embed_documents(
+                    [chunk.page_content for chunk in chunks]
+                )
+            self._put(self._vectors, (chunks, embeddings))
+
+    def _upsert(self):
+        pending_chunks, pending_embeddings = [], []
+        for chunks, embeddings in self._batches(self._vectors):
+            pending_chunks.extend(chunks)
+            pending_embeddings.extend(embeddings)
+            if len(pending_chunks) >= self.upsert_batch_size:
+                self._write(pending_chunks, pending_embeddings)
+                pending_chunks, pending_embeddings = [], []
+        if pending_chunks:
+            self._write(pending_chunks, pending_embeddings)
+
+    def open_vector_store(self, embeddings=()):
+        """
+        Return the vector store this pipeline writes to, creating it on first use.
+        """
+        if self.vector_store is None:
+            # FAISS takes the index dimension from the first embeddings
+            self.vector_store = get_vector_store(
+                self.vector_index, embeddings, self.embedding_model, self.embedding_model_name
+            )
+            if self.vector_index == "pinecone":
+                self.vector_store = self.vector_store[1]
+        return self.vector_store
+
+    def _write(self, chunks, embeddings):
+        self.open_vector_store(embeddings)
+        ids = add_documents_with_embeddings(self.vector_index, self.vector_store, chunks, embeddings)
+        # Cached search results for this store may now miss the new chunks
+        retrieval_cache.invalidate(self.vector_index)
+        answer_cache.invalidate_sources(document_sources(chunks))
+        self._add_stats(vectors=len(ids))
+        if self.on_batch:
+            self.on_batch(chunks, ids)
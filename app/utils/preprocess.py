@@ -1,11 +1,18 @@
 #  import markdown
+import json
+import os
+import re
+import tempfile
+
 import requests
 from utils.initialize import load_env_variables
 from utils.config_settings import config
+from utils.resources import lazy_resource
 
 env_name = load_env_variables()
 
 source = config[env_name].COHERE_API_KEY
+SPECIAL_TOKENS_PATH = config[env_name].SPECIAL_TOKENS_PATH
 
 import cohere
 TOKENIZERS = {
@@ -26,37 +33,121 @@ def get_special_tokens_set(tokenizer_url=TOKENIZERS["command-r"]):
         set: A set of special tokens.
     """
     # https://docs.cohere.com/docs/tokens-and-tokenizers
-    response = requests.get(tokenizer_url)
+    response = requests.get(tokenizer_url, timeout=30)
+    response.raise_for_status()
     return set([tok["content"] for tok in response.json()["added_tokens"]])
 
 
-def make_text_tokenization_safe(
-    content: str, special_tokens_set: set = get_special_tokens_set()
-) -> str:
+def load_special_tokens_set(path=SPECIAL_TOKENS_PATH):
+    """
+    Returns the special tokens set from the copy at path, which is committed
+    with the code, so serving never depends on the tokenizer URL.
+
+    Args:
+        path (str): The JSON file holding the local copy.
+
+    Returns:
+        set: A set of special tokens.
+    """
+    with open(path) as f:
+        return set(json.load(f)["special_tokens"])
+
+
+def save_special_tokens_set(tokenizer_url=TOKENIZERS["command-r"], path=SPECIAL_TOKENS_PATH):
+    """
+    Fetches the special tokens set and writes it to path, replacing any existing copy.
+    Only run explicitly, to refresh the committed copy.
+
+    Returns:
+        set: A set of special tokens.
+    """
+    special_tokens_set = get_special_tokens_set(tokenizer_url)
+    # Write a temporary file and rename it so other workers never read a partial copy
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump({"tokenizer_url": tokenizer_url, "special_tokens": sorted(special_tokens_set)}, f)
+    os.replace(tmp_path, path)
+    return special_tokens_set
+
+
+special_tokens = lazy_resource("special_tokens", load_special_tokens_set)
+
+
+class SpecialTokenRemover:
+    """
+    Removes a fixed set of special tokens from text in a single scan.
+
+    The tokens are compiled once into one alternation regex, longest first so
+    a token is never cut short by a shorter token it starts with. Because
+    removing tokens can join the pieces of a new one (as in "<<BOS>BOS>"),
+    the scan is repeated until nothing is removed; for ordinary text that is
+    one scan plus one that finds nothing.
+    """
+
+    def __init__(self, special_tokens_set):
+        tokens = sorted((token for token in special_tokens_set if token), key=len, reverse=True)
+        self.pattern = re.compile("|".join(map(re.escape, tokens))) if tokens else None
+
+    def remove(self, text: str) -> str:
+        if self.pattern is None:
+            return text
+        count = 1
+        while count:
+            text, count = self.pattern.subn("", text)
+        return text
+
+    def remove_many(self, texts):
+        return [self.remove(text) for text in texts]
+
+
+_default_remover = None
+
+
+def get_special_token_remover(special_tokens_set: set = None) -> SpecialTokenRemover:
+    """
+    Returns a remover for the given tokens, or the shared one for the
+    command-r tokenizer's tokens, compiled on first use.
+    """
+    global _default_remover
+    if special_tokens_set is not None:
+        return SpecialTokenRemover(special_tokens_set)
+    if _default_remover is None:
+        _default_remover = SpecialTokenRemover(special_tokens.get())
+    return _default_remover
+
+
+def make_text_tokenization_safe(content: str, special_tokens_set: set = None) -> str:
     """
     Makes the text safe for tokenization by removing special tokens.
 
     Args:
         content: A string containing the text to be processed.
         special_tokens_set: A set of special tokens to be removed from the text.
+            Defaults to the command-r tokenizer's, loaded on first use.
 
     Returns:
         A string with the special tokens removed.
     """
+    return get_special_token_remover(special_tokens_set).remove(content)
 
-    def remove_special_tokens(text: str) -> str:
-        """
-        Removes special tokens from the given text.
 
-        Args:
-            text: A string representing the text.
+def make_texts_tokenization_safe(contents, special_tokens_set: set = None):
+    """
+    Batch version of make_text_tokenization_safe; the token set is compiled once for all texts.
+
+    Args:
+        contents: A list of strings to be processed.
+        special_tokens_set: A set of special tokens to be removed from the texts.
+
+    Returns:
+        A list of strings with the special tokens removed, in the same order.
+    """
+    return get_special_token_remover(special_tokens_set).remove_many(contents)
 
-        Returns:
-            The text with special tokens removed.
-        """
-        for token in special_tokens_set:
-            text = text.replace(token, "")
-        return text
 
-    cleaned_content = remove_special_tokens(content)
-    return cleaned_content
\ No newline at end of file
+if __name__ == "__main__":
+    # Refresh the committed copy: python -m utils.preprocess, from the app directory
+    tokens = save_special_tokens_set()
+    print(f"Wrote {len(tokens)} special tokens to {SPECIAL_TOKENS_PATH}")
@@ -1,4 +1,25 @@
+import os
 import sqlite3
+import threading
+import time
+
+from utils.initialize import load_env_variables
+from utils.config_settings import config
+
+env_name = load_env_variables()
+
+SQL_DB_PATH = config[env_name].SQL_DB_PATH
+METADATA_SUMMARY_CHARS = config[env_name].METADATA_SUMMARY_CHARS
+
+# Columns added to legal_docs after its first version, with their definitions
+LEGAL_DOCS_COLUMNS = {
+    "source": "TEXT",
+    "size": "INTEGER",
+    "page_count": "INTEGER",
+    "summary": "TEXT",
+    "updated_at": "REAL",
+    "file_type": "TEXT",
+}
 
 
 def create_connection(db_name):
@@ -65,6 +86,212 @@ def close_connection(conn):
         print(e)
 
 
+# legal_docs' indexes, FTS5 index and the triggers keeping the FTS index in sync
+LEGAL_DOCS_SCHEMA = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_legal_docs_source ON legal_docs (source)",
+    "CREATE INDEX IF NOT EXISTS idx_legal_docs_type ON legal_docs (type_of_document, document_name)",
+    "CREATE INDEX IF NOT EXISTS idx_legal_docs_name ON legal_docs (document_name COLLATE NOCASE)",
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS legal_docs_fts USING fts5(
+        document_name, summary, content='legal_docs', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS legal_docs_fts_insert AFTER INSERT ON legal_docs BEGIN
+        INSERT INTO legal_docs_fts (rowid, document_name, summary)
+        VALUES (new.id, new.document_name, new.summary);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS legal_docs_fts_delete AFTER DELETE ON legal_docs BEGIN
+        INSERT INTO legal_docs_fts (legal_docs_fts, rowid, document_name, summary)
+        VALUES ('delete', old.id, old.document_name, old.summary);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS legal_docs_fts_update AFTER UPDATE ON legal_docs BEGIN
+        INSERT INTO legal_docs_fts (legal_docs_fts, rowid, document_name, summary)
+        VALUES ('delete', old.id, old.document_name, old.summary);
+        INSERT INTO legal_docs_fts (rowid, document_name, summary)
+        VALUES (new.id, new.document_name, new.summary);
+    END
+    """,
+]
+
+
+def migrate(conn):
+    """
+    Bring the legal_docs table, its indexes and its FTS5 index up to date in
+    one transaction. Safe to run repeatedly and from several processes.
+    """
+    with conn:
+        # sqlite3 doesn't open a transaction for DDL by itself, and executescript
+        # commits first, so begin explicitly; IMMEDIATE also keeps other migrations out
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS legal_docs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                document_name TEXT NOT NULL,
+                type_of_document TEXT NOT NULL
+            )
+            """
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(legal_docs)")}
+        fts_exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'legal_docs_fts'"
+        ).fetchone() is not None
+        for column, definition in LEGAL_DOCS_COLUMNS.items():
+            if column not in columns:
+                conn.execute(f"ALTER TABLE legal_docs ADD COLUMN {column} {definition}")
+        if "source" in columns and "file_type" not in columns:
+            # Ingested rows (those with a source) used to store the file type as
+            # the category; categories like NDA are only ever entered by hand
+            conn.execute(
+                "UPDATE legal_docs SET file_type = type_of_document, type_of_document = 'unknown' "
+                "WHERE source IS NOT NULL"
+            )
+        for statement in LEGAL_DOCS_SCHEMA:
+            conn.execute(statement)
+        if not fts_exists:
+            # Index the rows inserted before the FTS table existed
+            conn.execute("INSERT INTO legal_docs_fts (legal_docs_fts) VALUES ('rebuild')")
+
+
+def document_metadata(documents, summary_chars=METADATA_SUMMARY_CHARS):
+    """
+    Collect one metadata row per source from loaded documents.
+
+    Loaders yield one Document per file or per page, so pages of the same
+    source are combined. Size is the extracted text's length in bytes unless
+    the loader recorded a size. type_of_document is a category such as NDA or
+    Proposal, which text-to-SQL queries filter on; loaders don't know it, so
+    it is "unknown" unless set, and the file's format goes in file_type.
+
+    Returns:
+        dict: source -> {"document_name", "type_of_document", "file_type", "size", "page_count", "summary"}
+    """
+    rows = {}
+    for document in documents:
+        metadata = document.metadata
+        source = str(metadata.get("source") or metadata.get("name") or "")
+        if not source:
+            continue
+        text = document.page_content or ""
+        row = rows.get(source)
+        if row is None:
+            name = metadata.get("name") or os.path.basename(source.rstrip("/")) or source
+            extension = os.path.splitext(name)[1].lstrip(".").lower()
+            row = rows[source] = {
+                "document_name": os.path.splitext(name)[0] if extension else name,
+                "type_of_document": metadata.get("type_of_document") or "unknown",
+                "file_type": metadata.get("file_type") or extension or None,
+                "size": 0,
+                "page_count": 0,
+                "summary": "",
+            }
+        row["size"] += metadata.get("size") or len(text.encode("utf-8"))
+        row["page_count"] += 1
+        if len(row["summary"]) < summary_chars:
+            row["summary"] = (row["summary"] + " " + " ".join(text.split()))[:summary_chars].strip()
+    return rows
+
+
+class MetadataIngester:
+    """
+    Writes the metadata of ingested documents into the legal_docs table.
+
+    Each loaded batch is staged in a temporary table on this connection,
+    which SQLite keeps on disk once it outgrows its cache, so memory doesn't
+    grow with the corpus. flush() copies the staged rows into legal_docs in
+    one transaction, upserting on source; the pipeline calls it only once
+    every document has been embedded and stored, so the SQL branch never
+    lists a document the vector store doesn't have. The connection is in WAL
+    mode, so the SQL branch can keep reading during the write. Pages of one
+    source staged in different batches add to its size and page count.
+    """
+
+    def __init__(self, path=SQL_DB_PATH, summary_chars=METADATA_SUMMARY_CHARS):
+        self.written = 0
+        self.summary_chars = summary_chars
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        migrate(self._conn)
+        self._conn.execute(
+            """
+            CREATE TEMP TABLE IF NOT EXISTS legal_docs_staging (
+                source TEXT PRIMARY KEY,
+                document_name TEXT NOT NULL,
+                type_of_document TEXT NOT NULL,
+                file_type TEXT,
+                size INTEGER NOT NULL,
+                page_count INTEGER NOT NULL,
+                summary TEXT NOT NULL
+            )
+            """
+        )
+
+    def add(self, documents):
+        """
+        Stage the metadata of loaded documents until flush().
+        """
+        rows = [
+            (
+                source, row["document_name"], row["type_of_document"], row["file_type"],
+                row["size"], row["page_count"], row["summary"], self.summary_chars,
+            )
+            for source, row in document_metadata(documents, self.summary_chars).items()
+        ]
+        with self._lock, self._conn:
+            # Only the temporary table is written, so this doesn't lock the database
+            self._conn.executemany(
+                """
+                INSERT INTO legal_docs_staging (source, document_name, type_of_document, file_type, size, page_count, summary)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (source) DO UPDATE SET
+                    size = size + excluded.size,
+                    page_count = page_count + excluded.page_count,
+                    summary = CASE WHEN length(summary) < ?8
+                        THEN trim(substr(summary || ' ' || excluded.summary, 1, ?8))
+                        ELSE summary END
+                """,
+                rows,
+            )
+
+    def flush(self):
+        """
+        Write all staged metadata in one transaction.
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """
+                INSERT INTO legal_docs (document_name, type_of_document, file_type, source, size, page_count, summary, updated_at)
+                SELECT document_name, type_of_document, file_type, source, size, page_count, summary, ?
+                FROM legal_docs_staging WHERE true
+                ON CONFLICT (source) DO UPDATE SET
+                    document_name = excluded.document_name,
+                    type_of_document = excluded.type_of_document,
+                    file_type = excluded.file_type,
+                    size = excluded.size,
+                    page_count = excluded.page_count,
+                    summary = excluded.summary,
+                    updated_at = excluded.updated_at
+                """,
+                (time.time(),),
+            )
+            self.written += cursor.rowcount
+            self._conn.execute("DELETE FROM legal_docs_staging")
+
+    def close(self):
+        """
+        Close the connection, discarding metadata that wasn't flushed.
+        """
+        with self._lock:
+            self._conn.close()
+
+
 # if __name__ == "__main__":
 #     # Step 1: Create a connection to the database
 #     conn = create_connection('documents.db')
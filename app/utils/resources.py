@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+
+class LazyResource:
+    """
+    A remote resource (database connection, index, downloaded file) built on first use.
+
+    Nothing is opened at import time. get() builds the resource once and
+    returns it from then on. If building fails, the error is recorded for
+    readiness reporting and the next get() tries again.
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.status = PENDING
+        self.error = None
+        self.seconds = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self.status == READY:
+            return self._value
+        with self._lock:
+            if self.status != READY:
+                started = time.monotonic()
+                try:
+                    self._value = self.factory()
+                except Exception as e:
+                    self.status, self.error = FAILED, str(e)
+                    raise
+                finally:
+                    self.seconds = time.monotonic() - started
+                self.status, self.error = READY, None
+        return self._value
+
+    def state(self):
+        return {"status": self.status, "error": self.error, "seconds": self.seconds}
+
+
+_resources = {}
+
+
+def lazy_resource(name, factory):
+    """
+    Register a resource to be built on first use, or by warm_up().
+
+    Returns:
+        LazyResource: Call .get() on it to obtain the resource
+    """
+    resource = _resources.get(name)
+    if resource is None:
+        resource = _resources[name] = LazyResource(name, factory)
+    return resource
+
+
+async def warm_up():
+    """
+    Build every registered resource concurrently, each in a worker thread.
+    Failures are recorded on the resource rather than raised.
+    """
+    resources = list(_resources.values())
+    await asyncio.gather(
+        *(asyncio.to_thread(resource.get) for resource in resources), return_exceptions=True
+    )
+
+
+def readiness():
+    """
+    Return whether every registered resource is built, and the state of each one.
+    """
+    states = {name: resource.state() for name, resource in _resources.items()}
+    ready = all(state["status"] == READY for state in states.values())
+    return {"ready": ready, "resources": states}
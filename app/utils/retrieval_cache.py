@@ -0,0 +1,126 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from utils.initialize import load_env_variables
+from utils.config_settings import config
+
+env_name = load_env_variables()
+
+RETRIEVAL_CACHE_MAX_ENTRIES = config[env_name].RETRIEVAL_CACHE_MAX_ENTRIES
+RETRIEVAL_CACHE_TTL = config[env_name].RETRIEVAL_CACHE_TTL
+
+
+def normalize_query(query):
+    """
+    Case-fold and collapse whitespace so trivially different queries share an entry.
+    """
+    return " ".join(query.split()).casefold()
+
+
+class RetrievalCache:
+    """
+    In-process TTL + LRU cache of similarity search results.
+
+    Entries are keyed on (normalized query, store, index, k, filters). Writing
+    to or deleting from a store invalidates every entry for that store. The
+    cache is per process, so writes made by another uvicorn worker only show
+    up once the entries expire after ttl_seconds.
+    """
+
+    def __init__(self, max_entries=RETRIEVAL_CACHE_MAX_ENTRIES, ttl_seconds=RETRIEVAL_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query, store, index, k, filters=None):
+        """
+        Args:
+            query (str): The search query
+            store (str): Vector store name ("faiss", "pinecone", "chroma")
+            index (str): Index within the store, e.g. the embedding model name
+            k (int): Number of results
+            filters (dict, optional): Metadata filter passed to the search
+        """
+        return (
+            normalize_query(query),
+            store.lower(),
+            index,
+            k,
+            json.dumps(filters, sort_keys=True) if filters else None,
+        )
+
+    def get(self, key):
+        """
+        Look up the cached results for key.
+
+        Returns:
+            tuple: (results, or None if absent, expired or invalidated; the store's
+            current generation, to pass to put() with results fetched after a miss)
+        """
+        with self._lock:
+            current = self._generations.get(key[1], 0)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, current
+            expires_at, generation, results = entry
+            if expires_at < time.monotonic() or generation != current:
+                del self._entries[key]
+                self.stale += 1
+                self.misses += 1
+                return None, current
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return results, current
+
+    def put(self, key, results, generation):
+        """
+        Cache results fetched after get() returned generation. They are dropped
+        if the store was invalidated meanwhile, since they may predate the write.
+        """
+        with self._lock:
+            if generation != self._generations.get(key[1], 0):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, generation, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, store):
+        """
+        Invalidate every entry for a store; call it whenever the store's contents change.
+        """
+        with self._lock:
+            # Stale entries are dropped lazily when they are next read or evicted
+            store = store.lower()
+            self._generations[store] = self._generations.get(store, 0) + 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+retrieval_cache = RetrievalCache()
@@ -0,0 +1,146 @@
+import sqlite3
+import threading
+
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import QueuePool
+
+from utils.initialize import load_env_variables
+from utils.config_settings import config
+
+env_name = load_env_variables()
+
+SQL_DB_PATH = config[env_name].SQL_DB_PATH
+SQL_POOL_SIZE = config[env_name].SQL_POOL_SIZE
+
+# Tables SQLite's FTS modules create for each virtual table, named <table>_<suffix>
+FTS_SHADOW_SUFFIXES = ("data", "idx", "content", "docsize", "config", "segments", "segdir", "stat")
+
+
+class CachedTableInfoDatabase(SQLDatabase):
+    """
+    SQLDatabase that builds the table info prompt once per set of tables.
+
+    The text-to-SQL chain asks for the table info on every question, which
+    inspects every table and selects sample rows from each. The instance is
+    replaced when the schema changes, so the cache never outlives the schema;
+    the sample rows are those present when it was built.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._table_info = {}
+        self._table_info_lock = threading.Lock()
+
+    def get_table_info(self, table_names=None):
+        key = tuple(sorted(table_names)) if table_names else None
+        with self._table_info_lock:
+            if key not in self._table_info:
+                self._table_info[key] = super().get_table_info(table_names)
+            return self._table_info[key]
+
+
+def _full_text_tables(engine):
+    """
+    Return {virtual table: description} and the names of the virtual tables' shadow tables.
+
+    SQLDatabase can't select sample rows from FTS5 tables, and their shadow
+    tables only add noise to the prompt, so virtual tables are described by
+    their CREATE statement instead and shadow tables are left out.
+    """
+    with engine.connect() as conn:
+        tables = conn.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'table'")).fetchall()
+    virtual = {
+        name: f"{sql}\n/* Full-text search: WHERE {name} MATCH '<terms>' ORDER BY rank */"
+        for name, sql in tables
+        if sql and sql.upper().startswith("CREATE VIRTUAL TABLE")
+    }
+    shadow = [
+        name for name, _ in tables
+        if any(name == f"{table}_{suffix}" for table in virtual for suffix in FTS_SHADOW_SUFFIXES)
+    ]
+    return virtual, shadow
+
+
+def _read_only_engine(path, pool_size):
+    # journal_mode is stored in the database file; in WAL mode readers don't block the writer
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    finally:
+        conn.close()
+
+    engine = create_engine(
+        f"sqlite:///{path}",
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=pool_size,
+        connect_args={"check_same_thread": False, "timeout": 30},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _query_only(dbapi_connection, connection_record):
+        # LLM-written SQL runs on these connections, so refuse any write
+        dbapi_connection.execute("PRAGMA query_only=ON")
+
+    return engine
+
+
+class SQLDatabaseCache:
+    """
+    One pooled, read-only SQLDatabase per process for the text-to-SQL chain.
+
+    The schema is reflected once and reflected again only when SQLite's
+    schema_version changes, i.e. after a table or index is created, altered
+    or dropped.
+    """
+
+    def __init__(self, path=SQL_DB_PATH, pool_size=SQL_POOL_SIZE):
+        self.path = path
+        self.pool_size = pool_size
+        self.refreshes = 0
+        self._engine = None
+        self._db = None
+        self._schema_version = None
+        self._lock = threading.Lock()
+
+    def schema_version(self):
+        with self._engine.connect() as conn:
+            return conn.execute(text("PRAGMA schema_version")).scalar()
+
+    def get(self):
+        """
+        Return the SQLDatabase for the current schema.
+
+        Returns:
+            tuple: (SQLDatabase, schema version it was reflected at)
+        """
+        with self._lock:
+            if self._engine is None:
+                self._engine = _read_only_engine(self.path, self.pool_size)
+            version = self.schema_version()
+            if self._db is None or version != self._schema_version:
+                if self._db is not None:
+                    # Pooled connections cache prepared statements, and EXPLAIN of a
+                    # cached statement doesn't notice the schema change
+                    self._engine.dispose()
+                virtual, shadow = _full_text_tables(self._engine)
+                self._db = CachedTableInfoDatabase(
+                    self._engine, ignore_tables=shadow or None, custom_table_info=virtual or None
+                )
+                self._schema_version = version
+                self.refreshes += 1
+            return self._db, self._schema_version
+
+    def stats(self):
+        with self._lock:
+            pool = self._engine.pool if self._engine is not None else None
+            return {
+                "schema_version": self._schema_version,
+                "schema_refreshes": self.refreshes,
+                "pool_size": self.pool_size,
+                "checked_out": pool.checkedout() if pool is not None else 0,
+            }
+
+
+sql_database_cache = SQLDatabaseCache()
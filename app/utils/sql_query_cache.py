@@ -0,0 +1,296 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from configurables.embed_configs import get_embedding_model
+from utils.initialize import load_env_variables
+from utils.config_settings import config
+from utils.retrieval_cache import normalize_query
+
+env_name = load_env_variables()
+
+SQL_DB_PATH = config[env_name].SQL_DB_PATH
+SQL_QUERY_CACHE_PATH = config[env_name].SQL_QUERY_CACHE_PATH
+SQL_QUERY_CACHE_MAX_ENTRIES = config[env_name].SQL_QUERY_CACHE_MAX_ENTRIES
+SQL_QUERY_CACHE_SEMANTIC = config[env_name].SQL_QUERY_CACHE_SEMANTIC
+SQL_QUERY_CACHE_THRESHOLD = config[env_name].SQL_QUERY_CACHE_THRESHOLD
+SQL_QUERY_CACHE_EMBEDDING_MODEL = config[env_name].SQL_QUERY_CACHE_EMBEDDING_MODEL
+SQL_RESULT_CACHE_MAX_ENTRIES = config[env_name].SQL_RESULT_CACHE_MAX_ENTRIES
+
+
+def normalize_question(question):
+    """
+    Normalize a question like a retrieval query, also ignoring trailing punctuation.
+    """
+    return normalize_query(question).rstrip("?.! ")
+
+
+def is_valid_sql(db, query):
+    """
+    Return whether SQLite can prepare query against the database's current schema.
+    """
+    try:
+        db.run(f"EXPLAIN {query}")
+        return True
+    except Exception:
+        return False
+
+
+class SQLQueryCache:
+    """
+    Persistent cache of the SQL generated for past questions.
+
+    Questions are matched on their normalized text and, when semantic is on,
+    by the cosine similarity of their embeddings. Entries are scoped, e.g. by
+    LLM and temperature, and a cached query is only reused if it still
+    prepares against the current schema; otherwise it is dropped.
+    """
+
+    def __init__(
+        self,
+        path=SQL_QUERY_CACHE_PATH,
+        max_entries=SQL_QUERY_CACHE_MAX_ENTRIES,
+        semantic=SQL_QUERY_CACHE_SEMANTIC,
+        threshold=SQL_QUERY_CACHE_THRESHOLD,
+        embedding_model_name=SQL_QUERY_CACHE_EMBEDDING_MODEL,
+    ):
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.threshold = threshold
+        self.embedding_model_name = embedding_model_name
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.invalid = 0
+        # scope -> (questions, matrix of their normalized embeddings), rebuilt after writes
+        self._vectors = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sql_queries (
+                scope TEXT NOT NULL,
+                question TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                embedding BLOB,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (scope, question)
+            );
+            CREATE INDEX IF NOT EXISTS idx_sql_queries_last_used ON sql_queries (last_used);
+            """
+        )
+        self._conn.commit()
+
+    def embed(self, question):
+        """
+        Return the normalized embedding of a question, or None when semantic matching is off.
+        """
+        if not self.semantic:
+            return None
+        vector = np.asarray(
+            get_embedding_model(self.embedding_model_name).embed_query(question), dtype=np.float32
+        )
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, question, scope, db):
+        """
+        Return cached SQL for a question, if any still fits the schema of db.
+
+        Args:
+            question (str): The question asked
+            scope (str): What else the SQL depends on, e.g. "openai:0.0"
+            db: The SQLDatabase the SQL will run on
+
+        Returns:
+            tuple: (SQL or None, the question's embedding or None) - pass the embedding to store()
+        """
+        normalized = normalize_question(question)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sql FROM sql_queries WHERE scope = ? AND question = ?", (scope, normalized)
+            ).fetchone()
+        if row is not None:
+            if self._still_valid(db, scope, normalized, row[0]):
+                self._touch(scope, normalized)
+                self.hits += 1
+                return row[0], None
+        vector = self.embed(normalized)
+        if vector is not None:
+            match = self._most_similar(scope, vector)
+            if match is not None:
+                similar_question, sql = match
+                if self._still_valid(db, scope, similar_question, sql):
+                    self._touch(scope, similar_question)
+                    self.similar_hits += 1
+                    return sql, vector
+        self.misses += 1
+        return None, vector
+
+    def store(self, question, scope, sql, vector=None):
+        """
+        Cache the SQL generated for a question.
+
+        Args:
+            question (str): The question asked
+            scope (str): Same as for lookup()
+            sql (str): The generated query
+            vector (optional): The embedding returned by lookup()
+        """
+        normalized = normalize_question(question)
+        embedding = vector.astype(np.float32).tobytes() if vector is not None else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sql_queries VALUES (?, ?, ?, ?, ?)",
+                (scope, normalized, sql, embedding, time.time()),
+            )
+            excess = self._conn.execute("SELECT COUNT(*) FROM sql_queries").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM sql_queries WHERE rowid IN "
+                    "(SELECT rowid FROM sql_queries ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self._vectors.clear()
+            else:
+                self._vectors.pop(scope, None)
+
+    def _still_valid(self, db, scope, question, sql):
+        if is_valid_sql(db, sql):
+            return True
+        self.invalid += 1
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM sql_queries WHERE scope = ? AND question = ?", (scope, question)
+            )
+            self._vectors.pop(scope, None)
+        return False
+
+    def _touch(self, scope, question):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sql_queries SET last_used = ? WHERE scope = ? AND question = ?",
+                (time.time(), scope, question),
+            )
+
+    def _most_similar(self, scope, vector):
+        with self._lock:
+            if scope not in self._vectors:
+                rows = self._conn.execute(
+                    "SELECT question, sql, embedding FROM sql_queries WHERE scope = ? AND embedding IS NOT NULL",
+                    (scope,),
+                ).fetchall()
+                matrix = (
+                    np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows]) if rows else None
+                )
+                self._vectors[scope] = ([(row[0], row[1]) for row in rows], matrix)
+            entries, matrix = self._vectors[scope]
+        if matrix is None or matrix.shape[1] != vector.shape[0]:
+            return None
+        similarities = matrix @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        return entries[best]
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM sql_queries").fetchone()[0]
+        lookups = self.hits + self.similar_hits + self.misses
+        return {
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.similar_hits) / lookups if lookups else 0.0,
+            "invalid": self.invalid,
+            "entries": entries,
+            "semantic": self.semantic,
+        }
+
+
+class SQLResultCache:
+    """
+    In-process LRU cache of query results, kept until the database changes.
+
+    SQLite's data_version, read on one long-lived connection, changes
+    whenever any other connection or process commits to the database, so
+    a result is served only while no table has changed since it was read.
+    """
+
+    def __init__(self, path=SQL_DB_PATH, max_entries=SQL_RESULT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._conn = None
+        self._data_version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        # data_version is per connection, so it must always be read on the same one
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def run(self, db, query):
+        """
+        Return the result of running query on db, from the cache if the database hasn't changed.
+        """
+        with self._lock:
+            version = self._current_version()
+            if version != self._data_version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._data_version = version
+            result = self._entries.get(query)
+            if result is not None:
+                self._entries.move_to_end(query)
+                self.hits += 1
+                return result
+            self.misses += 1
+        result = db.run_no_throw(query)
+        if isinstance(result, str) and result.startswith("Error:"):
+            return result
+        with self._lock:
+            # Only keep the result if nothing was committed while the query ran
+            if self._current_version() == version:
+                self._entries[query] = result
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+            }
+
+
+_sql_query_cache = None
+_sql_query_cache_lock = threading.Lock()
+
+
+def get_sql_query_cache():
+    """
+    Return the process-wide SQL query cache, opening its database on first use.
+    """
+    global _sql_query_cache
+    with _sql_query_cache_lock:
+        if _sql_query_cache is None:
+            _sql_query_cache = SQLQueryCache()
+        return _sql_query_cache
+
+
+sql_result_cache = SQLResultCache()
@@ -0,0 +1,62 @@
+import json
+import threading
+from collections import deque
+
+# Time-to-first-token samples kept for the percentiles in /api/metrics
+TTFT_SAMPLES = 1000
+
+
+def sse_event(event, data):
+    """
+    Format one server-sent event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class StreamMetrics:
+    """
+    Counts of streamed answers and their time to first token, per process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ttft = deque(maxlen=TTFT_SAMPLES)
+        self.started = 0
+        self.completed = 0
+        self.disconnected = 0
+
+    def stream_started(self):
+        with self._lock:
+            self.started += 1
+
+    def first_token(self, seconds):
+        with self._lock:
+            self._ttft.append(seconds)
+
+    def stream_finished(self, disconnected=False):
+        with self._lock:
+            if disconnected:
+                self.disconnected += 1
+            else:
+                self.completed += 1
+
+    def stats(self):
+        with self._lock:
+            samples = sorted(self._ttft)
+        ttft = {}
+        if samples:
+            ttft = {
+                "mean": sum(samples) / len(samples),
+                "p50": samples[len(samples) // 2],
+                "p95": samples[min(int(len(samples) * 0.95), len(samples) - 1)],
+                "samples": len(samples),
+            }
+        return {
+            "started": self.started,
+            "completed": self.completed,
+            "disconnected": self.disconnected,
+            "ttft_seconds": ttft,
+        }
+
+
+stream_metrics = StreamMetrics()